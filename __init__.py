@@ -1,7 +1,21 @@
+from .bitmap import *
 from .color import *
+from .gradient import *
+from .lut import *
+from .palette import *
 from .shape import *
+from .spatial import *
+from .stream import *
+from .transform import *
 from .vector import *
 
-__all__ = (color.__all__ +
+__all__ = (bitmap.__all__ +
+           color.__all__ +
+           gradient.__all__ +
+           lut.__all__ +
+           palette.__all__ +
            shape.__all__ +
+           spatial.__all__ +
+           stream.__all__ +
+           transform.__all__ +
            vector.__all__)
@@ -0,0 +1,80 @@
+'''Compares Color HSB reads and writes with and without the cached HSB tuple
+
+    Run from the directory above the package:
+
+        python -m gfxutils.bench_color
+        python -m gfxutils.bench_color 100000
+'''
+import colorsys
+import sys
+from random import random, seed
+from time import perf_counter
+
+from .color import Color, _description
+
+
+class UncachedColor(Color):
+    'Color converting through colorsys on every HSB read and write'
+
+    __slots__ = ()
+
+    @property
+    def hsb(self):
+        return colorsys.rgb_to_hsv(self._red, self._green, self._blue)
+
+    @hsb.setter
+    def hsb(self, values):
+        self._set_hsb(*values)
+
+    @property
+    def description(self):
+        # Each of the description properties used to convert on its own
+        return _description(self.hue, self.saturation, self.brightness)
+
+
+def describe(colors):
+    return [c.description for c in colors]
+
+
+def hsb_reads(colors):
+    return [(c.hue, c.saturation, c.brightness) for c in colors]
+
+
+def setter_chain(colors):
+    for c in colors:
+        c.hue = c.hue + 0.25
+        c.saturation = c.saturation * 0.5
+        c.brightness = c.brightness * 0.75
+
+
+def timed(function, colors):
+    start = perf_counter()
+    result = function(colors)
+    return perf_counter() - start, result
+
+
+def run(n):
+    seed(n)
+    values = [(random(), random(), random()) for _ in range(n)]
+    for name, function in [('description', describe),
+                           ('hsb reads', hsb_reads),
+                           ('setter chain', setter_chain)]:
+        cached = [Color(*v) for v in values]
+        uncached = [UncachedColor(*v) for v in values]
+        cached_time, cached_result = timed(function, cached)
+        uncached_time, uncached_result = timed(function, uncached)
+        assert cached_result == uncached_result
+        assert cached == uncached
+        print('{:>9,} colors  {:<13} cached {:7.3f}s  uncached {:7.3f}s'
+              '  {:5.2f}x'.format(n, name, cached_time, uncached_time,
+                                  uncached_time / cached_time))
+
+
+def main(argv):
+    sizes = [int(arg) for arg in argv] or [10 ** 5]
+    for n in sizes:
+        run(n)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,67 @@
+'''Compares QuadTree region queries against brute force Rect.contains
+
+    Run from the directory above the package:
+
+        python -m gfxutils.bench_quadtree
+        python -m gfxutils.bench_quadtree 10000 100000
+'''
+import sys
+from random import random, seed
+from time import perf_counter
+
+from .shape import Rect
+from .spatial import QuadTree
+from .vector import V2
+
+
+def random_regions(count, size):
+    return [Rect(V2(random() * (1000 - size), random() * (1000 - size)),
+                 V2(size, size)) for _ in range(count)]
+
+
+def brute_force(points, region):
+    contains = region.contains
+    return [p for p in points if contains(p)]
+
+
+def per_query(function, points, regions):
+    start = perf_counter()
+    for region in regions:
+        function(points, region)
+    return (perf_counter() - start) / len(regions)
+
+
+def run(n, queries=200):
+    seed(n)
+    points = [V2(random() * 1000, random() * 1000) for _ in range(n)]
+
+    start = perf_counter()
+    tree = QuadTree.from_items(points)
+    tree.rebalance()
+    build = perf_counter() - start
+
+    regions = random_regions(queries, 20)
+    tree_time = per_query(lambda _, region: tree.query_rect(region),
+                          points, regions)
+    # Brute force is slow enough at large n that a few queries will do
+    brute_regions = regions[:max(1, queries * 10000 // n)]
+    brute_time = per_query(brute_force, points, brute_regions)
+
+    for region in regions[:5]:
+        found = {id(p) for p in tree.query_rect(region)}
+        assert found == {id(p) for p in brute_force(points, region)}
+
+    print('{:>9,} items  build {:8.3f}s  '
+          'quadtree {:9.1f}us/query  brute {:11.1f}us/query  {:7.0f}x'
+          .format(n, build, tree_time * 1e6, brute_time * 1e6,
+                  brute_time / tree_time))
+
+
+def main(argv):
+    sizes = [int(arg) for arg in argv] or [10 ** 4, 10 ** 5, 10 ** 6]
+    for n in sizes:
+        run(n)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
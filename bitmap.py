@@ -0,0 +1,486 @@
+from .color import Color, _adjust_columns, _composite_factors
+from array import array
+from functools import lru_cache
+from operator import getitem
+import re
+
+
+__all__ = ['ColorBuffer']
+
+
+# Binary operations on 8-bit channels are done through 256x256 lookup
+# tables stored as 256 rows of bytes.  map(getitem, map(rows.__getitem__,
+# a), b) then runs a whole channel through the table without executing
+# any Python bytecode per pixel.  When one side is the same value for
+# every pixel, the table collapses to a single bytes.translate.
+
+def _multiply(a, b):
+    return (a * b + 127) // 255
+
+
+def _add(a, b):
+    return min(a + b, 255)
+
+
+def _subtract(a, b):
+    return max(a - b, 0)
+
+
+def _divide(a, b):
+    if b == 0:
+        return 255
+    return min((a * 255 + b // 2) // b, 255)
+
+
+def _difference(a, b):
+    return abs(a - b)
+
+
+def _lighten(a, b):
+    return max(a, b)
+
+
+def _darken(a, b):
+    return min(a, b)
+
+
+def _weight(a, b):
+    '''The share of a in a + b scaled to 255, rounding half up'''
+    total = a + b
+    if total == 0:
+        return 0
+    return (510 * a + total) // (2 * total)
+
+
+def _inverse_weight(a, b):
+    '''The share of b in a + b, so that it sums to 255 with _weight'''
+    if a + b == 0:
+        return 0
+    return 255 - _weight(a, b)
+
+
+_operations = {
+    'multiply': _multiply,
+    'add': _add,
+    'subtract': _subtract,
+    'divide': _divide,
+    'difference': _difference,
+    'lighten': _lighten,
+    'darken': _darken,
+    'weight': _weight,
+    'inverse_weight': _inverse_weight,
+}
+
+
+@lru_cache(maxsize=None)
+def _table(name):
+    'Builds the lookup rows for one named operation the first time'
+    function = _operations[name]
+    return [bytes([function(a, b) for b in range(256)]) for a in range(256)]
+
+
+def _apply(name, a, b):
+    '''Runs two equal length channels through a lookup table, where
+        either can also be a single value used for every pixel'''
+    rows = _table(name)
+    if isinstance(a, int):
+        if isinstance(b, int):
+            return rows[a][b]
+        return b.translate(rows[a])
+    if isinstance(b, int):
+        return a.translate(bytes([row[b] for row in rows]))
+    return bytes(map(getitem, map(rows.__getitem__, a), b))
+
+
+def _uniform(channel):
+    '''Returns the value of a channel that is the same for every pixel
+        as a single int, so that tables collapse to translates'''
+    if isinstance(channel, int) or not channel:
+        return channel
+    if channel.count(channel[0]) == len(channel):
+        return channel[0]
+    return channel
+
+
+def _invert(channel):
+    if isinstance(channel, int):
+        return 255 - channel
+    return channel.translate(bytes(range(255, -1, -1)))
+
+
+def _sum(a, b):
+    '''Adds two channels that are known to never go over 255.  Whole
+        channels are added as one big integer, since no byte can carry
+        into the next'''
+    if isinstance(a, int):
+        a, b = b, a
+    if isinstance(a, int):
+        return a + b
+    if isinstance(b, int):
+        return _apply('add', a, b)
+    total = int.from_bytes(a, 'little') + int.from_bytes(b, 'little')
+    return total.to_bytes(len(a), 'little')
+
+
+_partial = re.compile(rb'[\x01-\xfe]')
+_full_mask = bytes(255 if i == 255 else 0 for i in range(256))
+
+
+def _scaler(weight):
+    '''Returns a function multiplying channels by weight.
+
+        Weights of 0 and 255, like the inside and outside of a shape,
+        multiply to all or nothing, so those pixels are masked out with
+        one big integer and.  Only the pixels in between, like the
+        antialiased edges, go through the multiply table one by one.
+        When most of the pixels are in between, the table rows for the
+        weights are looked up once and shared by every channel.
+    '''
+    rows = _table('multiply')
+    if isinstance(weight, int):
+        row = rows[weight]
+
+        def scale(channel):
+            if isinstance(channel, int):
+                return row[channel]
+            return channel.translate(row)
+        return scale
+
+    count = len(weight)
+    partial = len(weight.translate(None, b'\x00\xff'))
+    if partial * 8 <= count:
+        mask = int.from_bytes(weight.translate(_full_mask), 'little')
+        positions = [m.start() for m in _partial.finditer(weight)]
+        partial_rows = [rows[weight[i]] for i in positions]
+
+        def scale(channel):
+            if isinstance(channel, int):
+                return weight.translate(rows[channel])
+            masked = int.from_bytes(channel, 'little') & mask
+            result = bytearray(masked.to_bytes(count, 'little'))
+            for i, row in zip(positions, partial_rows):
+                result[i] = row[channel[i]]
+            return bytes(result)
+        return scale
+
+    weight_rows = []
+
+    def scale(channel):
+        if isinstance(channel, int):
+            return weight.translate(rows[channel])
+        if not weight_rows:
+            weight_rows.extend(map(rows.__getitem__, weight))
+        return bytes(map(getitem, weight_rows, channel))
+    return scale
+
+
+def _shares(source, destination, alpha):
+    '''Returns the weight and inverse_weight of the source and destination
+        weights, where alpha is their sum.  Where alpha is 0 or 255 the
+        weights already are their own shares, so only the pixels in
+        between are looked up when there are few of them'''
+    if isinstance(alpha, int):
+        if alpha in (0, 255):
+            return source, destination
+        return (_apply('weight', source, destination),
+                _apply('inverse_weight', source, destination))
+    count = len(alpha)
+    partial = len(alpha.translate(None, b'\x00\xff'))
+    if partial * 8 > count:
+        return (_apply('weight', source, destination),
+                _apply('inverse_weight', source, destination))
+    if isinstance(source, int):
+        source = bytes([source]) * count
+    if isinstance(destination, int):
+        destination = bytes([destination]) * count
+    weights = _table('weight')
+    weight = bytearray(source)
+    inverse = bytearray(destination)
+    for m in _partial.finditer(alpha):
+        i = m.start()
+        a = source[i]
+        weight[i] = weights[a][destination[i]]
+        inverse[i] = 255 - weight[i]
+    return bytes(weight), bytes(inverse)
+
+
+def _channel_factor(kind, alpha):
+    if kind == 'one':
+        return 255
+    elif kind == 'zero':
+        return 0
+    elif kind == 'alpha':
+        return alpha
+    else:
+        return _invert(alpha)
+
+
+class ColorBuffer:
+    '''A width x height bitmap of packed RGBA8888 pixels
+
+        Pixels use the same 4 byte layout as bytes(Color), in rows from
+        the top left.  Whole-buffer operations work channel by channel
+        on the packed bytes, and Color objects are only made when a pixel
+        is read by index.
+
+            image = ColorBuffer(1920, 1080, fill=Color(blue=1.0))
+            tint = Color(red=1.0, alpha=0.25)
+            tinted = image.blend(tint)
+            assert tinted[0, 0] == Color(blue=1.0).blend(tint)
+    '''
+
+    __slots__ = ['width', 'height', 'data']
+
+    def __init__(self, width, height, fill=None):
+        self.width = width
+        self.height = height
+        if fill is None:
+            self.data = bytearray(width * height * 4)
+        else:
+            self.data = bytearray(bytes(fill) * (width * height))
+
+    @classmethod
+    def from_bytes(cls, width, height, packed_bytes):
+        '''Creates a buffer from RGBA8888 bytes, like the output of
+            bytes(...) on a buffer'''
+        if len(packed_bytes) != width * height * 4:
+            message = "Expected {} bytes for {}x{} pixels, got {}"
+            raise ValueError(message.format(width * height * 4, width,
+                                            height, len(packed_bytes)))
+        result = cls.__new__(cls)
+        result.width = width
+        result.height = height
+        result.data = bytearray(packed_bytes)
+        return result
+
+    @classmethod
+    def from_colors(cls, width, height, colors):
+        'Creates a buffer from an iterable of Color in row order'
+        return cls.from_bytes(width, height, b''.join(map(bytes, colors)))
+
+    @classmethod
+    def _from_planes(cls, width, height, red, green, blue, alpha):
+        data = bytearray(width * height * 4)
+        data[0::4] = red
+        data[1::4] = green
+        data[2::4] = blue
+        data[3::4] = alpha
+        result = cls.__new__(cls)
+        result.width = width
+        result.height = height
+        result.data = data
+        return result
+
+    def __repr__(self):
+        return "{}({}x{})".format(self.__class__.__name__,
+                                  self.width, self.height)
+
+    def __bytes__(self):
+        return bytes(self.data)
+
+    def __len__(self):
+        return self.width * self.height
+
+    def __eq__(self, other):
+        return (self.width == other.width and self.height == other.height
+                and self.data == other.data)
+
+    def _offset(self, key):
+        if isinstance(key, tuple):
+            x, y = key
+            if not (0 <= x < self.width and 0 <= y < self.height):
+                raise IndexError("Pixel ({}, {}) is outside of {}x{}"
+                                 .format(x, y, self.width, self.height))
+            return (y * self.width + x) * 4
+        count = self.width * self.height
+        if key < 0:
+            key += count
+        if not 0 <= key < count:
+            raise IndexError("Pixel {} is outside of {} pixels"
+                             .format(key, count))
+        return key * 4
+
+    def __getitem__(self, key):
+        '''Returns a new Color for the pixel at buffer[x, y], or at
+            buffer[index] counting in row order'''
+        return Color.from_buffer(self.data, self._offset(key))
+
+    def __setitem__(self, key, color):
+        'Sets the pixel at buffer[x, y], or buffer[index], to a Color'
+        Color.packer.pack_into(self.data, self._offset(key), *color.rgba8888)
+
+    def __iter__(self):
+        data = self.data
+        for offset in range(0, len(data), 4):
+            yield Color.from_buffer(data, offset)
+
+    def to_colors(self):
+        'Returns a list of new Color instances in row order'
+        return list(self)
+
+    @property
+    def copy(self):
+        return self.from_bytes(self.width, self.height, self.data)
+
+    def fill(self, color):
+        'Sets every pixel to color'
+        self.data[:] = bytes(color) * (self.width * self.height)
+
+    @property
+    def planes(self):
+        'Returns the red, green, blue and alpha channels as separate bytes'
+        data = self.data
+        return (bytes(data[0::4]), bytes(data[1::4]),
+                bytes(data[2::4]), bytes(data[3::4]))
+
+    def _other_planes(self, other):
+        '''Returns the channels of another buffer of the same size, or the
+            channel values of a single Color as ints'''
+        if isinstance(other, ColorBuffer):
+            if (other.width, other.height) != (self.width, self.height):
+                raise ValueError("Cannot combine a {}x{} buffer with {}x{}"
+                                 .format(self.width, self.height,
+                                         other.width, other.height))
+            return other.planes
+        return other.rgba8888
+
+    def _combine(self, red, green, blue, alpha):
+        return self._from_planes(self.width, self.height,
+                                 red, green, blue, alpha)
+
+    def blend(self, other):
+        '''Blends each pixel with the matching pixel of another buffer,
+            or with a single Color, like Color.blend'''
+        red, green, blue, alpha = self.planes
+        o_red, o_green, o_blue, o_alpha = self._other_planes(other)
+        if isinstance(o_alpha, int):
+            inverse = 255 - o_alpha
+        else:
+            inverse = o_alpha.translate(bytes(range(255, -1, -1)))
+        channels = []
+        for mine, theirs in ((red, o_red), (green, o_green),
+                             (blue, o_blue)):
+            kept = _apply('multiply', mine, inverse)
+            if isinstance(theirs, int):
+                added = _multiply(theirs, o_alpha)
+            else:
+                added = _apply('multiply', theirs, o_alpha)
+            channels.append(_apply('add', kept, added))
+        return self._combine(*channels, alpha)
+
+    def lighten(self, other):
+        'Keeps the larger of each channel, like Color.lighten'
+        mine = self.planes
+        theirs = self._other_planes(other)
+        return self._combine(*[_apply('lighten', a, b)
+                               for a, b in zip(mine, theirs)])
+
+    def darken(self, other):
+        'Keeps the smaller of each channel, like Color.darken'
+        mine = self.planes
+        theirs = self._other_planes(other)
+        return self._combine(*[_apply('darken', a, b)
+                               for a, b in zip(mine, theirs)])
+
+    def _weighted(self, name, other):
+        red, green, blue, alpha = self.planes
+        *theirs, o_alpha = self._other_planes(other)
+        if isinstance(o_alpha, int):
+            weighted = [_multiply(c, o_alpha) for c in theirs]
+        else:
+            weighted = [_apply('multiply', c, o_alpha) for c in theirs]
+        return self._combine(_apply(name, red, weighted[0]),
+                             _apply(name, green, weighted[1]),
+                             _apply(name, blue, weighted[2]),
+                             alpha)
+
+    def add(self, other):
+        'Adds the alpha weighted color of other, like Color.add'
+        return self._weighted('add', other)
+
+    def subtract(self, other):
+        'Subtracts the alpha weighted color of other, like Color.subtract'
+        return self._weighted('subtract', other)
+
+    def _channelwise(self, name, other):
+        red, green, blue, alpha = self.planes
+        o_red, o_green, o_blue, _ = self._other_planes(other)
+        return self._combine(_apply(name, red, o_red),
+                             _apply(name, green, o_green),
+                             _apply(name, blue, o_blue),
+                             alpha)
+
+    def multiply(self, other):
+        'Multiplies each channel, like Color.multiply'
+        return self._channelwise('multiply', other)
+
+    def divide(self, other):
+        '''Divides each channel, like Color.divide.  Results are clamped
+            to 1.0 since they have to fit in a byte'''
+        return self._channelwise('divide', other)
+
+    def difference(self, other):
+        'Takes the absolute difference of each channel, like Color.difference'
+        return self._channelwise('difference', other)
+
+    def composite(self, other, mode='over'):
+        '''Porter-Duff compositing of this buffer as the source onto the
+            matching pixels of another buffer, or onto a single Color, as
+            the destination, like Color.composite.
+
+            This works in premultiplied alpha on the 8-bit channels.  The
+            alphas give each pixel a source and destination weight summing
+            to 255, so every color channel is two table multiplies and a
+            carry-free add.  Alpha channels that are the same for every
+            pixel, like opaque frames, turn the multiplies into translates.
+        '''
+        source_factor, destination_factor = _composite_factors(mode)
+        *source, source_alpha = [_uniform(c) for c in self.planes]
+        *destination, destination_alpha = [
+            _uniform(c) for c in self._other_planes(other)]
+        source_weight = _uniform(_scaler(_channel_factor(
+            source_factor, destination_alpha))(source_alpha))
+        destination_weight = _uniform(_scaler(_channel_factor(
+            destination_factor, source_alpha))(destination_alpha))
+        # Every mode keeps the sum of the weights within a byte
+        alpha = _uniform(_sum(source_weight, destination_weight))
+        weight, inverse = _shares(source_weight, destination_weight, alpha)
+        scale_source = _scaler(_uniform(weight))
+        scale_destination = _scaler(_uniform(inverse))
+        channels = [_sum(scale_source(a), scale_destination(b))
+                    for a, b in zip(source, destination)]
+        channels.append(alpha)
+        count = self.width * self.height
+        return self._combine(*[bytes([c]) * count if isinstance(c, int)
+                               else c for c in channels])
+
+    def map_rgb(self, function):
+        '''Returns a new buffer with the red, green and blue of every
+            pixel replaced through function, keeping alpha.
+
+            function takes lists of red, green and blue values between 0
+            and 1 and returns three new columns the same length.  Each
+            distinct pixel value is only passed once, then the buffer is
+            remapped through a dict of the results.
+        '''
+        with memoryview(self.data).cast('I') as pixels:
+            unique = list(set(pixels))
+            packed = array('I', unique).tobytes()
+            red, green, blue = function([c / 255 for c in packed[0::4]],
+                                        [c / 255 for c in packed[1::4]],
+                                        [c / 255 for c in packed[2::4]])
+            adjusted = bytearray(packed)
+            adjusted[0::4] = bytes([int(c * 255 + 0.5) for c in red])
+            adjusted[1::4] = bytes([int(c * 255 + 0.5) for c in green])
+            adjusted[2::4] = bytes([int(c * 255 + 0.5) for c in blue])
+            mapping = dict(zip(unique, memoryview(adjusted).cast('I')))
+            result = array('I', map(mapping.__getitem__, pixels))
+        return self.from_bytes(self.width, self.height, result.tobytes())
+
+    def adjust_hsb(self, hue_shift=0.0, saturation_scale=1.0,
+                   brightness_range=(0.0, 1.0)):
+        '''Returns a new buffer with every pixel run through adjust_hsb'''
+        def adjust(red, green, blue):
+            return _adjust_columns(red, green, blue, hue_shift,
+                                   saturation_scale, brightness_range)
+        return self.map_rgb(adjust)
@@ -1,12 +1,22 @@
 import colorsys
-from struct import Struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from itertools import chain, repeat, starmap
+from math import nextafter
+from operator import attrgetter, getitem, mul
+from struct import Struct, error as StructError
 
-__all__ = ['Color']
+__all__ = ['Color', 'rgb_to_hsb', 'hsb_to_rgb', 'adjust_hsb',
+           'describe_many']
 
 
 class Color:
 
-    __slots__ = ['red', 'green', 'blue', 'alpha']
+    # red, green and blue are properties over the underscored slots so
+    # that writing them can drop the cached HSB tuple in _hsb
+    __slots__ = ['_red', '_green', '_blue', 'alpha', '_hsb']
 
     # NOTE: Even though we store these as floats between 0 and 1 in python
     #       When we write this out to binary, we encode it as 4 bytes RGBA.
@@ -16,33 +26,143 @@ class Color:
     packer = Struct('BBBB')
 
     def __init__(self, red=0.0, green=0.0, blue=0.0, alpha=1.0):
-        self.red = float(red)
-        self.green = float(green)
-        self.blue = float(blue)
+        self._red = float(red)
+        self._green = float(green)
+        self._blue = float(blue)
         self.alpha = float(alpha)
+        self._hsb = None
+
+    @property
+    def red(self):
+        return self._red
+
+    @red.setter
+    def red(self, value):
+        self._red = value
+        self._hsb = None
+
+    @property
+    def green(self):
+        return self._green
+
+    @green.setter
+    def green(self, value):
+        self._green = value
+        self._hsb = None
+
+    @property
+    def blue(self):
+        return self._blue
+
+    @blue.setter
+    def blue(self, value):
+        self._blue = value
+        self._hsb = None
 
     @property
     def copy(self):
-        return Color(self.red, self.green, self.blue, self.alpha)
+        color = Color(self._red, self._green, self._blue, self.alpha)
+        color._hsb = self._hsb
+        return color
 
     @property
     def uint32(self):
-        return int(self.red * 255) << 24 | int(self.green * 255) << 16 | int(self.blue * 255) << 8 | int(self.alpha * 255)
+        red, green, blue, alpha = self.rgba8888
+        return red << 24 | green << 16 | blue << 8 | alpha
 
     @property
     def rgba8888(self):
-        return int(self.red * 255), int(self.green * 255), int(self.blue * 255), int(self.alpha * 255)
+        return (int(self._red * 255), int(self._green * 255),
+                int(self._blue * 255), int(self.alpha * 255))
 
     @classmethod
     def from_bytes(cls, packed_bytes):
         components = cls.packer.unpack(packed_bytes)
-        red, green, blue, alpha = [x / 255 for x in components]
-        return cls(red, green, blue, alpha)
+        return cls(*map(_channels.__getitem__, components))
+
+    @classmethod
+    def from_buffer(cls, buffer, offset=0):
+        '''Creates a new color from the record starting at offset
+            in any bytes-like object, without slicing it'''
+        components = cls.packer.unpack_from(buffer, offset)
+        return cls(*map(_channels.__getitem__, components))
+
+    @classmethod
+    def from_uint32(cls, value):
+        '''Creates a new color from an int like the one made by uint32,
+            with red in the highest byte'''
+        return cls(_channels[value >> 24 & 0xFF],
+                   _channels[value >> 16 & 0xFF],
+                   _channels[value >> 8 & 0xFF],
+                   _channels[value & 0xFF])
+
+    @classmethod
+    def from_hex(cls, string):
+        '''Creates a new color from a hex string like #FF0000FF.  The #
+            is optional, alpha defaults to FF when only RGB is given and
+            the short forms #F00 and #F00F are accepted.  Parsed strings
+            are cached, so repeated theme colors are only parsed once'''
+        return cls(*_parse_hex(string))
+
+    @classmethod
+    def pack_many(cls, colors):
+        '''Packs many colors into one bytes object that is the same as
+            joining bytes(...) of each one, but made in a single pass'''
+        values = chain.from_iterable(map(_components, colors))
+        # Floats can't index a table, so this scales them, but in map
+        # calls rather than a Python loop
+        return bytes(map(int, map(mul, values, repeat(255))))
+
+    @classmethod
+    def unpack_many(cls, packed_bytes):
+        '''Creates a list of colors from a bytes-like object in the
+            format made by pack_many'''
+        packed_bytes = memoryview(packed_bytes).cast('B')
+        if len(packed_bytes) % 4:
+            raise ValueError('Packed colors need a multiple of 4 bytes, got {}'
+                             .format(len(packed_bytes)))
+        values = list(map(_channels.__getitem__, packed_bytes))
+        return list(map(cls, values[0::4], values[1::4],
+                        values[2::4], values[3::4]))
+
+    @classmethod
+    def uint32_many(cls, colors):
+        '''Returns an array('I') of the uint32 of each color'''
+        values = array('I', cls.pack_many(colors))
+        if sys.byteorder == 'little':
+            values.byteswap()
+        return values
+
+    @classmethod
+    def from_uint32_many(cls, values):
+        '''Creates a list of colors from ints like the ones made by uint32'''
+        values = array('I', values)
+        if sys.byteorder == 'little':
+            values.byteswap()
+        return cls.unpack_many(values.tobytes())
+
+    @classmethod
+    def hex_many(cls, colors):
+        '''Returns the hex string of each color, formatting every color
+            with a single bytes.hex call'''
+        if not isinstance(colors, (list, tuple)):
+            colors = list(colors)
+        try:
+            digits = cls.pack_many(colors).hex().upper()
+        except ValueError:
+            return [color.hex for color in colors]
+        return ['#' + digits[i:i + 8] for i in range(0, len(digits), 8)]
+
+    @classmethod
+    def from_hex_many(cls, strings):
+        '''Creates a list of colors from hex strings, like from_hex'''
+        return list(starmap(cls, map(_parse_hex, strings)))
 
     @classmethod
     def from_hsb(cls, hue=0.0, saturation=0.0, brightness=0.0, alpha=1.0):
-        r, g, b = colorsys.hsv_to_rgb(hue, saturation, brightness)
-        return cls(red=r, green=g, blue=b, alpha=alpha)
+        color = cls(alpha=alpha)
+        color._set_hsb(hue, saturation, brightness)
+        return color
 
     def __repr__(self):
         template = '{}({:.3f}, {:.3f}, {:.3f}, {:.3f})'
@@ -50,8 +170,7 @@ class Color:
                                self.red, self.green, self.blue, self.alpha)
 
     def __bytes__(self):
-        red, green, blue, alpha = [int(x * 255) for x in self.components]
-        return self.packer.pack(red, green, blue, alpha)
+        return self.packer.pack(*self.rgba8888)
 
     def __bool__(self):
         return True
@@ -80,13 +199,24 @@ class Color:
 
     @property
     def hsb(self):
-        'Returns a Hue, Saturation, Brightness tuple'
-        return colorsys.rgb_to_hsv(self.red, self.green, self.blue)
+        '''Returns a Hue, Saturation, Brightness tuple.  The tuple is
+            cached until red, green or blue are written'''
+        hsb = self._hsb
+        if hsb is None:
+            hsb = self._hsb = colorsys.rgb_to_hsv(self._red, self._green,
+                                                 self._blue)
+        return hsb
 
     @hsb.setter
     def hsb(self, values):
         'Sets the Hue, Saturation, Brightness tuple'
-        self.red, self.green, self.blue = colorsys.hsv_to_rgb(*values)
+        self._set_hsb(*values)
+
+    def _set_hsb(self, h, s, b):
+        self._red, self._green, self._blue = colorsys.hsv_to_rgb(h, s, b)
+        # The cache is only filled by reading hsb, so it always matches
+        # converting the stored RGB
+        self._hsb = None
 
     @property
     def brightness(self):
@@ -107,7 +237,7 @@ class Color:
         elif other < 0:
             other = 0
         h, s, _ = self.hsb
-        self.red, self.green, self.blue = colorsys.hsv_to_rgb(h, s, other)
+        self._set_hsb(h, s, other)
 
     @property
     def saturation(self):
@@ -128,7 +258,7 @@ class Color:
         elif other < 0:
             other = 0
         h, _, b = self.hsb
-        self.red, self.green, self.blue = colorsys.hsv_to_rgb(h, other, b)
+        self._set_hsb(h, other, b)
 
 
     @property
@@ -147,12 +277,18 @@ class Color:
         # Bound between 0 and 1 on a repeating period
         other = other - (other // 1)
         _, s, b = self.hsb
-        self.red, self.green, self.blue = colorsys.hsv_to_rgb(other, s, b)
+        self._set_hsb(other, s, b)
 
     @property
     def hex(self):
         'Returns a hex string representation like #FF0000FF for opaque red'
-        return '#' + ''.join("%0.2X" % int(x * 255) for x in self.components)
+        try:
+            return '#' + bytes(self).hex().upper()
+        except StructError:
+            # Channels outside 0 to 1 don't fit a byte, so format them
+            # one at a time
+            return '#' + ''.join('%0.2X' % int(x * 255)
+                                 for x in self.components)
 
     def write(self, writable):
         return writable.write(bytes(self))
@@ -201,72 +337,314 @@ class Color:
         blue = abs(self.blue - other.blue)
         return self.__class__(red, green, blue, self.alpha)
 
+    def composite(self, other, mode='over'):
+        '''Porter-Duff compositing of this color as the source onto
+            other as the destination.  mode is one of 'over', 'in', 'out',
+            'atop' or 'xor'.  Unlike blend, both alphas are used and the
+            result has the composited alpha.
+
+                glass = Color(0.0, 0.0, 1.0, 0.5)
+                assert glass.composite(glass).alpha == 0.75
+        '''
+        source_factor, destination_factor = _composite_factors(mode)
+        source = self.alpha * _factor(source_factor, other.alpha)
+        destination = other.alpha * _factor(destination_factor, self.alpha)
+        alpha = source + destination
+        if alpha == 0:
+            return self.__class__(0.0, 0.0, 0.0, 0.0)
+        # Premultiplied colors are summed then divided back out by alpha
+        red = (self.red * source + other.red * destination) / alpha
+        green = (self.green * source + other.green * destination) / alpha
+        blue = (self.blue * source + other.blue * destination) / alpha
+        return self.__class__(red, green, blue, alpha)
+
     @property
     def hue_description(self):
-        hue = self.hue
-        if hue < 1 / 24:
-            return 'Red'
-        elif hue < 3 / 24:
-            return 'Orange'
-        elif hue < 5 / 24:
-            return 'Yellow'
-        elif hue < 7 / 24:
-            return 'Lime'
-        elif hue < 9 / 24:
-            return 'Green'
-        elif hue < 11 / 24:
-            return 'Teal'
-        elif hue < 13 / 24:
-            return 'Cyan'
-        elif hue < 15 / 24:
-            return 'Aqua'
-        elif hue < 17 / 24:
-            return 'Blue'
-        elif hue < 19 / 24:
-            return 'Purple'
-        elif hue < 21 / 24:
-            return 'Magenta'
-        elif hue < 23 / 24:
-            return 'Pink'
-        else:
-            return 'Red'
+        return _hue_description(self.hsb[0])
 
     @property
     def brightness_description(self):
-        brightness = self.brightness
-        if brightness > 0.8:
-            return 'Bright'
-        elif brightness > 0.2:
-            return ''
-        elif brightness > 0.05:
-            return 'Dark'
-        elif brightness < 0.001:
-            return 'Black'
-        else:
-            return 'Very Dark'
+        return _brightness_description(self.hsb[2])
 
     @property
     def saturation_description(self):
-        saturation = self.saturation
-        if saturation > 0.75:
-            return 'Vivid'
-        elif saturation > 0.5:
-            return ''
-        elif saturation > 0.1:
-            return 'Pastel'
-        else:
-            return 'Gray'
+        return _saturation_description(self.hsb[1])
 
     @property
     def description(self):
-        brightness = self.brightness_description
-        if brightness == 'Black':
-            return 'Black'
-        hue = self.hue_description
-        saturation = self.saturation_description
-        if saturation == 'Gray':
-            hue = 'Gray'
-            saturation = ''
-        descriptions = [saturation, brightness, hue]
-        descriptions = [d for d in descriptions if d != '']
-        return ' '.join(descriptions)
+        hue, saturation, brightness = self.hsb
+        return _description(hue, saturation, brightness)
+
+
+# Every 8-bit channel value as the float stored on a Color
+_channels = [i / 255 for i in range(256)]
+
+_components = attrgetter('_red', '_green', '_blue', 'alpha')
+
+
+@lru_cache(maxsize=4096)
+def _parse_hex(string):
+    '''Returns the channels of a hex color string as a tuple of floats'''
+    digits = string[1:] if string.startswith('#') else string
+    if len(digits) in (3, 4):
+        digits = ''.join(d + d for d in digits)
+    if len(digits) == 6:
+        digits += 'FF'
+    try:
+        values = bytes.fromhex(digits)
+    except ValueError:
+        values = b''
+    if len(digits) != 8 or len(values) != 4:
+        raise ValueError('Invalid hex color {!r}'.format(string))
+    return tuple(map(_channels.__getitem__, values))
+
+
+# Porter-Duff modes as the factors applied to the source and destination.
+# The source factor depends on the destination alpha and the destination
+# factor on the source alpha, as 'one', 'zero', 'alpha' or 'inverse'.
+_composite_modes = {
+    'over': ('one', 'inverse'),
+    'in': ('alpha', 'zero'),
+    'out': ('inverse', 'zero'),
+    'atop': ('alpha', 'inverse'),
+    'xor': ('inverse', 'inverse'),
+}
+
+
+def _composite_factors(mode):
+    try:
+        return _composite_modes[mode]
+    except KeyError:
+        raise ValueError("Unknown composite mode {!r}, expected one of {}"
+                         .format(mode, ', '.join(_composite_modes)))
+
+
+def _factor(kind, alpha):
+    if kind == 'one':
+        return 1.0
+    elif kind == 'zero':
+        return 0.0
+    elif kind == 'alpha':
+        return alpha
+    else:
+        return 1.0 - alpha
+
+
+def _hue_description(hue):
+    if hue < 1 / 24:
+        return 'Red'
+    elif hue < 3 / 24:
+        return 'Orange'
+    elif hue < 5 / 24:
+        return 'Yellow'
+    elif hue < 7 / 24:
+        return 'Lime'
+    elif hue < 9 / 24:
+        return 'Green'
+    elif hue < 11 / 24:
+        return 'Teal'
+    elif hue < 13 / 24:
+        return 'Cyan'
+    elif hue < 15 / 24:
+        return 'Aqua'
+    elif hue < 17 / 24:
+        return 'Blue'
+    elif hue < 19 / 24:
+        return 'Purple'
+    elif hue < 21 / 24:
+        return 'Magenta'
+    elif hue < 23 / 24:
+        return 'Pink'
+    else:
+        return 'Red'
+
+
+def _brightness_description(brightness):
+    if brightness > 0.8:
+        return 'Bright'
+    elif brightness > 0.2:
+        return ''
+    elif brightness > 0.05:
+        return 'Dark'
+    elif brightness < 0.001:
+        return 'Black'
+    else:
+        return 'Very Dark'
+
+
+def _saturation_description(saturation):
+    if saturation > 0.75:
+        return 'Vivid'
+    elif saturation > 0.5:
+        return ''
+    elif saturation > 0.1:
+        return 'Pastel'
+    else:
+        return 'Gray'
+
+
+def _description(hue, saturation, brightness):
+    return _compose(_brightness_description(brightness),
+                    _saturation_description(saturation),
+                    _hue_description(hue))
+
+
+def _compose(brightness, saturation, hue):
+    if brightness == 'Black':
+        return 'Black'
+    if saturation == 'Gray':
+        hue = 'Gray'
+        saturation = ''
+    descriptions = [saturation, brightness, hue]
+    descriptions = [d for d in descriptions if d != '']
+    return ' '.join(descriptions)
+
+
+# The same ladders as the description functions above, as sorted limits
+# for bisect.  Black is below 0.001 rather than at or below it, so its
+# limit is the float just under 0.001 to make every bisect_left agree.
+_hue_limits = [n / 24 for n in range(1, 24, 2)]
+_hue_names = ['Red', 'Orange', 'Yellow', 'Lime', 'Green', 'Teal', 'Cyan',
+              'Aqua', 'Blue', 'Purple', 'Magenta', 'Pink', 'Red']
+_saturation_limits = [0.1, 0.5, 0.75]
+_saturation_names = ['Gray', 'Pastel', '', 'Vivid']
+_brightness_limits = [nextafter(0.001, 0.0), 0.05, 0.2, 0.8]
+_brightness_names = ['Black', 'Very Dark', 'Dark', '', 'Bright']
+
+# Every description, indexed by brightness, saturation then hue class
+_descriptions = [[[_compose(brightness, saturation, hue)
+                   for hue in _hue_names]
+                  for saturation in _saturation_names]
+                 for brightness in _brightness_names]
+
+_rgb = attrgetter('_red', '_green', '_blue')
+
+
+def describe_many(colors):
+    '''Returns the description of each color, exactly as reading
+        description on each one would.
+
+        Each distinct color is converted to HSB once, in columns, and its
+        hue, saturation and brightness are bisected into classes that
+        index a table of every possible description.  Colors are not
+        quantized, so the saving comes from repeated colors; a list of
+        all distinct colors takes about as long as describing each one.
+
+            names = describe_many(dominant_colors)
+    '''
+    if not isinstance(colors, (list, tuple)):
+        colors = list(colors)
+    keys = list(map(_rgb, colors))
+    unique = list(dict.fromkeys(keys))
+    hues, saturations, brightnesses = rgb_to_hsb(
+        [k[0] for k in unique], [k[1] for k in unique],
+        [k[2] for k in unique])
+    rows = map(_descriptions.__getitem__,
+               map(bisect_left, repeat(_brightness_limits), brightnesses))
+    rows = map(getitem, rows,
+               map(bisect_left, repeat(_saturation_limits), saturations))
+    names = map(getitem, rows,
+                map(bisect_right, repeat(_hue_limits), hues))
+    return list(map(dict(zip(unique, names)).__getitem__, keys))
+
+
+def rgb_to_hsb(red, green, blue):
+    '''Converts columns of red, green and blue values between 0 and 1
+        into array('d') columns of hue, saturation and brightness.
+        Gives the same results as colorsys.rgb_to_hsv on each color'''
+    hues = array('d')
+    saturations = array('d')
+    brightnesses = array('d', map(max, red, green, blue))
+    for r, g, b, maxc in zip(red, green, blue, brightnesses):
+        minc = min(r, g, b)
+        if minc == maxc:
+            hues.append(0.0)
+            saturations.append(0.0)
+            continue
+        rangec = maxc - minc
+        saturations.append(rangec / maxc)
+        # Same operations as colorsys, so results match to the last bit
+        rc = (maxc - r) / rangec
+        gc = (maxc - g) / rangec
+        bc = (maxc - b) / rangec
+        if r == maxc:
+            h = bc - gc
+        elif g == maxc:
+            h = 2.0 + rc - bc
+        else:
+            h = 4.0 + gc - rc
+        hues.append((h / 6.0) % 1.0)
+    return hues, saturations, brightnesses
+
+
+def hsb_to_rgb(hue, saturation, brightness):
+    '''Converts columns of hue, saturation and brightness into
+        array('d') columns of red, green and blue.
+        Gives the same results as colorsys.hsv_to_rgb on each color'''
+    reds = array('d')
+    greens = array('d')
+    blues = array('d')
+    for h, s, v in zip(hue, saturation, brightness):
+        if s == 0.0:
+            reds.append(v)
+            greens.append(v)
+            blues.append(v)
+            continue
+        i = int(h * 6.0)
+        f = h * 6.0 - i
+        p = v * (1.0 - s)
+        q = v * (1.0 - s * f)
+        t = v * (1.0 - s * (1.0 - f))
+        i %= 6
+        if i == 0:
+            r, g, b = v, t, p
+        elif i == 1:
+            r, g, b = q, v, p
+        elif i == 2:
+            r, g, b = p, v, t
+        elif i == 3:
+            r, g, b = p, q, v
+        elif i == 4:
+            r, g, b = t, p, v
+        else:
+            r, g, b = v, p, q
+        reds.append(r)
+        greens.append(g)
+        blues.append(b)
+    return reds, greens, blues
+
+
+def _adjust_columns(red, green, blue, hue_shift, saturation_scale,
+                    brightness_range):
+    '''Applies adjust_hsb to columns of red, green and blue'''
+    hues, saturations, brightnesses = rgb_to_hsb(red, green, blue)
+    if hue_shift:
+        hues = [(h + hue_shift) % 1.0 for h in hues]
+    if saturation_scale != 1.0:
+        saturations = [min(max(s * saturation_scale, 0.0), 1.0)
+                       for s in saturations]
+    low, high = brightness_range
+    low = max(low, 0.0)
+    high = min(high, 1.0)
+    if low > 0.0 or high < 1.0:
+        brightnesses = [min(max(b, low), high) for b in brightnesses]
+    return hsb_to_rgb(hues, saturations, brightnesses)
+
+
+def adjust_hsb(colors, hue_shift=0.0, saturation_scale=1.0,
+               brightness_range=(0.0, 1.0)):
+    '''Returns new Colors with the hue shifted around the color wheel,
+        the saturation scaled and the brightness clamped to a range, all
+        in the HSB color space like the hue, saturation and brightness
+        setters.  Alpha is kept.
+
+            muted = adjust_hsb(colors, hue_shift=0.5, saturation_scale=0.5)
+    '''
+    if not isinstance(colors, (list, tuple)):
+        colors = list(colors)
+    red, green, blue = _adjust_columns(
+        [c.red for c in colors], [c.green for c in colors],
+        [c.blue for c in colors], hue_shift, saturation_scale,
+        brightness_range)
+    alpha = map(attrgetter('alpha'), colors)
+    return list(map(Color, red, green, blue, alpha))
@@ -0,0 +1,236 @@
+from .color import Color
+import colorsys
+from functools import lru_cache
+from itertools import repeat
+from bisect import bisect_left, bisect_right
+from math import atan2, ceil, floor, pi, sqrt
+from operator import add, mod, mul, sub
+
+
+__all__ = ['Gradient']
+
+
+def _to_linear(c):
+    'Converts an sRGB channel to linear light'
+    if c <= 0.04045:
+        return c / 12.92
+    return ((c + 0.055) / 1.055) ** 2.4
+
+
+def _from_linear(c):
+    'Converts a linear light channel back to sRGB'
+    if c <= 0.0031308:
+        return c * 12.92
+    return 1.055 * c ** (1 / 2.4) - 0.055
+
+
+def _lerp_rgb(a, b, t):
+    return Color(*[x + (y - x) * t for x, y in zip(a, b)])
+
+
+def _lerp_linear(a, b, t):
+    rgb = [_from_linear(x + (y - x) * t) for x, y in
+           zip(map(_to_linear, a[:3]), map(_to_linear, b[:3]))]
+    return Color(*rgb, a[3] + (b[3] - a[3]) * t)
+
+
+def _lerp_hsb(a, b, t):
+    h1, s1, v1 = colorsys.rgb_to_hsv(*a[:3])
+    h2, s2, v2 = colorsys.rgb_to_hsv(*b[:3])
+    # Grays have no hue of their own, so they take the other stop's
+    if s1 == 0:
+        h1 = h2
+    elif s2 == 0:
+        h2 = h1
+    # Go the short way around the color wheel
+    dh = h2 - h1
+    if dh > 0.5:
+        dh -= 1.0
+    elif dh < -0.5:
+        dh += 1.0
+    return Color.from_hsb((h1 + dh * t) % 1.0, s1 + (s2 - s1) * t,
+                          v1 + (v2 - v1) * t, a[3] + (b[3] - a[3]) * t)
+
+
+_spaces = {
+    'rgb': _lerp_rgb,
+    'hsb': _lerp_hsb,
+    'linear': _lerp_linear,
+}
+
+
+def _color_at(stops, space, t):
+    'Interpolates the (position, components) stops at t'
+    if t <= stops[0][0]:
+        return Color(*stops[0][1])
+    for (p1, c1), (p2, c2) in zip(stops, stops[1:]):
+        if t <= p2:
+            if p2 == p1:
+                return Color(*c2)
+            return _spaces[space](c1, c2, (t - p1) / (p2 - p1))
+    return Color(*stops[-1][1])
+
+
+@lru_cache(maxsize=64)
+def _bake(stops, space, size):
+    '''Returns the red, green, blue and alpha bytes of a size entry table,
+        padded to 256 entries for bytes.translate.  Cached by the stop
+        values, so equal gradients share one table'''
+    colors = [_color_at(stops, space, i / (size - 1)) for i in range(size)]
+    packed = Color.pack_many(colors)
+    return tuple(packed[i::4].ljust(256, b'\0') for i in range(4))
+
+
+def _lookup(indices, planes):
+    'Returns RGBA8888 bytes for a bytes of table indices'
+    packed = bytearray(len(indices) * 4)
+    for i, plane in enumerate(planes):
+        packed[i::4] = indices.translate(plane)
+    return packed
+
+
+def _clamped(last):
+    '''Returns a translate table holding indices past last at last'''
+    return bytes(min(i, last) for i in range(256))
+
+
+class Gradient:
+    '''A gradient through Colors at positions between 0 and 1,
+        interpolated in 'rgb', 'hsb' or 'linear' light.
+
+        Filling looks every pixel up in a table of size colors baked
+        from the stops, which is cached for each distinct gradient.
+
+            sunset = Gradient([(0.0, Color(1.0, 0.5, 0.0)),
+                               (1.0, Color(0.3, 0.0, 0.5))], 'linear')
+            sky = ColorBuffer(640, 480)
+            sunset.fill_linear(sky, V2(0, 0), V2(0, 479))
+    '''
+
+    __slots__ = ['stops', 'space']
+
+    def __init__(self, stops, space='rgb'):
+        if space not in _spaces:
+            raise ValueError("Unknown gradient space {!r}, expected one of {}"
+                             .format(space, ', '.join(_spaces)))
+        stops = sorted(stops, key=lambda stop: stop[0])
+        if not stops:
+            raise ValueError('A gradient needs at least one stop')
+        self.stops = stops
+        self.space = space
+
+    def __repr__(self):
+        return '{}({!r}, {!r})'.format(self.__class__.__name__,
+                                       self.stops, self.space)
+
+    def _key(self):
+        return tuple((float(p), c.components) for p, c in self.stops)
+
+    def color_at(self, t):
+        'Returns the interpolated Color at position t, without the table'
+        return _color_at(self._key(), self.space, t)
+
+    def bake(self, size=256):
+        '''Returns the table of size colors from position 0 to 1 as
+            RGBA8888 bytes'''
+        planes = self._planes(size)
+        packed = bytearray(size * 4)
+        for i, plane in enumerate(planes):
+            packed[i::4] = plane[:size]
+        return bytes(packed)
+
+    def _planes(self, size):
+        if not 2 <= size <= 256:
+            raise ValueError('Gradient tables have 2 to 256 entries, got {}'
+                             .format(size))
+        return _bake(self._key(), self.space, size)
+
+    def sample_many(self, positions, size=256):
+        '''Returns a list of Colors from the table at each position,
+            clamped between 0 and 1'''
+        last = size - 1
+        indices = bytes([int(min(max(t, 0.0), 1.0) * last + 0.5)
+                         for t in positions])
+        return Color.unpack_many(_lookup(indices, self._planes(size)))
+
+    def _fill(self, buffer, rows, size):
+        planes = self._planes(size)
+        indices = b''.join(rows)
+        buffer.data[:] = _lookup(indices, planes)
+        return buffer
+
+    def fill_linear(self, buffer, start, end, size=256):
+        '''Fills a ColorBuffer with the gradient running from start at
+            position 0 to end at position 1, with each pixel (x, y)
+            sampled at V2(x, y).  Pixels past either end keep its color'''
+        last = size - 1
+        width = buffer.width
+        dx = end.x - start.x
+        dy = end.y - start.y
+        scale = last / (dx * dx + dy * dy or 1.0)
+        # Table positions along a row only ever go one way, so the pixels
+        # that need clamping are found by bisecting.  Rows running right
+        # to left are worked out left to right and reversed.
+        across = [x * abs(dx) * scale + 0.5 for x in range(width)]
+        base = (width - 1 - start.x if dx < 0 else -start.x) * dx * scale
+        clamp = _clamped(last)
+        rows = []
+        for y in range(buffer.height):
+            if dy == 0 and rows:
+                rows.append(rows[-1])
+                continue
+            offset = base + (y - start.y) * dy * scale
+            low = bisect_left(across, -offset)
+            high = max(bisect_right(across, last + 0.5 - offset), low)
+            row = (bytes(low) + bytes(map(int, map(
+                add, across[low:high], repeat(offset)))) +
+                bytes([last]) * (width - high)).translate(clamp)
+            rows.append(row[::-1] if dx < 0 else row)
+        return self._fill(buffer, rows, size)
+
+    def fill_radial(self, buffer, center, radius, size=256):
+        '''Fills a ColorBuffer with the gradient running from center at
+            position 0 out to radius at position 1'''
+        if radius <= 0:
+            raise ValueError('Radial gradients need a radius above 0, got {}'
+                             .format(radius))
+        last = size - 1
+        width = buffer.width
+        scale = last / radius
+        across = [(x - center.x) ** 2 for x in range(width)]
+        clamp = _clamped(last)
+        # Rows the same distance above and below center are the same
+        rows = {}
+        for y in range(buffer.height):
+            down = (y - center.y) ** 2
+            if down in rows:
+                continue
+            # Only pixels within radius need a square root
+            if down > radius * radius:
+                rows[down] = bytes([last]) * width
+                continue
+            reach = sqrt(radius * radius - down)
+            low = min(max(ceil(center.x - reach), 0), width)
+            high = min(max(floor(center.x + reach) + 1, low), width)
+            inside = map(sqrt, map(add, across[low:high], repeat(down)))
+            rows[down] = (bytes([last]) * low + bytes(map(int, map(
+                add, map(mul, inside, repeat(scale)), repeat(0.5)))) +
+                bytes([last]) * (width - high)).translate(clamp)
+        return self._fill(buffer, [rows[(y - center.y) ** 2]
+                                   for y in range(buffer.height)], size)
+
+    def fill_angular(self, buffer, center, radians=0.0, size=256):
+        '''Fills a ColorBuffer with the gradient swept once around center,
+            starting at position 0 in the direction of radians'''
+        last = size - 1
+        tau = 2 * pi
+        scale = last / tau
+        across = [x - center.x for x in range(buffer.width)]
+        clamp = _clamped(last)
+        rows = []
+        for y in range(buffer.height):
+            angles = map(atan2, repeat(y - center.y), across)
+            angles = map(mod, map(sub, angles, repeat(radians)), repeat(tau))
+            rows.append(bytes(map(int, map(add, map(
+                mul, angles, repeat(scale)), repeat(0.5)))).translate(clamp))
+        return self._fill(buffer, rows, size)
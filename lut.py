@@ -0,0 +1,160 @@
+from .color import Color
+from array import array
+from operator import attrgetter
+from struct import Struct
+import sys
+
+
+__all__ = ['ColorLUT']
+
+
+class ColorLUT:
+    '''A 3D color lookup table.  Any function taking and returning a
+        Color is sampled once on a size x size x size grid over the RGB
+        cube, then colors are looked up with trilinear interpolation
+        between the eight surrounding samples.  Alpha is never changed.
+
+            lut = ColorLUT.bake(lambda c: c.multiply(tint).lighten(floor))
+            graded = lut.apply_buffer(frame)
+    '''
+
+    __slots__ = ['size', 'table']
+
+    # Files are little endian whatever machine wrote them
+    header = Struct('<4sI')
+    magic = b'LUT3'
+
+    def __init__(self, size=33, table=None):
+        if size < 2:
+            raise ValueError('ColorLUT size must be at least 2')
+        self.size = size
+        count = size * size * size * 3
+        if table is None:
+            steps = [i / (size - 1) for i in range(size)]
+            table = array('d')
+            for r in steps:
+                for g in steps:
+                    for b in steps:
+                        table.extend((r, g, b))
+        elif not isinstance(table, array) or table.typecode != 'd':
+            table = array('d', table)
+        if len(table) != count:
+            raise ValueError('ColorLUT table needs {} values, got {}'
+                             .format(count, len(table)))
+        self.table = table
+
+    @classmethod
+    def bake(cls, function, size=33):
+        '''Samples function over the RGB cube.  function receives an
+            opaque Color for every grid point and returns a Color, whose
+            channels are clamped between 0 and 1'''
+        steps = [i / (size - 1) for i in range(size)]
+        table = array('d')
+        for r in steps:
+            for g in steps:
+                for b in steps:
+                    color = function(Color(r, g, b))
+                    table.extend((min(max(color.red, 0.0), 1.0),
+                                  min(max(color.green, 0.0), 1.0),
+                                  min(max(color.blue, 0.0), 1.0)))
+        return cls(size, table)
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, self.size)
+
+    def apply_columns(self, red, green, blue):
+        '''Looks up columns of red, green and blue values between 0 and 1
+            and returns array('d') columns of the results'''
+        table = self.table
+        last = self.size - 1
+        limit = last - 1
+        db = 3
+        dg = self.size * 3
+        dr = self.size * dg
+        reds = array('d')
+        greens = array('d')
+        blues = array('d')
+        for r, g, b in zip(red, green, blue):
+            r = min(max(r, 0.0), 1.0) * last
+            g = min(max(g, 0.0), 1.0) * last
+            b = min(max(b, 0.0), 1.0) * last
+            ri = min(int(r), limit)
+            gi = min(int(g), limit)
+            bi = min(int(b), limit)
+            tr = r - ri
+            tg = g - gi
+            tb = b - bi
+            i = ri * dr + gi * dg + bi * db
+            for channel, column in enumerate((reds, greens, blues)):
+                j = i + channel
+                c000 = table[j]
+                c001 = table[j + db]
+                c010 = table[j + dg]
+                c011 = table[j + dg + db]
+                c100 = table[j + dr]
+                c101 = table[j + dr + db]
+                c110 = table[j + dr + dg]
+                c111 = table[j + dr + dg + db]
+                c00 = c000 + (c001 - c000) * tb
+                c01 = c010 + (c011 - c010) * tb
+                c10 = c100 + (c101 - c100) * tb
+                c11 = c110 + (c111 - c110) * tb
+                c0 = c00 + (c01 - c00) * tg
+                c1 = c10 + (c11 - c10) * tg
+                column.append(c0 + (c1 - c0) * tr)
+        return reds, greens, blues
+
+    def apply(self, color):
+        'Returns a new Color looked up through the table'
+        (red,), (green,), (blue,) = self.apply_columns(
+            (color.red,), (color.green,), (color.blue,))
+        return color.__class__(red, green, blue, color.alpha)
+
+    def apply_many(self, colors):
+        'Returns a list of new Colors looked up through the table'
+        if not isinstance(colors, (list, tuple)):
+            colors = list(colors)
+        red, green, blue = self.apply_columns(
+            [c.red for c in colors], [c.green for c in colors],
+            [c.blue for c in colors])
+        alpha = map(attrgetter('alpha'), colors)
+        return list(map(Color, red, green, blue, alpha))
+
+    def apply_buffer(self, buffer):
+        '''Returns a new ColorBuffer looked up through the table.  Each
+            distinct pixel value is only interpolated once'''
+        return buffer.map_rgb(self.apply_columns)
+
+    def __bytes__(self):
+        table = self.table
+        if sys.byteorder == 'big':
+            table = array('d', table)
+            table.byteswap()
+        return self.header.pack(self.magic, self.size) + table.tobytes()
+
+    @classmethod
+    def from_bytes(cls, packed_bytes):
+        magic, size = cls.header.unpack_from(packed_bytes)
+        if magic != cls.magic:
+            raise ValueError('Not a ColorLUT: bad magic {!r}'.format(magic))
+        table = array('d')
+        table.frombytes(packed_bytes[cls.header.size:])
+        if sys.byteorder == 'big':
+            table.byteswap()
+        return cls(size, table)
+
+    def write(self, writable):
+        return writable.write(bytes(self))
+
+    @classmethod
+    def read(cls, readable):
+        'Reads a table written by write from a binary file'
+        header = readable.read(cls.header.size)
+        magic, size = cls.header.unpack(header)
+        if magic != cls.magic:
+            raise ValueError('Not a ColorLUT: bad magic {!r}'.format(magic))
+        table = array('d')
+        table.frombytes(readable.read(size * size * size * 3 * table.itemsize))
+        if sys.byteorder == 'big':
+            table.byteswap()
+        return cls(size, table)
@@ -0,0 +1,324 @@
+from .bitmap import ColorBuffer
+from .color import Color
+from array import array
+from collections import Counter
+from heapq import heapify, heappop
+import sys
+
+
+__all__ = ['median_cut', 'octree', 'PaletteMapper']
+
+
+# Palettes are built from RGB only and ignore alpha.  Colors are first
+# counted exactly, and if there are no more distinct colors than the
+# palette has room for they are the palette.  Otherwise they are binned
+# into a 5 bit per channel histogram that keeps the sum of the real
+# colors in each cell, so palette entries are the true mean of the
+# pixels they stand for rather than cell centers.
+
+_shift = 3
+
+
+def _packed(source):
+    'Returns RGBA8888 bytes for a ColorBuffer or an iterable of Colors'
+    if isinstance(source, ColorBuffer):
+        return source.data
+    return Color.pack_many(source)
+
+
+def _count(source):
+    '''Returns the distinct colors of source as red, green and blue bytes
+        along with the number of pixels of each'''
+    data = bytearray(_packed(source))
+    data[3::4] = bytes(len(data) // 4)
+    pixels = memoryview(data).cast('I')
+    counts = Counter(pixels)
+    pixels.release()
+    unique = array('I', counts).tobytes()
+    return (unique[0::4], unique[1::4], unique[2::4],
+            list(counts.values()))
+
+
+def _histogram(red, green, blue, counts):
+    '''Returns the populated cells of counted colors as a dict of 5 bit
+        (red, green, blue) to [pixels, red sum, green sum, blue sum]'''
+    cells = {}
+    for r, g, b, n in zip(red, green, blue, counts):
+        key = (r >> _shift, g >> _shift, b >> _shift)
+        cell = cells.get(key)
+        if cell is None:
+            cells[key] = [n, r * n, g * n, b * n]
+        else:
+            cell[0] += n
+            cell[1] += r * n
+            cell[2] += g * n
+            cell[3] += b * n
+    return cells
+
+
+def _exact(red, green, blue, counts):
+    'Returns counted colors as a palette, most common first'
+    order = sorted(range(len(counts)), key=counts.__getitem__, reverse=True)
+    return [Color(red[i] / 255, green[i] / 255, blue[i] / 255)
+            for i in order]
+
+
+def _mean(cells):
+    'Returns the pixel weighted mean Color of a list of histogram cells'
+    pixels = sum(c[0] for c in cells)
+    return (pixels, Color(sum(c[1] for c in cells) / pixels / 255,
+                          sum(c[2] for c in cells) / pixels / 255,
+                          sum(c[3] for c in cells) / pixels / 255))
+
+
+def _by_population(entries):
+    entries.sort(key=lambda entry: entry[0], reverse=True)
+    return [color for _, color in entries]
+
+
+def _box(entries):
+    '''Returns a median cut box as its widest channel range, the index
+        of that channel in the entries, and the entries'''
+    widest = (0, 1)
+    for channel in (1, 2, 3):
+        values = [entry[channel] for entry in entries]
+        width = max(values) - min(values)
+        if width > widest[0]:
+            widest = (width, channel)
+    return [widest[0], widest[1], entries]
+
+
+def median_cut(source, count=256):
+    '''Returns a palette of at most count Colors for a ColorBuffer or a
+        list of Colors, most common first.
+
+        The color cube is split in two along its widest channel at the
+        median pixel, and the box with the widest channel is split again
+        until there are count boxes, each giving its mean color.
+
+            palette = median_cut(image, 16)
+    '''
+    counted = _count(source)
+    if len(counted[3]) <= count:
+        return _exact(*counted)
+    entries = [(cell[0], cell[1] / cell[0], cell[2] / cell[0],
+                cell[3] / cell[0], cell)
+               for cell in _histogram(*counted).values()]
+    boxes = [_box(entries)]
+    while len(boxes) < count:
+        box = max(boxes, key=lambda box: box[0])
+        width, channel, entries = box
+        if width == 0:
+            break
+        entries.sort(key=lambda entry: entry[channel])
+        half = sum(entry[0] for entry in entries) / 2
+        seen = 0
+        for split, entry in enumerate(entries, 1):
+            seen += entry[0]
+            if seen >= half:
+                break
+        split = min(split, len(entries) - 1)
+        boxes.remove(box)
+        boxes.append(_box(entries[:split]))
+        boxes.append(_box(entries[split:]))
+    return _by_population([_mean([entry[4] for entry in entries])
+                           for _, _, entries in boxes])
+
+
+def octree(source, count=256):
+    '''Returns a palette of at most count Colors for a ColorBuffer or a
+        list of Colors, most common first.
+
+        Colors are leaves of an octree 5 levels deep.  Starting from the
+        deepest level, the siblings with the fewest pixels between them
+        are merged into their parent until count leaves are left.
+
+            palette = octree(image, 16)
+    '''
+    counted = _count(source)
+    if len(counted[3]) <= count:
+        return _exact(*counted)
+    # Leaves are keyed by (depth, red, green, blue) with channels cut
+    # down to depth bits, so a leaf's parent drops one bit per channel
+    depth = 8 - _shift
+    leaves = {(depth,) + key: cell
+              for key, cell in _histogram(*counted).items()}
+    while len(leaves) > count and depth > 0:
+        parents = {}
+        for key, cell in leaves.items():
+            if key[0] == depth:
+                _, r, g, b = key
+                parents.setdefault((depth - 1, r >> 1, g >> 1, b >> 1),
+                                   []).append(key)
+        queue = [(sum(leaves[k][0] for k in children), parent, children)
+                 for parent, children in parents.items()]
+        heapify(queue)
+        while queue and len(leaves) > count:
+            _, parent, children = heappop(queue)
+            merged = [0, 0, 0, 0]
+            for key in children:
+                cell = leaves.pop(key)
+                for i in range(4):
+                    merged[i] += cell[i]
+            leaves[parent] = merged
+        depth -= 1
+    return _by_population([_mean([cell]) for cell in leaves.values()])
+
+
+def _axis(value, low, high):
+    '''Returns the squared distances from value to the nearest and the
+        furthest point of the range low to high'''
+    if value < low:
+        near = low - value
+    elif value > high:
+        near = value - high
+    else:
+        near = 0
+    far = max(value - low, high - value)
+    return near * near, far * far
+
+
+def _candidates(entries, reds, greens, blues):
+    '''Returns the (index, red, green, blue) palette entries that can be
+        nearest to some point of the box spanned by the cell centers'''
+    bounds = []
+    for index, (r, g, b) in entries:
+        rn, rf = _axis(r, reds[0], reds[-1])
+        gn, gf = _axis(g, greens[0], greens[-1])
+        bn, bf = _axis(b, blues[0], blues[-1])
+        bounds.append((rn + gn + bn, rf + gf + bf))
+    limit = min(far for _, far in bounds)
+    return [(index, r, g, b) for (index, (r, g, b)), (near, _)
+            in zip(entries, bounds) if near <= limit]
+
+
+class PaletteMapper:
+    '''Maps colors to the index of the nearest color in a palette of up
+        to 256 Colors, by RGB distance.
+
+        The nearest entry is found ahead of time for every cell of a cube
+        with bits per channel (32768 cells for the default of 5), so
+        mapping a pixel is one table lookup rather than a search of the
+        palette.  Alpha is ignored.
+
+            mapper = PaletteMapper(median_cut(image, 256))
+            indexed = mapper.indices(image)
+            preview = mapper.apply_buffer(image)
+    '''
+
+    __slots__ = ['palette', 'bits', 'table', '_planes', '_entries']
+
+    def __init__(self, palette, bits=5):
+        palette = list(palette)
+        if not 0 < len(palette) <= 256:
+            raise ValueError('A palette needs 1 to 256 colors, got {}'
+                             .format(len(palette)))
+        if not 1 <= bits <= 5:
+            raise ValueError('bits must be between 1 and 5, got {}'
+                             .format(bits))
+        self.palette = palette
+        self.bits = bits
+        packed = Color.pack_many(palette)
+        self._planes = (packed[0::4], packed[1::4], packed[2::4])
+        self.table = self._build()
+        # Indexing a list is quicker than indexing bytes
+        self._entries = list(self.table)
+
+    def _build(self):
+        '''Finds the nearest palette index for the center of every cell.
+
+            The cube is walked in blocks of 4 x 4 x 4 cells.  Any entry
+            further from a block than some other entry is from the far
+            corner of the block can never be nearest inside it, so only
+            the few entries left are compared for its cells.  Distances
+            are scaled by 256 with the index added, so the running
+            map(min, ...) keeps the index of the nearest entry.
+        '''
+        bits = self.bits
+        shift = 8 - bits
+        cells = 1 << bits
+        centers = [(c << shift) + (1 << shift) // 2 for c in range(cells)]
+        size = min(4, cells)
+        entries = list(enumerate(zip(*self._planes)))
+        table = bytearray(cells ** 3)
+        for r0 in range(0, cells, size):
+            reds = centers[r0:r0 + size]
+            for g0 in range(0, cells, size):
+                greens = centers[g0:g0 + size]
+                for b0 in range(0, cells, size):
+                    blues = centers[b0:b0 + size]
+                    best = None
+                    for index, r, g, b in _candidates(entries, reds, greens,
+                                                      blues):
+                        dr = [(c - r) * (c - r) << 8 for c in reds]
+                        dg = [(c - g) * (c - g) << 8 for c in greens]
+                        db = [((c - b) * (c - b) << 8) + index
+                              for c in blues]
+                        red_green = [x + y for x in dr for y in dg]
+                        distances = [x + y for x in red_green for y in db]
+                        if best is None:
+                            best = distances
+                        else:
+                            best = list(map(min, best, distances))
+                    nearest = iter(best)
+                    for r in range(r0, r0 + size):
+                        for g in range(g0, g0 + size):
+                            start = (r * cells + g) * cells + b0
+                            table[start:start + size] = bytes(
+                                next(nearest) & 0xFF for _ in range(size))
+        return bytes(table)
+
+    def _cells(self, red, green, blue):
+        '''Returns the cube cell of every pixel as an array('H').  Each
+            channel lands in its own bits of the cell, so the low and high
+            bytes of the cells are translates of the channels or'ed
+            together as big integers'''
+        bits = self.bits
+        shift = 8 - bits
+        count = len(red)
+        low = high = 0
+        for channel, offset in ((red, 2 * bits), (green, bits), (blue, 0)):
+            cells = [(i >> shift) << offset for i in range(256)]
+            low |= int.from_bytes(channel.translate(
+                bytes(c & 0xFF for c in cells)), 'little')
+            high |= int.from_bytes(channel.translate(
+                bytes(c >> 8 for c in cells)), 'little')
+        wide = bytearray(count * 2)
+        wide[0::2] = low.to_bytes(count, 'little')
+        wide[1::2] = high.to_bytes(count, 'little')
+        result = array('H')
+        result.frombytes(wide)
+        if sys.byteorder == 'big':
+            result.byteswap()
+        return result
+
+    def nearest(self, color):
+        'Returns the palette index for a Color'
+        red, green, blue, _ = color.rgba8888
+        shift = 8 - self.bits
+        cell = ((red >> shift) << 2 * self.bits | (green >> shift) << self.bits
+                | blue >> shift)
+        return self.table[cell]
+
+    def indices(self, source):
+        '''Returns the palette index of every pixel of a ColorBuffer or
+            list of Colors as bytes.
+
+            Cells are more than 8 bits, so they can't go through
+            bytes.translate and the lookup is one map over the cells.
+            That runs at about 15 million pixels a second on a 1920 x
+            1080 buffer.
+        '''
+        data = _packed(source)
+        cells = self._cells(bytes(data[0::4]), bytes(data[1::4]),
+                            bytes(data[2::4]))
+        return bytes(map(self._entries.__getitem__, cells))
+
+    def apply_buffer(self, buffer):
+        '''Returns a new ColorBuffer with every pixel replaced by its
+            palette color, keeping alpha'''
+        indices = self.indices(buffer)
+        red, green, blue = [indices.translate(plane.ljust(256, b'\0'))
+                            for plane in self._planes]
+        return buffer._from_planes(buffer.width, buffer.height, red, green,
+                                   blue, bytes(buffer.data[3::4]))
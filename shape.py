@@ -1,8 +1,14 @@
-from .vector import V2
+from .vector import V2, V2Array
+from array import array
+from fractions import Fraction
+from itertools import compress, repeat
+from math import floor
+from operator import add, sub, mul, attrgetter
 from struct import Struct
 
 
-__all__ = ['Circle', 'Rect']
+__all__ = ['Circle', 'Rect', 'CircleArray', 'RectArray',
+           'containment_pairs', 'segment_intersections']
 
 pi = 3.14159265358979323846264
 
@@ -21,8 +27,14 @@ class Circle:
 
     @classmethod
     def from_bytes(cls, packed_bytes):
-        radius = cls.packer.unpack(packed_bytes[:8])[0]
-        position = V2.from_bytes(packed_bytes[8:])
+        return cls.from_buffer(packed_bytes)
+
+    @classmethod
+    def from_buffer(cls, buffer, offset=0):
+        '''Creates a new circle from the record starting at offset
+            in any bytes-like object, without slicing it'''
+        radius = cls.packer.unpack_from(buffer, offset)[0]
+        position = V2.from_buffer(buffer, offset + cls.packer.size)
         return cls(radius=radius, position=position)
 
     @property
@@ -33,9 +45,28 @@ class Circle:
     def diameter(self):
         return self.radius * 2
 
+    @property
+    def bounds(self):
+        'Returns the bounding box as an (x1, y1, x2, y2) tuple'
+        x = self.position.x
+        y = self.position.y
+        r = self.radius
+        return x - r, y - r, x + r, y + r
+
     def contains(self, point):
         return (self.position - point).length < self.radius
 
+    def contains_many(self, points):
+        '''Returns a list of bools, one per point, matching contains.
+            points is a V2Array or anything with x and y columns.
+            Compares squared distances so no vectors or square roots
+            are made along the way'''
+        cx = self.position.x
+        cy = self.position.y
+        limit = self.radius * self.radius
+        return [(x - cx) * (x - cx) + (y - cy) * (y - cy) < limit
+                for x, y in zip(points.x, points.y)]
+
     def translate(self, vector):
         self.position += vector
 
@@ -69,8 +100,14 @@ class Rect:
 
     @classmethod
     def from_bytes(cls, packed_bytes):
-        position = V2.from_bytes(packed_bytes[:16])
-        size = V2.from_bytes(packed_bytes[16:])
+        return cls.from_buffer(packed_bytes)
+
+    @classmethod
+    def from_buffer(cls, buffer, offset=0):
+        '''Creates a new rect from the record starting at offset
+            in any bytes-like object, without slicing it'''
+        position = V2.from_buffer(buffer, offset)
+        size = V2.from_buffer(buffer, offset + V2.packer.size)
         return cls(position=position, size=size)
 
     def __bytes__(self):
@@ -123,12 +160,29 @@ class Rect:
     def y2(self):
         return self.position.y + self.size.y
 
+    @property
+    def bounds(self):
+        'Returns the bounding box as an (x1, y1, x2, y2) tuple'
+        x = self.position.x
+        y = self.position.y
+        return x, y, x + self.size.x, y + self.size.y
+
     def contains(self, point):
         if point.x >= self.x and point.x < self.x2:
             if point.y >= self.y and point.y < self.y2:
                 return True
         return False
 
+    def contains_many(self, points):
+        '''Returns a list of bools, one per point, matching contains.
+            points is a V2Array or anything with x and y columns'''
+        x1 = self.position.x
+        y1 = self.position.y
+        x2 = x1 + self.size.x
+        y2 = y1 + self.size.y
+        return [x1 <= x < x2 and y1 <= y < y2
+                for x, y in zip(points.x, points.y)]
+
     def translate(self, vector):
         self.position += vector
 
@@ -139,6 +193,274 @@ class Rect:
         return writable.write(bytes(self))
 
 
+def _offsets(vector, count):
+    '''Returns x and y iterables for translating count shapes by
+        a single V2 or by one vector per shape from a V2Array'''
+    if isinstance(vector, V2Array):
+        if len(vector) != count:
+            raise ValueError("Expected {} vectors, got {}"
+                             .format(count, len(vector)))
+        return vector.x, vector.y
+    return repeat(vector.x), repeat(vector.y)
+
+
+class CircleArray:
+    '''Many circles stored as contiguous radius, x and y columns
+
+        Indexing returns a regular Circle, and view() wraps part of the
+        columns without copying them, so changes go to the original.
+
+            circles = CircleArray.from_circles([Circle(1), Circle(2)])
+            circles.translate(V2(5, 0))
+            assert circles[1] == Circle(2, V2(5, 0))
+    '''
+
+    __slots__ = ['radius', 'x', 'y']
+
+    def __init__(self, radius=(), x=(), y=()):
+        self.radius = array('d', radius)
+        self.x = array('d', x)
+        self.y = array('d', y)
+        if not len(self.radius) == len(self.x) == len(self.y):
+            raise ValueError("All columns must be the same length")
+
+    @classmethod
+    def wrap(cls, radius, x, y):
+        '''Makes an array around existing columns of doubles, like arrays
+            or memoryviews, without copying them'''
+        if not len(radius) == len(x) == len(y):
+            raise ValueError("All columns must be the same length")
+        result = cls.__new__(cls)
+        result.radius = radius
+        result.x = x
+        result.y = y
+        return result
+
+    @classmethod
+    def from_circles(cls, circles):
+        'Creates a new array from an iterable of Circle instances'
+        if not isinstance(circles, (list, tuple)):
+            circles = list(circles)
+        positions = list(map(attrgetter('position'), circles))
+        return cls.wrap(array('d', map(attrgetter('radius'), circles)),
+                        array('d', map(attrgetter('x'), positions)),
+                        array('d', map(attrgetter('y'), positions)))
+
+    def to_circles(self):
+        'Returns a list of new Circle instances, one per element'
+        return list(self)
+
+    def view(self, start=None, stop=None):
+        '''Returns a CircleArray over part of the columns that shares
+            their memory instead of copying'''
+        key = slice(start, stop)
+        return self.wrap(memoryview(self.radius)[key],
+                         memoryview(self.x)[key],
+                         memoryview(self.y)[key])
+
+    def __repr__(self):
+        return "{}({} circles)".format(self.__class__.__name__,
+                                       len(self.radius))
+
+    def __len__(self):
+        return len(self.radius)
+
+    def __iter__(self):
+        for radius, x, y in zip(self.radius, self.x, self.y):
+            yield Circle(radius, V2(x, y))
+
+    def __getitem__(self, key):
+        '''Indexing returns a Circle copy of that element,
+            slicing returns a new CircleArray'''
+        if isinstance(key, slice):
+            return self.__class__(self.radius[key], self.x[key], self.y[key])
+        return Circle(self.radius[key], V2(self.x[key], self.y[key]))
+
+    def __setitem__(self, key, circle):
+        self.radius[key] = circle.radius
+        self.x[key] = circle.position.x
+        self.y[key] = circle.position.y
+
+    @property
+    def area(self):
+        'The area of every circle'
+        radius = self.radius
+        return array('d', map(mul, map(mul, radius, radius), repeat(pi)))
+
+    @property
+    def diameter(self):
+        'The diameter of every circle'
+        return array('d', map(add, self.radius, self.radius))
+
+    @property
+    def bounds(self):
+        '''Returns the bounding boxes as x1, y1, x2 and y2 columns'''
+        radius = self.radius
+        return (array('d', map(sub, self.x, radius)),
+                array('d', map(sub, self.y, radius)),
+                array('d', map(add, self.x, radius)),
+                array('d', map(add, self.y, radius)))
+
+    def contains(self, point):
+        '''Returns a list of bools, one per circle, that matches
+            calling contains(point) on each'''
+        px = point.x
+        py = point.y
+        return [(x - px) * (x - px) + (y - py) * (y - py) < radius * radius
+                for radius, x, y in zip(self.radius, self.x, self.y)]
+
+    def translate(self, vector):
+        '''Moves every circle by a V2, or each by its own vector
+            from a V2Array'''
+        dx, dy = _offsets(vector, len(self.radius))
+        self.x[:] = array('d', map(add, self.x, dx))
+        self.y[:] = array('d', map(add, self.y, dy))
+
+    def scale(self, factor):
+        'Scales the radius of every circle'
+        self.radius[:] = array('d', map(mul, self.radius, repeat(factor)))
+
+
+class RectArray:
+    '''Many rects stored as contiguous x, y, width and height columns
+
+        Indexing returns a regular Rect, and view() wraps part of the
+        columns without copying them, so changes go to the original.
+
+            rects = RectArray.from_rects([Rect(V2(0, 0), V2(2, 3))])
+            assert rects.area[0] == 6
+    '''
+
+    __slots__ = ['x', 'y', 'width', 'height']
+
+    def __init__(self, x=(), y=(), width=(), height=()):
+        self.x = array('d', x)
+        self.y = array('d', y)
+        self.width = array('d', width)
+        self.height = array('d', height)
+        if not len(self.x) == len(self.y) == len(self.width) == \
+                len(self.height):
+            raise ValueError("All columns must be the same length")
+
+    @classmethod
+    def wrap(cls, x, y, width, height):
+        '''Makes an array around existing columns of doubles, like arrays
+            or memoryviews, without copying them'''
+        if not len(x) == len(y) == len(width) == len(height):
+            raise ValueError("All columns must be the same length")
+        result = cls.__new__(cls)
+        result.x = x
+        result.y = y
+        result.width = width
+        result.height = height
+        return result
+
+    @classmethod
+    def from_rects(cls, rects):
+        'Creates a new array from an iterable of Rect instances'
+        if not isinstance(rects, (list, tuple)):
+            rects = list(rects)
+        positions = list(map(attrgetter('position'), rects))
+        sizes = list(map(attrgetter('size'), rects))
+        return cls.wrap(array('d', map(attrgetter('x'), positions)),
+                        array('d', map(attrgetter('y'), positions)),
+                        array('d', map(attrgetter('x'), sizes)),
+                        array('d', map(attrgetter('y'), sizes)))
+
+    def to_rects(self):
+        'Returns a list of new Rect instances, one per element'
+        return list(self)
+
+    def view(self, start=None, stop=None):
+        '''Returns a RectArray over part of the columns that shares
+            their memory instead of copying'''
+        key = slice(start, stop)
+        return self.wrap(memoryview(self.x)[key],
+                         memoryview(self.y)[key],
+                         memoryview(self.width)[key],
+                         memoryview(self.height)[key])
+
+    def __repr__(self):
+        return "{}({} rects)".format(self.__class__.__name__, len(self.x))
+
+    def __len__(self):
+        return len(self.x)
+
+    def __iter__(self):
+        for x, y, width, height in zip(self.x, self.y,
+                                       self.width, self.height):
+            yield Rect(V2(x, y), V2(width, height))
+
+    def __getitem__(self, key):
+        '''Indexing returns a Rect copy of that element,
+            slicing returns a new RectArray'''
+        if isinstance(key, slice):
+            return self.__class__(self.x[key], self.y[key],
+                                  self.width[key], self.height[key])
+        return Rect(V2(self.x[key], self.y[key]),
+                    V2(self.width[key], self.height[key]))
+
+    def __setitem__(self, key, rect):
+        self.x[key] = rect.position.x
+        self.y[key] = rect.position.y
+        self.width[key] = rect.size.x
+        self.height[key] = rect.size.y
+
+    @property
+    def area(self):
+        'The area of every rect'
+        return array('d', map(mul, self.width, self.height))
+
+    @property
+    def perimeter(self):
+        'The perimeter of every rect'
+        return array('d', map(mul, map(add, self.width, self.height),
+                              repeat(2.0)))
+
+    @property
+    def bounds(self):
+        '''Returns the bounding boxes as x1, y1, x2 and y2 columns'''
+        return (array('d', self.x),
+                array('d', self.y),
+                array('d', map(add, self.x, self.width)),
+                array('d', map(add, self.y, self.height)))
+
+    def contains(self, point):
+        '''Returns a list of bools, one per rect, that matches
+            calling contains(point) on each'''
+        px = point.x
+        py = point.y
+        return [x <= px < x + width and y <= py < y + height
+                for x, y, width, height in zip(self.x, self.y,
+                                               self.width, self.height)]
+
+    def translate(self, vector):
+        '''Moves every rect by a V2, or each by its own vector
+            from a V2Array'''
+        dx, dy = _offsets(vector, len(self.x))
+        self.x[:] = array('d', map(add, self.x, dx))
+        self.y[:] = array('d', map(add, self.y, dy))
+
+    def scale(self, factor):
+        'Scales the size of every rect'
+        factor = repeat(factor)
+        self.width[:] = array('d', map(mul, self.width, factor))
+        self.height[:] = array('d', map(mul, self.height, factor))
+
+
+def containment_pairs(shapes, points):
+    '''Returns (shape index, point index) pairs for every point that
+        each shape contains.  points is a V2Array or anything with x
+        and y columns.  For a full hit matrix, call contains_many on
+        each shape instead'''
+    found = []
+    point_indices = range(len(points.x))
+    for i, shape in enumerate(shapes):
+        hits = compress(point_indices, shape.contains_many(points))
+        found.extend(zip(repeat(i), hits))
+    return found
+
+
 class Line:
 
     __slots__ = ['p1', 'p2']
@@ -151,6 +473,19 @@ class Line:
     def length(self):
         return (self.p2 - self.p1).length
 
+    @property
+    def bounds(self):
+        'Returns the bounding box as an (x1, y1, x2, y2) tuple'
+        x1 = self.p1.x
+        y1 = self.p1.y
+        x2 = self.p2.x
+        y2 = self.p2.y
+        return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+
+    def translate(self, vector):
+        self.p1 += vector
+        self.p2 += vector
+
     def intersection(self, other):
         d1 = self.p2 - self.p1
         d2 = other.p2 - other.p1
@@ -164,3 +499,131 @@ class Line:
             return V2(x, y)
         except ZeroDivisionError:
             raise NotImplementedError('Axis-aligned lines not yet supported')
+
+    def segment_intersection(self, other):
+        '''Returns the point where the two segments meet, or None.
+            Unlike intersection, this only considers the points between
+            p1 and p2, and handles vertical, horizontal, collinear and
+            zero-length segments.  Collinear overlapping segments return
+            the first point of the overlap'''
+        point = _segment_intersection(self.p1.x, self.p1.y,
+                                      self.p2.x, self.p2.y,
+                                      other.p1.x, other.p1.y,
+                                      other.p2.x, other.p2.y)
+        if point is None:
+            return None
+        return V2(*point)
+
+
+# Relative error bound for the float orientation determinant, from
+# Shewchuk's "Adaptive Precision Floating-Point Arithmetic"
+_orientation_error = (3.0 + 16.0 * 2.0 ** -53) * 2.0 ** -53
+
+
+def _orientation(ax, ay, bx, by, cx, cy):
+    '''Returns 1 if c is left of the line a->b, -1 if right, 0 if on it.
+        Falls back to exact arithmetic when floats can't tell'''
+    left = (bx - ax) * (cy - ay)
+    right = (by - ay) * (cx - ax)
+    determinant = left - right
+    if abs(determinant) > _orientation_error * (abs(left) + abs(right)):
+        return (determinant > 0) - (determinant < 0)
+    ax, ay = Fraction(ax), Fraction(ay)
+    determinant = ((Fraction(bx) - ax) * (Fraction(cy) - ay) -
+                   (Fraction(by) - ay) * (Fraction(cx) - ax))
+    return (determinant > 0) - (determinant < 0)
+
+
+def _segment_intersection(ax, ay, bx, by, cx, cy, dx, dy):
+    '''Returns (x, y) where segment a-b meets segment c-d, or None'''
+    o1 = _orientation(ax, ay, bx, by, cx, cy)
+    o2 = _orientation(ax, ay, bx, by, dx, dy)
+    if o1 == o2 and o1 != 0:
+        return None
+    o3 = _orientation(cx, cy, dx, dy, ax, ay)
+    o4 = _orientation(cx, cy, dx, dy, bx, by)
+    if o3 == o4 and o3 != 0:
+        return None
+    if o1 == o2 == o3 == o4 == 0:
+        # Collinear, so compare along whichever axis the points spread on
+        if max(ax, bx, cx, dx) - min(ax, bx, cx, dx) >= \
+                max(ay, by, cy, dy) - min(ay, by, cy, dy):
+            axis = 0
+        else:
+            axis = 1
+        ends = ((ax, ay), (bx, by), (cx, cy), (dx, dy))
+        lo1, hi1 = sorted((ends[0][axis], ends[1][axis]))
+        lo2, hi2 = sorted((ends[2][axis], ends[3][axis]))
+        start = max(lo1, lo2)
+        if start > min(hi1, hi2):
+            return None
+        for end in ends:
+            if end[axis] == start:
+                return end
+    # Where an endpoint touches the other segment, return it exactly
+    if o1 == 0:
+        return cx, cy
+    if o2 == 0:
+        return dx, dy
+    if o3 == 0:
+        return ax, ay
+    if o4 == 0:
+        return bx, by
+    ex = bx - ax
+    ey = by - ay
+    fx = dx - cx
+    fy = dy - cy
+    t = ((cx - ax) * fy - (cy - ay) * fx) / (ex * fy - ey * fx)
+    return ax + ex * t, ay + ey * t
+
+
+def segment_intersections(lines, cell_size=None):
+    '''Finds every pair of Line segments that touch or cross
+
+        Returns a sorted list of (i, j, point) with i < j, where point is
+        the V2 from lines[i].segment_intersection(lines[j]).
+
+        Segments are bucketed into a uniform grid by their bounding
+        boxes and only segments sharing a cell are tested, so the cost is
+        roughly linear in the number of segments plus intersections.
+        cell_size defaults to the average segment extent.
+    '''
+    boxes = [line.bounds for line in lines]
+    if not boxes:
+        return []
+    if cell_size is None:
+        total = sum(max(x2 - x1, y2 - y1) for x1, y1, x2, y2 in boxes)
+        cell_size = total / len(boxes) or 1.0
+
+    cells = {}
+    for i, (x1, y1, x2, y2) in enumerate(boxes):
+        for column in range(floor(x1 / cell_size), floor(x2 / cell_size) + 1):
+            for row in range(floor(y1 / cell_size),
+                             floor(y2 / cell_size) + 1):
+                cell = cells.get((column, row))
+                if cell is None:
+                    cells[(column, row)] = [i]
+                else:
+                    cell.append(i)
+
+    found = []
+    for (column, row), members in cells.items():
+        for n, i in enumerate(members):
+            ax1, ay1, ax2, ay2 = boxes[i]
+            a = lines[i]
+            for j in members[n + 1:]:
+                bx1, by1, bx2, by2 = boxes[j]
+                if ax1 > bx2 or bx1 > ax2 or ay1 > by2 or by1 > ay2:
+                    continue
+                # A pair can share many cells, so only test it in the one
+                # holding the low corner of where their boxes overlap
+                if (floor(max(ax1, bx1) / cell_size) != column or
+                        floor(max(ay1, by1) / cell_size) != row):
+                    continue
+                b = lines[j]
+                point = _segment_intersection(a.p1.x, a.p1.y, a.p2.x, a.p2.y,
+                                              b.p1.x, b.p1.y, b.p2.x, b.p2.y)
+                if point is not None:
+                    found.append((i, j, V2(*point)))
+    found.sort(key=lambda hit: (hit[0], hit[1]))
+    return found
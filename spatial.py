@@ -0,0 +1,1086 @@
+from array import array
+from heapq import heappush, heapreplace
+from itertools import compress, product
+from math import floor, sqrt
+from operator import and_, attrgetter
+
+
+__all__ = ['WeldIndex', 'KDTree', 'SpatialHash', 'QuadTree', 'AABBTree']
+
+
+class WeldIndex:
+    '''Finds near-equal vectors using the same tolerance as V2 and V3 ==
+
+        Vectors are bucketed on a grid whose cells are as wide as the
+        tolerance, so a lookup only compares against the vectors in the
+        neighbouring cells.  The first vector added within tolerance of
+        a spot becomes the canonical one everything else welds onto.
+
+            index = WeldIndex()
+            points = [V2(1, 1), V2(5, 5), V2(1.00001, 1)]
+            assert index.weld(points) == [0, 1, 0]
+            assert V2(5, 5.00002) in index
+    '''
+
+    __slots__ = ['tolerance', 'vectors', '_cells', '_offsets']
+
+    def __init__(self, tolerance=0.0001):
+        self.tolerance = float(tolerance)
+        self.vectors = []
+        self._cells = {}
+        self._offsets = None
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def __getitem__(self, index):
+        'Returns the canonical vector stored at index'
+        return self.vectors[index]
+
+    def __iter__(self):
+        return iter(self.vectors)
+
+    def __contains__(self, vector):
+        return self.find(vector) is not None
+
+    def _cell(self, components):
+        tolerance = self.tolerance
+        return tuple([floor(c / tolerance) for c in components])
+
+    def _find(self, components, cell):
+        if self._offsets is None:
+            self._offsets = list(product((0, -1, 1), repeat=len(cell)))
+        cells = self._cells
+        vectors = self.vectors
+        tolerance = self.tolerance
+        for offset in self._offsets:
+            bucket = cells.get(tuple(map(sum, zip(cell, offset))))
+            if bucket is None:
+                continue
+            for index in bucket:
+                for a, b in zip(components, vectors[index]):
+                    if abs(a - b) > tolerance:
+                        break
+                else:
+                    return index
+        return None
+
+    def find(self, vector):
+        '''Returns the index of the canonical vector within tolerance of
+            vector, or None if there isn't one'''
+        if not self.vectors:
+            return None
+        components = tuple(vector)
+        return self._find(components, self._cell(components))
+
+    def add(self, vector):
+        '''Returns the index of the canonical vector within tolerance of
+            vector, adding vector as a new canonical one if needed'''
+        components = tuple(vector)
+        cell = self._cell(components)
+        if self.vectors:
+            index = self._find(components, cell)
+            if index is not None:
+                return index
+        index = len(self.vectors)
+        self.vectors.append(vector)
+        self._cells.setdefault(cell, []).append(index)
+        return index
+
+    def weld(self, vectors):
+        'Adds every vector and returns the list of canonical indices'
+        add = self.add
+        return [add(v) for v in vectors]
+
+
+def _split(ids, k, column):
+    '''Returns ids as (below, median, above), with k ids in below and
+        none of their values in column above the median's, and none in
+        above below it.
+
+        Two values bracketing the kth are picked from a sorted sample, so
+        one pass sends most ids below or above them and only the few in
+        between need sorting.
+    '''
+    value = column.__getitem__
+    below = []
+    above = []
+    while len(ids) > 256:
+        keys = list(map(value, ids))
+        sample = sorted(keys[::int(len(keys) ** 0.5)])
+        spread = int(len(sample) ** 0.5)
+        rank = k * len(sample) // len(keys)
+        low = sample[max(rank - spread, 0)]
+        high = sample[min(rank + spread, len(sample) - 1)]
+        lower = list(compress(ids, map(low.__gt__, keys)))
+        upper = list(compress(ids, map(high.__lt__, keys)))
+        middle = list(compress(ids, map(and_, map(low.__le__, keys),
+                                        map(high.__ge__, keys))))
+        # The kth is usually in the middle, otherwise look again on the
+        # side it fell
+        if k < len(lower):
+            above += middle
+            above += upper
+            ids = lower
+        elif k >= len(ids) - len(upper):
+            below += lower
+            below += middle
+            k -= len(lower) + len(middle)
+            ids = upper
+        else:
+            below += lower
+            above += upper
+            k -= len(lower)
+            ids = middle
+            break
+    ids = sorted(ids, key=value)
+    below += ids[:k]
+    above += ids[k + 1:]
+    return below, ids[k], above
+
+
+class KDTree:
+    '''Static KD-tree over a set of V2 or V3 points
+
+        The tree has no node objects.  Points are reordered so every
+        subtree is a contiguous range whose median splits it, and the
+        split axis cycles with the depth, so the whole tree is just one
+        column of doubles per axis plus the original indices.
+
+            tree = KDTree([V2(0, 0), V2(10, 0), V2(0, 10)])
+            [(index, distance)] = tree.nearest(V2(9, 0))
+            assert index == 1 and distance == 1.0
+    '''
+
+    __slots__ = ['dimensions', 'columns', 'indices', 'leaf_size']
+
+    def __init__(self, points, leaf_size=8):
+        '''Builds the tree from a list of V2 or V3 instances, or from a
+            V2Array without creating any per-point objects'''
+        if hasattr(points, 'to_vectors'):
+            columns = [points.x, points.y]
+        else:
+            if not isinstance(points, (list, tuple)):
+                points = list(points)
+            names = 'xyz'[:len(tuple(points[0]))] if points else 'xy'
+            columns = [array('d', map(attrgetter(name), points))
+                       for name in names]
+        self.dimensions = len(columns)
+        self.leaf_size = max(int(leaf_size), 1)
+        self.indices = array('q', range(len(columns[0])))
+        self._build(columns)
+        fetch = self.indices
+        self.columns = [array('d', map(column.__getitem__, fetch))
+                        for column in columns]
+
+    def _build(self, columns):
+        '''Orders the indices into the tree.  Each range is split around
+            its median with _split rather than sorted, so every level takes
+            linear time and the whole build O(n log n)'''
+        indices = self.indices
+        dimensions = self.dimensions
+        leaf_size = self.leaf_size
+        stack = [(0, len(indices), 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if hi - lo <= leaf_size:
+                continue
+            mid = (lo + hi) // 2
+            below, median, above = _split(
+                indices[lo:hi], mid - lo, columns[depth % dimensions])
+            below.append(median)
+            below += above
+            indices[lo:hi] = array('q', below)
+            stack.append((lo, mid, depth + 1))
+            stack.append((mid + 1, hi, depth + 1))
+
+    def __len__(self):
+        return len(self.indices)
+
+    def nearest(self, point, k=1):
+        '''Returns up to k (index, distance) pairs for the points closest
+            to point, nearest first'''
+        query = tuple(point)
+        columns = self.columns
+        indices = self.indices
+        dimensions = self.dimensions
+        leaf_size = self.leaf_size
+        # Max-heap of (-squared distance, index) holding the best k so far
+        best = []
+
+        def consider(i):
+            squared = 0.0
+            for column, q in zip(columns, query):
+                d = column[i] - q
+                squared += d * d
+            if len(best) < k:
+                heappush(best, (-squared, indices[i]))
+            elif squared < -best[0][0]:
+                heapreplace(best, (-squared, indices[i]))
+
+        def search(lo, hi, depth):
+            if hi - lo <= leaf_size:
+                for i in range(lo, hi):
+                    consider(i)
+                return
+            mid = (lo + hi) // 2
+            axis = depth % dimensions
+            diff = query[axis] - columns[axis][mid]
+            if diff < 0:
+                near, far = (lo, mid), (mid + 1, hi)
+            else:
+                near, far = (mid + 1, hi), (lo, mid)
+            search(near[0], near[1], depth + 1)
+            consider(mid)
+            if len(best) < k or diff * diff < -best[0][0]:
+                search(far[0], far[1], depth + 1)
+
+        if k > 0 and indices:
+            search(0, len(indices), 0)
+        return [(index, sqrt(-squared))
+                for squared, index in sorted(best, reverse=True)]
+
+    def within_radius(self, point, radius):
+        '''Returns (index, distance) pairs for every point no further than
+            radius from point, nearest first'''
+        query = tuple(point)
+        columns = self.columns
+        indices = self.indices
+        dimensions = self.dimensions
+        leaf_size = self.leaf_size
+        limit = radius * radius
+        found = []
+        stack = [(0, len(indices), 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if hi - lo <= leaf_size:
+                checks = range(lo, hi)
+            else:
+                mid = (lo + hi) // 2
+                axis = depth % dimensions
+                diff = query[axis] - columns[axis][mid]
+                if diff <= radius:
+                    stack.append((lo, mid, depth + 1))
+                if diff >= -radius:
+                    stack.append((mid + 1, hi, depth + 1))
+                checks = (mid,)
+            for i in checks:
+                squared = 0.0
+                for column, q in zip(columns, query):
+                    d = column[i] - q
+                    squared += d * d
+                if squared <= limit:
+                    found.append((squared, indices[i]))
+        found.sort()
+        return [(index, sqrt(squared)) for squared, index in found]
+
+    def within_rect(self, rect):
+        '''Returns the indices of every point that rect.contains, using
+            the same x1 <= x < x2 and y1 <= y < y2 bounds.  2D only'''
+        if self.dimensions != 2:
+            raise ValueError("Rect queries need a 2D tree")
+        x1, y1, x2, y2 = rect.x1, rect.y1, rect.x2, rect.y2
+        low = (x1, y1)
+        high = (x2, y2)
+        xs, ys = self.columns
+        indices = self.indices
+        leaf_size = self.leaf_size
+        found = []
+        stack = [(0, len(indices), 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if hi - lo <= leaf_size:
+                checks = range(lo, hi)
+            else:
+                mid = (lo + hi) // 2
+                axis = depth % 2
+                split = self.columns[axis][mid]
+                if low[axis] <= split:
+                    stack.append((lo, mid, depth + 1))
+                if high[axis] > split:
+                    stack.append((mid + 1, hi, depth + 1))
+                checks = (mid,)
+            for i in checks:
+                x = xs[i]
+                y = ys[i]
+                if x1 <= x < x2 and y1 <= y < y2:
+                    found.append(indices[i])
+        found.sort()
+        return found
+
+
+class SpatialHash:
+    '''Uniform grid broad-phase for shapes with a bounds property
+
+        Each shape is filed under every cell its bounding box touches, so
+        finding candidate pairs only compares shapes that share a cell.
+        Pick a cell_size around the size of a typical shape.
+
+            grid = SpatialHash(cell_size=10)
+            grid.insert(a)
+            grid.insert(b)
+            grid.move(a, V2(1, 0))
+            for first, second in grid.pairs():
+                ...
+    '''
+
+    __slots__ = ['cell_size', '_cells', '_entries']
+
+    def __init__(self, cell_size=1.0):
+        self.cell_size = float(cell_size)
+        # (column, row) -> {id(shape): shape}
+        self._cells = {}
+        # id(shape) -> (shape, (column1, row1, column2, row2))
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, shape):
+        return id(shape) in self._entries
+
+    def __iter__(self):
+        return (shape for shape, _ in self._entries.values())
+
+    def _span(self, bounds):
+        size = self.cell_size
+        x1, y1, x2, y2 = bounds
+        return (floor(x1 / size), floor(y1 / size),
+                floor(x2 / size), floor(y2 / size))
+
+    def _file(self, key, shape, span):
+        cells = self._cells
+        c1, r1, c2, r2 = span
+        for column in range(c1, c2 + 1):
+            for row in range(r1, r2 + 1):
+                cell = cells.get((column, row))
+                if cell is None:
+                    cells[(column, row)] = {key: shape}
+                else:
+                    cell[key] = shape
+
+    def _unfile(self, key, span):
+        cells = self._cells
+        c1, r1, c2, r2 = span
+        for column in range(c1, c2 + 1):
+            for row in range(r1, r2 + 1):
+                cell = cells[(column, row)]
+                del cell[key]
+                if not cell:
+                    del cells[(column, row)]
+
+    def insert(self, shape):
+        'Adds a shape to the grid'
+        key = id(shape)
+        if key in self._entries:
+            raise ValueError("Shape is already in the grid")
+        span = self._span(shape.bounds)
+        self._entries[key] = (shape, span)
+        self._file(key, shape, span)
+
+    def remove(self, shape):
+        'Removes a shape from the grid'
+        key = id(shape)
+        try:
+            _, span = self._entries.pop(key)
+        except KeyError:
+            raise KeyError("Shape is not in the grid") from None
+        self._unfile(key, span)
+
+    def update(self, shape):
+        '''Refiles a shape after its position or size has been changed.
+            Shapes that stay within the same cells cost no dict updates'''
+        key = id(shape)
+        _, old = self._entries[key]
+        span = self._span(shape.bounds)
+        if span != old:
+            self._unfile(key, old)
+            self._file(key, shape, span)
+            self._entries[key] = (shape, span)
+
+    def move(self, shape, vector):
+        'Translates a shape by vector and refiles it'
+        shape.translate(vector)
+        self.update(shape)
+
+    def pairs(self):
+        '''Returns a list of (shape, shape) pairs whose bounding boxes
+            overlap.  Each pair is reported once'''
+        seen = set()
+        found = []
+        for cell in self._cells.values():
+            if len(cell) < 2:
+                continue
+            members = [(key, shape, shape.bounds)
+                       for key, shape in cell.items()]
+            for i, (key_a, a, (ax1, ay1, ax2, ay2)) in enumerate(members):
+                for key_b, b, (bx1, by1, bx2, by2) in members[i + 1:]:
+                    if ax1 > bx2 or bx1 > ax2 or ay1 > by2 or by1 > ay2:
+                        continue
+                    pair = (key_a, key_b) if key_a < key_b else (key_b, key_a)
+                    if pair not in seen:
+                        seen.add(pair)
+                        found.append((a, b))
+        return found
+
+    def query_point(self, point):
+        'Returns every shape that contains point'
+        size = self.cell_size
+        cell = self._cells.get((floor(point.x / size), floor(point.y / size)))
+        if cell is None:
+            return []
+        return [shape for shape in cell.values() if shape.contains(point)]
+
+    def query_rect(self, rect):
+        '''Returns every shape whose bounding box overlaps rect, which
+            can be anything with x1, y1, x2 and y2'''
+        x1, y1, x2, y2 = rect.x1, rect.y1, rect.x2, rect.y2
+        c1, r1, c2, r2 = self._span((x1, y1, x2, y2))
+        cells = self._cells
+        if (c2 - c1 + 1) * (r2 - r1 + 1) > len(cells):
+            # Fewer occupied cells than covered ones, so walk those instead
+            touched = [cell for (column, row), cell in cells.items()
+                       if c1 <= column <= c2 and r1 <= row <= r2]
+        else:
+            touched = [cells[(column, row)]
+                       for column in range(c1, c2 + 1)
+                       for row in range(r1, r2 + 1)
+                       if (column, row) in cells]
+        seen = set()
+        found = []
+        for cell in touched:
+            for key, shape in cell.items():
+                if key in seen:
+                    continue
+                seen.add(key)
+                bx1, by1, bx2, by2 = shape.bounds
+                if x1 <= bx2 and bx1 <= x2 and y1 <= by2 and by1 <= y2:
+                    found.append(shape)
+        return found
+
+
+def _bounds_of(item):
+    '''Returns (x1, y1, x2, y2) for a shape with a bounds property,
+        or a zero-sized box for a point'''
+    try:
+        return item.bounds
+    except AttributeError:
+        return item.x, item.y, item.x, item.y
+
+
+class _QuadNode:
+
+    __slots__ = ['cx', 'cy', 'hx', 'hy', 'depth', 'items', 'children',
+                 'count']
+
+    def __init__(self, cx, cy, hx, hy, depth):
+        self.cx = cx
+        self.cy = cy
+        self.hx = hx
+        self.hy = hy
+        self.depth = depth
+        # Entries are (x1, y1, x2, y2, item) tuples
+        self.items = []
+        self.children = None
+        # Number of entries in this node and everything below it
+        self.count = 0
+
+    def child_for(self, x1, y1, x2, y2):
+        '''Returns the index of the child an entry belongs in, or None if
+            it has to stay in this node.  Children are loose: they hold
+            anything centered in their quarter that is no bigger than it'''
+        hx = self.hx / 2
+        hy = self.hy / 2
+        if x2 - x1 > hx * 2 or y2 - y1 > hy * 2:
+            return None
+        mx = (x1 + x2) / 2
+        my = (y1 + y2) / 2
+        if abs(mx - self.cx) > self.hx or abs(my - self.cy) > self.hy:
+            return None
+        return (mx >= self.cx) + 2 * (my >= self.cy)
+
+    def split(self):
+        hx = self.hx / 2
+        hy = self.hy / 2
+        cx = self.cx
+        cy = self.cy
+        depth = self.depth + 1
+        self.children = [_QuadNode(cx - hx, cy - hy, hx, hy, depth),
+                         _QuadNode(cx + hx, cy - hy, hx, hy, depth),
+                         _QuadNode(cx - hx, cy + hy, hx, hy, depth),
+                         _QuadNode(cx + hx, cy + hy, hx, hy, depth)]
+        kept = []
+        for entry in self.items:
+            index = self.child_for(entry[0], entry[1], entry[2], entry[3])
+            if index is None:
+                kept.append(entry)
+            else:
+                child = self.children[index]
+                child.items.append(entry)
+                child.count += 1
+        self.items = kept
+
+    def merge(self):
+        stack = list(self.children)
+        while stack:
+            node = stack.pop()
+            self.items.extend(node.items)
+            if node.children is not None:
+                stack.extend(node.children)
+        self.children = None
+
+
+class QuadTree:
+    '''Loose quadtree over points and shapes for region queries
+
+        Items can be V2 points or anything with a bounds property, like
+        Circle and Rect.  Each item is stored in the smallest node whose
+        loosened bounds, twice the size of its quarter, hold it entirely,
+        so items never straddle nodes and are never duplicated.
+
+        Splitting overfull nodes and merging emptied ones is deferred until
+        the next query, so a burst of inserts or removes only reshapes the
+        tree once.
+
+            tree = QuadTree.from_items(points)
+            inside = tree.query_rect(Rect(V2(10, 10), V2(5, 5)))
+    '''
+
+    __slots__ = ['capacity', 'max_depth', '_root', '_bounds', '_pending']
+
+    def __init__(self, bounds, capacity=8, max_depth=16):
+        '''Makes an empty tree covering bounds, an (x1, y1, x2, y2) tuple.
+            Items outside of bounds still work, they just aren't indexed'''
+        x1, y1, x2, y2 = bounds
+        self.capacity = capacity
+        self.max_depth = max_depth
+        self._root = _QuadNode((x1 + x2) / 2, (y1 + y2) / 2,
+                               (x2 - x1) / 2, (y2 - y1) / 2, 0)
+        # id(item) -> the bounds it was filed under
+        self._bounds = {}
+        self._pending = []
+
+    @classmethod
+    def from_items(cls, items, capacity=8, max_depth=16):
+        '''Bulk loads a tree sized to fit items.  All items go into the
+            root and are pushed down in a single top-down pass'''
+        entries = []
+        for item in items:
+            x1, y1, x2, y2 = _bounds_of(item)
+            entries.append((x1, y1, x2, y2, item))
+        if entries:
+            bounds = (min(e[0] for e in entries), min(e[1] for e in entries),
+                      max(e[2] for e in entries), max(e[3] for e in entries))
+        else:
+            bounds = (0.0, 0.0, 1.0, 1.0)
+        tree = cls(bounds, capacity, max_depth)
+        root = tree._root
+        root.items = entries
+        root.count = len(entries)
+        tree._bounds = {id(e[4]): e[:4] for e in entries}
+        tree._pending.append(root)
+        return tree
+
+    def __len__(self):
+        return self._root.count
+
+    def __contains__(self, item):
+        return id(item) in self._bounds
+
+    def _path(self, x1, y1, x2, y2):
+        '''Returns the nodes from the root down to where an entry with
+            these bounds lives'''
+        node = self._root
+        path = [node]
+        while node.children is not None:
+            index = node.child_for(x1, y1, x2, y2)
+            if index is None:
+                break
+            node = node.children[index]
+            path.append(node)
+        return path
+
+    def insert(self, item):
+        'Adds a point or shape to the tree'
+        key = id(item)
+        if key in self._bounds:
+            raise ValueError("Item is already in the tree")
+        x1, y1, x2, y2 = bounds = _bounds_of(item)
+        path = self._path(x1, y1, x2, y2)
+        for node in path:
+            node.count += 1
+        node = path[-1]
+        node.items.append((x1, y1, x2, y2, item))
+        self._bounds[key] = bounds
+        if node.children is None and len(node.items) > self.capacity:
+            self._pending.append(node)
+
+    def remove(self, item):
+        'Removes a point or shape from the tree'
+        try:
+            x1, y1, x2, y2 = self._bounds.pop(id(item))
+        except KeyError:
+            raise KeyError("Item is not in the tree") from None
+        path = self._path(x1, y1, x2, y2)
+        node = path[-1]
+        for i, entry in enumerate(node.items):
+            if entry[4] is item:
+                del node.items[i]
+                break
+        for node in path:
+            node.count -= 1
+        # Collapse the highest subtree that has become sparse
+        for node in path:
+            if node.children is not None and node.count <= self.capacity // 2:
+                self._pending.append(node)
+                break
+
+    def update(self, item):
+        'Refiles an item after it has moved or changed size'
+        self.remove(item)
+        self.insert(item)
+
+    def rebalance(self):
+        '''Splits overfull leaves and merges sparse subtrees.  Queries
+            call this automatically when anything has changed'''
+        capacity = self.capacity
+        max_depth = self.max_depth
+        pending = self._pending
+        while pending:
+            node = pending.pop()
+            if node.children is not None:
+                if node.count <= capacity // 2:
+                    node.merge()
+                continue
+            if len(node.items) > capacity and node.depth < max_depth:
+                node.split()
+                pending.extend(node.children)
+
+    def _entries(self, x1, y1, x2, y2):
+        '''Yields the entry lists of every node whose loose bounds can
+            hold something overlapping the region'''
+        if self._pending:
+            self.rebalance()
+        root = self._root
+        yield root.items
+        stack = [] if root.children is None else list(root.children)
+        while stack:
+            node = stack.pop()
+            # Loose bounds are twice the size of the node's quarter
+            hx = node.hx * 2
+            hy = node.hy * 2
+            if (x1 > node.cx + hx or x2 < node.cx - hx or
+                    y1 > node.cy + hy or y2 < node.cy - hy):
+                continue
+            if node.items:
+                yield node.items
+            if node.children is not None:
+                stack.extend(node.children)
+
+    def query_rect(self, rect):
+        '''Returns every item overlapping rect.  Like Rect.contains the
+            region includes its x1 and y1 edges but not x2 and y2, so
+            points are found exactly when rect.contains(point)'''
+        x1, y1, x2, y2 = rect.x1, rect.y1, rect.x2, rect.y2
+        found = []
+        for entries in self._entries(x1, y1, x2, y2):
+            for bx1, by1, bx2, by2, item in entries:
+                if x1 <= bx2 and bx1 < x2 and y1 <= by2 and by1 < y2:
+                    found.append(item)
+        return found
+
+    def query_point(self, point):
+        '''Returns every item whose bounds contain point, using the same
+            edges as Rect.contains'''
+        x = point.x
+        y = point.y
+        found = []
+        for entries in self._entries(x, y, x, y):
+            for bx1, by1, bx2, by2, item in entries:
+                if bx1 <= x < bx2 and by1 <= y < by2:
+                    found.append(item)
+        return found
+
+
+class AABBTree:
+    '''Dynamic bounding volume hierarchy for moving shapes of any kind
+
+        Each shape is stored with a bounding box fattened by margin, so it
+        can move a little without the tree changing at all.  Only when a
+        shape leaves its fat box is its leaf removed and reinserted, and
+        the tree is kept balanced with rotations on the way back up.
+
+        Nodes live in parallel lists indexed by node number rather than as
+        objects, and freed nodes are reused.
+
+            tree = AABBTree(margin=0.5)
+            for shape in shapes:
+                tree.insert(shape)
+            tree.move(shapes[0], V2(1, 0))
+            for first, second in tree.pairs():
+                ...
+    '''
+
+    __slots__ = ['margin', '_x1', '_y1', '_x2', '_y2', '_parent', '_left',
+                 '_right', '_height', '_items', '_free', '_root', '_leaves']
+
+    def __init__(self, margin=0.1):
+        self.margin = float(margin)
+        self._x1 = []
+        self._y1 = []
+        self._x2 = []
+        self._y2 = []
+        self._parent = []
+        # Leaves have a left child of -1, internal nodes always have both
+        self._left = []
+        self._right = []
+        self._height = []
+        self._items = []
+        self._free = []
+        self._root = -1
+        # id(shape) -> leaf node
+        self._leaves = {}
+
+    def __len__(self):
+        return len(self._leaves)
+
+    def __contains__(self, shape):
+        return id(shape) in self._leaves
+
+    @property
+    def height(self):
+        'Height of the tree, 0 for a single leaf and -1 when empty'
+        if self._root == -1:
+            return -1
+        return self._height[self._root]
+
+    def _allocate(self):
+        if self._free:
+            return self._free.pop()
+        self._x1.append(0.0)
+        self._y1.append(0.0)
+        self._x2.append(0.0)
+        self._y2.append(0.0)
+        self._parent.append(-1)
+        self._left.append(-1)
+        self._right.append(-1)
+        self._height.append(0)
+        self._items.append(None)
+        return len(self._items) - 1
+
+    def _release(self, node):
+        self._items[node] = None
+        self._left[node] = -1
+        self._right[node] = -1
+        self._free.append(node)
+
+    def _refit(self, node):
+        '''Sets an internal node's box and height from its children'''
+        a = self._left[node]
+        b = self._right[node]
+        x1 = self._x1
+        y1 = self._y1
+        x2 = self._x2
+        y2 = self._y2
+        x1[node] = min(x1[a], x1[b])
+        y1[node] = min(y1[a], y1[b])
+        x2[node] = max(x2[a], x2[b])
+        y2[node] = max(y2[a], y2[b])
+        height = self._height
+        height[node] = 1 + max(height[a], height[b])
+
+    def _replace_child(self, parent, old, new):
+        if parent == -1:
+            self._root = new
+        elif self._left[parent] == old:
+            self._left[parent] = new
+        else:
+            self._right[parent] = new
+
+    def _insert_leaf(self, leaf):
+        parent = self._parent
+        left = self._left
+        right = self._right
+        if self._root == -1:
+            self._root = leaf
+            parent[leaf] = -1
+            return
+
+        # Walk down picking the child that grows the tree's surface least
+        bx1 = self._x1
+        by1 = self._y1
+        bx2 = self._x2
+        by2 = self._y2
+        x1 = bx1[leaf]
+        y1 = by1[leaf]
+        x2 = bx2[leaf]
+        y2 = by2[leaf]
+        index = self._root
+        while left[index] != -1:
+            area = bx2[index] - bx1[index] + by2[index] - by1[index]
+            combined = (max(bx2[index], x2) - min(bx1[index], x1) +
+                        max(by2[index], y2) - min(by1[index], y1))
+            cost = 2 * combined
+            inheritance = 2 * (combined - area)
+            a = left[index]
+            b = right[index]
+            cost_a = (max(bx2[a], x2) - min(bx1[a], x1) +
+                      max(by2[a], y2) - min(by1[a], y1) + inheritance)
+            if left[a] != -1:
+                cost_a -= bx2[a] - bx1[a] + by2[a] - by1[a]
+            cost_b = (max(bx2[b], x2) - min(bx1[b], x1) +
+                      max(by2[b], y2) - min(by1[b], y1) + inheritance)
+            if left[b] != -1:
+                cost_b -= bx2[b] - bx1[b] + by2[b] - by1[b]
+            if cost < cost_a and cost < cost_b:
+                break
+            index = a if cost_a < cost_b else b
+
+        sibling = index
+        old_parent = parent[sibling]
+        new_parent = self._allocate()
+        parent[new_parent] = old_parent
+        left[new_parent] = sibling
+        right[new_parent] = leaf
+        parent[sibling] = new_parent
+        parent[leaf] = new_parent
+        self._replace_child(old_parent, sibling, new_parent)
+        self._fix_upwards(new_parent)
+
+    def _remove_leaf(self, leaf):
+        if leaf == self._root:
+            self._root = -1
+            return
+        parent = self._parent
+        node = parent[leaf]
+        grandparent = parent[node]
+        if self._left[node] == leaf:
+            sibling = self._right[node]
+        else:
+            sibling = self._left[node]
+        self._replace_child(grandparent, node, sibling)
+        parent[sibling] = grandparent
+        self._release(node)
+        if grandparent != -1:
+            self._fix_upwards(grandparent)
+
+    def _fix_upwards(self, index):
+        parent = self._parent
+        while index != -1:
+            index = self._balance(index)
+            self._refit(index)
+            index = parent[index]
+
+    def _balance(self, a):
+        '''Rotates the taller grandchild of a up if a's subtrees differ in
+            height by more than one.  Returns the node now in a's place'''
+        left = self._left
+        right = self._right
+        parent = self._parent
+        height = self._height
+        if left[a] == -1 or height[a] < 2:
+            return a
+        b = left[a]
+        c = right[a]
+        balance = height[c] - height[b]
+        if balance > 1:
+            f = left[c]
+            g = right[c]
+            left[c] = a
+            parent[c] = parent[a]
+            parent[a] = c
+            self._replace_child(parent[c], a, c)
+            if height[f] > height[g]:
+                right[c] = f
+                right[a] = g
+                parent[g] = a
+            else:
+                right[c] = g
+                right[a] = f
+                parent[f] = a
+            self._refit(a)
+            self._refit(c)
+            return c
+        if balance < -1:
+            d = left[b]
+            e = right[b]
+            left[b] = a
+            parent[b] = parent[a]
+            parent[a] = b
+            self._replace_child(parent[b], a, b)
+            if height[d] > height[e]:
+                right[b] = d
+                left[a] = e
+                parent[e] = a
+            else:
+                right[b] = e
+                left[a] = d
+                parent[d] = a
+            self._refit(a)
+            self._refit(b)
+            return b
+        return a
+
+    def _set_fat_bounds(self, leaf, bounds):
+        margin = self.margin
+        x1, y1, x2, y2 = bounds
+        self._x1[leaf] = x1 - margin
+        self._y1[leaf] = y1 - margin
+        self._x2[leaf] = x2 + margin
+        self._y2[leaf] = y2 + margin
+
+    def insert(self, shape):
+        'Adds a shape with a bounds property to the tree'
+        key = id(shape)
+        if key in self._leaves:
+            raise ValueError("Shape is already in the tree")
+        leaf = self._allocate()
+        self._items[leaf] = shape
+        self._height[leaf] = 0
+        self._set_fat_bounds(leaf, shape.bounds)
+        self._leaves[key] = leaf
+        self._insert_leaf(leaf)
+
+    @classmethod
+    def from_shapes(cls, shapes, margin=0.1):
+        '''Bulk builds a balanced tree by splitting the shapes at the
+            median of their centers along the wider axis, which is much
+            faster than inserting them one at a time'''
+        tree = cls(margin)
+        leaves = []
+        for shape in shapes:
+            key = id(shape)
+            if key in tree._leaves:
+                raise ValueError("Shape is already in the tree")
+            leaf = tree._allocate()
+            tree._items[leaf] = shape
+            tree._set_fat_bounds(leaf, shape.bounds)
+            tree._leaves[key] = leaf
+            leaves.append(leaf)
+        if leaves:
+            tree._root = tree._build(leaves)
+            tree._parent[tree._root] = -1
+        return tree
+
+    def _build(self, leaves):
+        if len(leaves) == 1:
+            return leaves[0]
+        x1 = self._x1
+        y1 = self._y1
+        x2 = self._x2
+        y2 = self._y2
+        xs = [x1[leaf] + x2[leaf] for leaf in leaves]
+        ys = [y1[leaf] + y2[leaf] for leaf in leaves]
+        if max(xs) - min(xs) >= max(ys) - min(ys):
+            centers = dict(zip(leaves, xs))
+        else:
+            centers = dict(zip(leaves, ys))
+        leaves.sort(key=centers.__getitem__)
+        mid = len(leaves) // 2
+        a = self._build(leaves[:mid])
+        b = self._build(leaves[mid:])
+        node = self._allocate()
+        self._left[node] = a
+        self._right[node] = b
+        self._parent[a] = node
+        self._parent[b] = node
+        self._refit(node)
+        return node
+
+    def remove(self, shape):
+        'Removes a shape from the tree'
+        try:
+            leaf = self._leaves.pop(id(shape))
+        except KeyError:
+            raise KeyError("Shape is not in the tree") from None
+        self._remove_leaf(leaf)
+        self._release(leaf)
+
+    def update(self, shape):
+        '''Refits the tree after a shape has moved or changed size.
+            Returns True if the shape had to be reinserted, or False
+            if it is still inside its fattened box'''
+        leaf = self._leaves[id(shape)]
+        x1, y1, x2, y2 = bounds = shape.bounds
+        if (x1 >= self._x1[leaf] and y1 >= self._y1[leaf] and
+                x2 <= self._x2[leaf] and y2 <= self._y2[leaf]):
+            return False
+        self._remove_leaf(leaf)
+        self._set_fat_bounds(leaf, bounds)
+        self._insert_leaf(leaf)
+        return True
+
+    def move(self, shape, vector):
+        'Translates a shape by vector and refits the tree'
+        shape.translate(vector)
+        return self.update(shape)
+
+    def scale(self, shape, factor):
+        'Scales a shape by factor and refits the tree'
+        shape.scale(factor)
+        return self.update(shape)
+
+    def _query(self, x1, y1, x2, y2):
+        '''Returns the leaves whose fat boxes overlap the region'''
+        if self._root == -1:
+            return []
+        bx1 = self._x1
+        by1 = self._y1
+        bx2 = self._x2
+        by2 = self._y2
+        left = self._left
+        right = self._right
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if (bx1[node] > x2 or bx2[node] < x1 or
+                    by1[node] > y2 or by2[node] < y1):
+                continue
+            if left[node] == -1:
+                found.append(node)
+            else:
+                stack.append(left[node])
+                stack.append(right[node])
+        return found
+
+    def query_rect(self, rect):
+        '''Returns every shape whose bounding box overlaps rect, which
+            can be anything with x1, y1, x2 and y2'''
+        x1, y1, x2, y2 = rect.x1, rect.y1, rect.x2, rect.y2
+        found = []
+        items = self._items
+        for leaf in self._query(x1, y1, x2, y2):
+            shape = items[leaf]
+            bx1, by1, bx2, by2 = shape.bounds
+            if x1 <= bx2 and bx1 <= x2 and y1 <= by2 and by1 <= y2:
+                found.append(shape)
+        return found
+
+    def query_point(self, point):
+        'Returns every shape whose bounding box contains point'
+        x = point.x
+        y = point.y
+        found = []
+        items = self._items
+        for leaf in self._query(x, y, x, y):
+            shape = items[leaf]
+            bx1, by1, bx2, by2 = shape.bounds
+            if bx1 <= x <= bx2 and by1 <= y <= by2:
+                found.append(shape)
+        return found
+
+    def pairs(self):
+        '''Returns a list of (shape, shape) pairs whose bounding boxes
+            overlap.  Each pair is reported once'''
+        items = self._items
+        bounds = {leaf: items[leaf].bounds for leaf in self._leaves.values()}
+        found = []
+        for leaf, (x1, y1, x2, y2) in bounds.items():
+            for other in self._query(x1, y1, x2, y2):
+                if other <= leaf:
+                    continue
+                bx1, by1, bx2, by2 = bounds[other]
+                if x1 <= bx2 and bx1 <= x2 and y1 <= by2 and by1 <= y2:
+                    found.append((items[leaf], items[other]))
+        return found
@@ -0,0 +1,136 @@
+from .color import Color
+from .shape import Circle, Rect
+from .vector import V2, V3
+from struct import Struct
+
+
+__all__ = ['RecordWriter', 'read_records']
+
+# Every record starts with a one byte tag naming its type.  When the high
+# bit of the tag is set, a uint32 payload length follows the tag, which
+# lets readers skip over record types they don't know about.
+_tag = Struct('<B')
+_length = Struct('<I')
+_has_length = 0x80
+
+# tag -> (class, payload size in bytes)
+_record_types = {
+    1: (V2, 16),
+    2: (V3, 24),
+    3: (Circle, 24),
+    4: (Rect, 32),
+    5: (Color, 4),
+}
+_record_tags = {cls: tag for tag, (cls, _) in _record_types.items()}
+
+
+class RecordWriter:
+    '''Writes a stream of tagged V2, V3, Circle, Rect and Color records
+
+        Records are collected in one buffer and handed to the writable in
+        batches of about batch_size bytes.  Call flush(), or use the
+        writer as a context manager, to write out whatever is left.
+
+            with RecordWriter(f) as writer:
+                writer.write(Circle(2.0))
+                writer.write_many([V2(1, 2), Color(red=1.0)])
+    '''
+
+    __slots__ = ['writable', 'batch_size', 'length_prefix', '_buffer']
+
+    def __init__(self, writable, batch_size=65536, length_prefix=False):
+        self.writable = writable
+        self.batch_size = batch_size
+        self.length_prefix = length_prefix
+        self._buffer = bytearray()
+
+    def _append(self, record):
+        try:
+            tag = _record_tags[type(record)]
+        except KeyError:
+            message = "Cannot write a {} record"
+            raise TypeError(message.format(type(record).__name__)) from None
+        buffer = self._buffer
+        payload = bytes(record)
+        if self.length_prefix:
+            buffer += _tag.pack(tag | _has_length)
+            buffer += _length.pack(len(payload))
+        else:
+            buffer += _tag.pack(tag)
+        buffer += payload
+
+    def write(self, record):
+        'Adds one record, writing out the batch if it is full'
+        self._append(record)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def write_many(self, records):
+        'Adds many records, writing out each batch as it fills'
+        batch_size = self.batch_size
+        for record in records:
+            self._append(record)
+            if len(self._buffer) >= batch_size:
+                self.flush()
+
+    def flush(self):
+        'Writes out any buffered records'
+        if self._buffer:
+            self.writable.write(self._buffer)
+            self._buffer = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+
+def read_records(readable, chunk_size=65536):
+    '''Yields the records in a stream written by RecordWriter
+
+        Reads chunk_size bytes at a time from readable, which can be a
+        file or socket.makefile('rb'), and decodes each record straight
+        out of the buffer by offset.  Only one chunk plus one partial
+        record is ever held, however long the stream is.
+        Length prefixed records with an unknown tag are skipped.
+    '''
+    buffer = bytearray()
+    while True:
+        chunk = readable.read(chunk_size)
+        if chunk:
+            buffer += chunk
+        offset = 0
+        end = len(buffer)
+        with memoryview(buffer) as view:
+            while offset < end:
+                tag = view[offset]
+                start = offset + 1
+                if tag & _has_length:
+                    if start + 4 > end:
+                        break
+                    size = _length.unpack_from(view, start)[0]
+                    start += 4
+                    tag &= ~_has_length
+                    record_type = _record_types.get(tag)
+                    if record_type is not None and size != record_type[1]:
+                        message = "{} record at offset {} is {} bytes, not {}"
+                        raise ValueError(message.format(
+                            record_type[0].__name__, offset, size,
+                            record_type[1]))
+                else:
+                    record_type = _record_types.get(tag)
+                    if record_type is None:
+                        message = "Unknown record tag {} at offset {}"
+                        raise ValueError(message.format(tag, offset))
+                    size = record_type[1]
+                if start + size > end:
+                    break
+                if record_type is not None:
+                    yield record_type[0].from_buffer(view, start)
+                offset = start + size
+        del buffer[:offset]
+        if not chunk:
+            if buffer:
+                raise ValueError("Stream ended partway through a record")
+            return
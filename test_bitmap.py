@@ -0,0 +1,165 @@
+import pytest
+from .bitmap import ColorBuffer
+from .color import Color, adjust_hsb
+from random import randrange
+
+
+def random_color():
+    return Color.from_bytes(bytes(randrange(256) for _ in range(4)))
+
+
+def random_buffer(width=7, height=5):
+    colors = [random_color() for _ in range(width * height)]
+    return ColorBuffer.from_colors(width, height, colors), colors
+
+
+def test_defaults():
+    buffer = ColorBuffer(3, 2)
+    assert len(buffer) == 6
+    assert bytes(buffer) == bytes(24)
+    assert buffer[0] == Color(alpha=0.0)
+
+
+def test_fill():
+    red = Color(red=1.0)
+    buffer = ColorBuffer(4, 4, fill=red)
+    assert all(c == red for c in buffer)
+    buffer.fill(Color(blue=1.0))
+    assert buffer[3, 3] == Color(blue=1.0)
+
+
+def test_layout_matches_color_bytes():
+    buffer, colors = random_buffer()
+    assert bytes(buffer) == b''.join(bytes(c) for c in colors)
+    assert buffer.to_colors() == colors
+
+
+def test_indexing():
+    buffer, colors = random_buffer(7, 5)
+    assert buffer[2, 3] == colors[3 * 7 + 2]
+    assert buffer[-1] == colors[-1]
+    buffer[1, 1] = Color(green=1.0)
+    assert buffer[8] == Color(green=1.0)
+    with pytest.raises(IndexError):
+        buffer[7, 0]
+    with pytest.raises(IndexError):
+        buffer[35]
+
+
+def test_from_bytes_size():
+    with pytest.raises(ValueError):
+        ColorBuffer.from_bytes(2, 2, bytes(15))
+
+
+@pytest.mark.parametrize('name', ['blend', 'lighten', 'darken', 'add',
+                                  'subtract', 'multiply', 'difference'])
+def test_operations_match_color(name):
+    a, a_colors = random_buffer()
+    b, b_colors = random_buffer()
+    result = getattr(a, name)(b)
+    expected = [getattr(x, name)(y) for x, y in zip(a_colors, b_colors)]
+    assert result.to_colors() == expected
+    single = b_colors[0]
+    result = getattr(a, name)(single)
+    expected = [getattr(x, name)(single) for x in a_colors]
+    assert result.to_colors() == expected
+
+
+def test_divide_matches_color():
+    a, a_colors = random_buffer()
+    b, b_colors = random_buffer()
+    for pixel, x, y in zip(a.divide(b), a_colors, b_colors):
+        expected = x.divide(y)
+        expected.red = min(expected.red, 1.0)
+        expected.green = min(expected.green, 1.0)
+        expected.blue = min(expected.blue, 1.0)
+        assert pixel == expected
+
+
+def test_size_mismatch():
+    a = ColorBuffer(2, 2)
+    with pytest.raises(ValueError):
+        a.blend(ColorBuffer(2, 3))
+
+
+def test_copy():
+    a, _ = random_buffer()
+    b = a.copy
+    assert a == b
+    b[0] = Color(red=0.5)
+    assert a != b
+
+
+def test_adjust_hsb_matches_colors():
+    buffer, colors = random_buffer(20, 10)
+    # Repeated pixels share one conversion
+    buffer[0] = colors[1]
+    colors[0] = colors[1]
+    result = buffer.adjust_hsb(hue_shift=0.25, saturation_scale=1.5,
+                               brightness_range=(0.1, 0.9))
+    expected = adjust_hsb(colors, hue_shift=0.25, saturation_scale=1.5,
+                          brightness_range=(0.1, 0.9))
+    assert result.to_colors() == expected
+    assert result.planes[3] == buffer.planes[3]
+    assert ColorBuffer(0, 0).adjust_hsb(0.5) == ColorBuffer(0, 0)
+
+
+def test_map_rgb_releases_data_on_error():
+    buffer, _ = random_buffer()
+
+    def fail(red, green, blue):
+        raise RuntimeError
+
+    with pytest.raises(RuntimeError) as error:
+        buffer.map_rgb(fail)
+    # The traceback keeps map_rgb's frame, and so its locals, alive
+    assert error.traceback
+    buffer.data += bytes(4)
+
+
+def assert_composited(buffer, destination, mode):
+    result = buffer.composite(destination, mode)
+    if isinstance(destination, Color):
+        destination = [destination] * len(buffer)
+    for source, below, pixel in zip(buffer, destination, result):
+        expected = source.composite(below, mode)
+        assert abs(expected.alpha - pixel.alpha) <= 1 / 255
+        if expected.alpha >= 0.25:
+            for a, b in zip(expected.components, pixel.components):
+                assert abs(a - b) <= 3 / 255
+
+
+@pytest.mark.parametrize('mode', ['over', 'in', 'out', 'atop', 'xor'])
+def test_composite_matches_color(mode):
+    buffer, _ = random_buffer()
+    other, _ = random_buffer()
+    assert_composited(buffer, other, mode)
+    assert_composited(buffer, random_color(), mode)
+    other.data[3::4] = bytes([255]) * len(other)
+    assert_composited(buffer, other, mode)
+
+
+@pytest.mark.parametrize('mode', ['over', 'atop', 'xor'])
+def test_composite_mostly_opaque_source(mode):
+    buffer, _ = random_buffer(40, 10)
+    alpha = bytearray(b'\xff' * 200 + bytes(200))
+    alpha[100] = 128
+    alpha[300] = 64
+    buffer.data[3::4] = alpha
+    other, _ = random_buffer(40, 10)
+    assert_composited(buffer, other, mode)
+    other.data[3::4] = bytes([255]) * len(other)
+    assert_composited(buffer, other, mode)
+
+
+def test_composite_opaque():
+    buffer, _ = random_buffer()
+    buffer.data[3::4] = bytes([255]) * len(buffer)
+    other, _ = random_buffer()
+    assert buffer.composite(other) == buffer
+    other.data[3::4] = bytes(randrange(1, 256) for _ in range(len(other)))
+    atop = buffer.composite(other, 'atop')
+    assert atop.planes[:3] == buffer.planes[:3]
+    assert atop.planes[3] == other.planes[3]
+    with pytest.raises(ValueError):
+        buffer.composite(other, 'under')
@@ -1,6 +1,9 @@
+import colorsys
 import pytest
 
 from . import Color
+from .color import rgb_to_hsb, hsb_to_rgb, adjust_hsb, describe_many
+from random import random, randrange
 
 
 class MockWriter:
@@ -297,3 +300,199 @@ def test_write(cornflower):
     writer = MockWriter()
     cornflower.write(writer)
     assert writer.written == bytes(cornflower)
+
+
+def random_colors(n):
+    colors = [Color(random(), random(), random(), random()) for _ in range(n)]
+    # Grays and primaries hit the special cases in the conversions
+    colors += [Color(0.5, 0.5, 0.5), Color(), Color(1, 1, 1),
+               Color(red=1.0), Color(green=1.0), Color(blue=1.0)]
+    return colors
+
+
+def test_rgb_to_hsb_matches_colorsys():
+    colors = random_colors(200)
+    columns = rgb_to_hsb([c.red for c in colors], [c.green for c in colors],
+                         [c.blue for c in colors])
+    for h, s, b, color in zip(*columns, colors):
+        expected = colorsys.rgb_to_hsv(color.red, color.green, color.blue)
+        assert (h, s, b) == expected
+
+
+def test_hsb_to_rgb_matches_colorsys():
+    colors = random_colors(200)
+    hsb = [c.hsb for c in colors]
+    columns = hsb_to_rgb(*zip(*hsb))
+    for r, g, b, values in zip(*columns, hsb):
+        expected = colorsys.hsv_to_rgb(*values)
+        assert abs(r - expected[0]) < 1e-9
+        assert abs(g - expected[1]) < 1e-9
+        assert abs(b - expected[2]) < 1e-9
+
+
+def test_adjust_hsb_matches_setters():
+    colors = random_colors(100)
+    adjusted = adjust_hsb(colors, hue_shift=0.3, saturation_scale=0.5,
+                          brightness_range=(0.2, 0.7))
+    for color, result in zip(colors, adjusted):
+        expected = color.copy
+        expected.hue = color.hue + 0.3
+        expected.saturation = color.saturation * 0.5
+        expected.brightness = min(max(color.brightness, 0.2), 0.7)
+        assert result == expected
+        assert result.alpha == color.alpha
+
+
+def test_adjust_hsb_defaults_keep_colors():
+    colors = random_colors(20)
+    assert adjust_hsb(iter(colors)) == colors
+
+
+def test_hsb_cache_invalidated_by_rgb_writes():
+    color = Color(1.0, 0.0, 0.0)
+    assert color.hsb == (0.0, 1.0, 1.0)
+    color.green = 1.0
+    assert abs(color.hue - 1 / 6) < 0.0001
+    color.red = 0.0
+    assert abs(color.hue - 1 / 3) < 0.0001
+    color.blue = 1.0
+    assert abs(color.hue - 0.5) < 0.0001
+    color.brightness = 0.5
+    assert color == Color(0.0, 0.5, 0.5)
+    assert color.hsb == colorsys.rgb_to_hsv(color.red, color.green,
+                                            color.blue)
+
+
+def test_hsb_setters_match_colorsys():
+    for _ in range(100):
+        color = Color(random(), random(), random())
+        color.hue = color.hue + 0.25
+        color.saturation = color.saturation * 0.5
+        color.brightness = color.brightness * 0.75
+        expected = colorsys.rgb_to_hsv(color.red, color.green, color.blue)
+        assert color.hsb == expected
+
+
+def test_hsb_setter_reads_back_from_rgb():
+    color = Color()
+    color.hsb = (23 / 24, 0.6, 0.7)
+    assert color.hsb == colorsys.rgb_to_hsv(color.red, color.green,
+                                            color.blue)
+    assert color.description == 'Pink'
+    assert Color(color.red, color.green, color.blue).description == 'Pink'
+
+
+def test_hsb_setters_on_gray_and_black():
+    gray = Color(0.5, 0.5, 0.5)
+    gray.hue = 0.5
+    assert gray.hue == 0.0
+    black = Color()
+    black.saturation = 1.0
+    assert black.saturation == 0.0
+    wrapped = Color()
+    wrapped.hsb = (1.25, 1.0, 1.0)
+    assert wrapped.hue == 0.25
+
+
+def test_copy_keeps_hsb():
+    color = Color.from_hsb(0.3, 0.4, 0.5)
+    color.hsb
+    copy = color.copy
+    assert copy._hsb is color._hsb
+    assert copy.hsb == color.hsb
+    copy.red = 1.0
+    assert copy.hsb != color.hsb
+
+
+def test_composite_over():
+    red = Color(1.0, 0.0, 0.0)
+    glass = Color(0.0, 0.0, 1.0, 0.5)
+    assert red.composite(glass) == red
+    assert glass.composite(red) == red.blend(glass)
+    assert glass.composite(glass) == Color(0.0, 0.0, 1.0, 0.75)
+    assert glass.composite(Color(alpha=0.0)) == glass
+
+
+def test_composite_modes():
+    source = Color(1.0, 0.0, 0.0, 0.6)
+    destination = Color(0.0, 1.0, 0.0, 0.5)
+    assert source.composite(destination, 'in') == Color(1.0, 0.0, 0.0, 0.3)
+    assert source.composite(destination, 'out') == Color(1.0, 0.0, 0.0, 0.3)
+    assert source.composite(destination, 'atop') == Color(0.6, 0.4, 0.0, 0.5)
+    assert source.composite(destination, 'xor') == Color(0.6, 0.4, 0.0, 0.5)
+    clear = Color(alpha=0.0)
+    assert clear.composite(clear) == clear
+    with pytest.raises(ValueError):
+        source.composite(destination, 'under')
+
+
+def random_color():
+    return Color.from_bytes(bytes(randrange(256) for _ in range(4)))
+
+
+def test_hex_roundtrip():
+    for _ in range(50):
+        color = random_color()
+        assert Color.from_hex(color.hex) == color
+        assert Color.from_hex(color.hex).hex == color.hex
+        assert Color.from_hex(color.hex.lower()[1:]) == color
+
+
+def test_from_hex_forms():
+    assert Color.from_hex('#FF8000') == Color(1.0, 128 / 255, 0.0, 1.0)
+    assert Color.from_hex('#F80') == Color(1.0, 0x88 / 255, 0.0, 1.0)
+    assert Color.from_hex('f808') == Color(1.0, 0x88 / 255, 0.0, 0x88 / 255)
+    for bad in ['', '#', '#12345', '#GG0000', 'FF 00 00', '#FF0000FF00']:
+        with pytest.raises(ValueError):
+            Color.from_hex(bad)
+
+
+def test_uint32_roundtrip():
+    for _ in range(50):
+        color = random_color()
+        assert Color.from_uint32(color.uint32) == color
+    assert Color(1.0, 0.0, 0.0, 1.0).uint32 == 0xFF0000FF
+
+
+def test_many_codecs_match_single():
+    colors = [random_color() for _ in range(40)]
+    packed = Color.pack_many(colors)
+    assert packed == b''.join(map(bytes, colors))
+    assert Color.unpack_many(packed) == colors
+    assert Color.unpack_many(memoryview(packed)) == colors
+    assert Color.hex_many(colors) == [c.hex for c in colors]
+    assert Color.from_hex_many(Color.hex_many(colors)) == colors
+    assert list(Color.uint32_many(colors)) == [c.uint32 for c in colors]
+    assert Color.from_uint32_many(Color.uint32_many(colors)) == colors
+    assert Color.unpack_many(b'') == []
+    assert Color.hex_many([]) == []
+    with pytest.raises(ValueError):
+        Color.unpack_many(packed[:-1])
+
+
+def test_hex_out_of_range():
+    bright = Color(0.5, 0.2, 0.2).divide(Color(0.25, 0.5, 0.5))
+    assert bright.hex == '#1FE6666FF'
+    dark = Color(-0.1, 0.0, 0.0)
+    assert dark.hex == '#-190000FF'
+    assert Color.hex_many([Color(), bright]) == ['#000000FF', bright.hex]
+
+
+def test_describe_many_matches_description():
+    colors = [random_color() for _ in range(2000)]
+    colors += [Color.from_hsb(hue=n / 24, saturation=1.0, brightness=1.0)
+               for n in range(25)]
+    colors += [Color.from_hsb(0.5, s, b) for s in (0.1, 0.5, 0.75)
+               for b in (0.0, 0.001, 0.05, 0.2, 0.8, 1.0)]
+    colors += [Color(r / 255, g / 255, b / 255) for r in range(0, 256, 17)
+               for g in range(0, 256, 51) for b in range(0, 256, 85)]
+    assert describe_many(colors) == [c.description for c in colors]
+    assert describe_many(iter(colors[:10])) == describe_many(colors[:10])
+    assert describe_many([]) == []
+
+
+def test_describe_many_after_setters():
+    colors = [random_color() for _ in range(200)]
+    for color in colors:
+        color.hue = randrange(24) / 24
+    assert describe_many(colors) == [c.description for c in colors]
@@ -0,0 +1,115 @@
+import pytest
+from .bitmap import ColorBuffer
+from .color import Color
+from .gradient import Gradient
+from .vector import V2
+from math import atan2, pi
+from random import random, randrange
+
+
+red = Color(1.0, 0.0, 0.0)
+green = Color(0.0, 1.0, 0.0)
+blue = Color(0.0, 0.0, 1.0, 0.5)
+
+
+def rainbow(space='rgb'):
+    return Gradient([(1.0, blue), (0.0, red), (0.5, green)], space)
+
+
+def baked(gradient, color, t):
+    'Checks color is one of the table entries either side of t'
+    t = min(max(t, 0.0), 1.0) * 255
+    return any(color == gradient.color_at(i / 255)
+               for i in {int(t), min(int(t) + 1, 255)})
+
+
+def test_color_at_rgb():
+    gradient = rainbow()
+    assert gradient.color_at(-1.0) == red
+    assert gradient.color_at(0.0) == red
+    assert gradient.color_at(0.25) == Color(0.5, 0.5, 0.0)
+    assert gradient.color_at(0.5) == green
+    assert gradient.color_at(0.75) == Color(0.0, 0.5, 0.5, 0.75)
+    assert gradient.color_at(2.0) == blue
+
+
+def test_color_at_hsb_goes_the_short_way():
+    gradient = Gradient([(0.0, red), (1.0, Color(0.0, 0.0, 1.0))], 'hsb')
+    assert gradient.color_at(0.5) == Color(1.0, 0.0, 1.0)
+    gray = Gradient([(0.0, Color(0.5, 0.5, 0.5)), (1.0, red)], 'hsb')
+    assert gray.color_at(0.5).hue == 0.0
+
+
+def test_color_at_linear_light():
+    gradient = Gradient([(0.0, Color()), (1.0, Color(1.0, 1.0, 1.0))],
+                        'linear')
+    middle = gradient.color_at(0.5)
+    assert abs(middle.red - 0.7354) < 0.001
+    assert gradient.color_at(1.0) == Color(1.0, 1.0, 1.0)
+
+
+def test_bake_is_cached_per_definition():
+    first = rainbow('hsb')
+    second = rainbow('hsb')
+    assert first._planes(64) is second._planes(64)
+    assert first._planes(64) is not rainbow('rgb')._planes(64)
+    baked = first.bake(64)
+    assert len(baked) == 64 * 4
+    assert baked[:4] == bytes(red)
+    assert baked[-4:] == bytes(blue)
+
+
+def test_sample_many():
+    gradient = rainbow('linear')
+    positions = [random() for _ in range(100)] + [-1.0, 2.0]
+    for color, t in zip(gradient.sample_many(positions), positions):
+        assert baked(gradient, color, t)
+
+
+def test_fill_linear():
+    gradient = rainbow()
+    for start, end in [(V2(0, 0), V2(39, 0)), (V2(5, 3), V2(30, 20)),
+                       (V2(35, 25), V2(2, 4)), (V2(10, 0), V2(10, 29))]:
+        buffer = gradient.fill_linear(ColorBuffer(40, 30), start, end)
+        direction = end - start
+        for _ in range(100):
+            x, y = randrange(40), randrange(30)
+            t = (V2(x, y) - start).dot_product(direction) \
+                / direction.length_squared
+            assert baked(gradient, buffer[x, y], t)
+
+
+def test_fill_radial():
+    gradient = rainbow('hsb')
+    center = V2(20.5, 12)
+    buffer = gradient.fill_radial(ColorBuffer(40, 30), center, 15)
+    for _ in range(100):
+        x, y = randrange(40), randrange(30)
+        t = (V2(x, y) - center).length / 15
+        assert baked(gradient, buffer[x, y], t)
+    far = gradient.fill_radial(ColorBuffer(4, 4), V2(100, 100), 5)
+    assert all(color == blue for color in far)
+
+
+def test_fill_angular():
+    gradient = rainbow()
+    center = V2(20, 15)
+    buffer = gradient.fill_angular(ColorBuffer(40, 30), center, pi / 4)
+    assert buffer[30, 25] == red
+    for _ in range(100):
+        x, y = randrange(40), randrange(30)
+        if (x, y) == (20, 15):
+            continue
+        t = ((atan2(y - 15, x - 20) - pi / 4) % (2 * pi)) / (2 * pi)
+        assert baked(gradient, buffer[x, y], t)
+
+
+def test_errors():
+    with pytest.raises(ValueError):
+        Gradient([(0.0, red)], 'lab')
+    with pytest.raises(ValueError):
+        Gradient([])
+    with pytest.raises(ValueError):
+        rainbow().bake(257)
+    with pytest.raises(ValueError):
+        rainbow().fill_radial(ColorBuffer(4, 4), V2(2, 2), 0)
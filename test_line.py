@@ -1,6 +1,7 @@
 import pytest
-from .shape import Line
+from .shape import Line, segment_intersections
 from .vector import V2
+from random import random
 
 
 def test_length():
@@ -28,3 +29,88 @@ def test_line_intersection_failure():
     b = Line(V2(0, 0), V2(0, 0))
     with pytest.raises(NotImplementedError):
         a.intersection(b)
+
+
+def test_bounds():
+    l1 = Line(V2(10, 0), V2(0, 5))
+    assert l1.bounds == (0, 0, 10, 5)
+
+
+def test_translate():
+    l1 = Line(V2(0, 0), V2(10, 10))
+    l1.translate(V2(1, 2))
+    assert l1.p1 == V2(1, 2)
+    assert l1.p2 == V2(11, 12)
+
+
+def test_segment_intersection():
+    l1 = Line(V2(0, 0), V2(10, 10))
+    l2 = Line(V2(0, 10), V2(10, 0))
+    assert l1.segment_intersection(l2) == V2(5, 5)
+
+
+def test_segment_intersection_axis_aligned():
+    horizontal = Line(V2(0, 5), V2(10, 5))
+    vertical = Line(V2(3, 0), V2(3, 10))
+    assert horizontal.segment_intersection(vertical) == V2(3, 5)
+    assert vertical.segment_intersection(Line(V2(4, 0), V2(4, 10))) is None
+
+
+def test_segment_intersection_misses():
+    l1 = Line(V2(0, 0), V2(1, 1))
+    l2 = Line(V2(0, 10), V2(10, 0))
+    assert l1.segment_intersection(l2) is None
+
+
+def test_segment_intersection_touching():
+    l1 = Line(V2(0, 0), V2(10, 0))
+    l2 = Line(V2(5, 0), V2(5, 5))
+    assert l1.segment_intersection(l2) == V2(5, 0)
+    assert l2.segment_intersection(l1) == V2(5, 0)
+
+
+def test_segment_intersection_collinear():
+    l1 = Line(V2(0, 0), V2(10, 10))
+    assert l1.segment_intersection(Line(V2(5, 5), V2(15, 15))) == V2(5, 5)
+    assert l1.segment_intersection(Line(V2(11, 11), V2(15, 15))) is None
+    vertical = Line(V2(2, 0), V2(2, 4))
+    assert vertical.segment_intersection(Line(V2(2, 3), V2(2, 9))) == V2(2, 3)
+    point = Line(V2(2, 2), V2(2, 2))
+    assert l1.segment_intersection(point) == V2(2, 2)
+    assert point.segment_intersection(vertical) == V2(2, 2)
+    assert point.segment_intersection(Line(V2(2, 3), V2(2, 9))) is None
+
+
+def test_segment_intersection_nearly_parallel():
+    # Exact fallback: c sits exactly on a->b even though floats round
+    l1 = Line(V2(0.1, 0.1), V2(0.3, 0.3))
+    l2 = Line(V2(0.2, 0.2), V2(0.2, 1))
+    assert l1.segment_intersection(l2) == V2(0.2, 0.2)
+
+
+def random_segment(axis_aligned=False):
+    start = V2(random() * 100, random() * 100)
+    if axis_aligned:
+        if random() < 0.5:
+            return Line(start, start + V2(random() * 20, 0))
+        return Line(start, start + V2(0, random() * 20))
+    return Line(start, start + V2(random() * 20 - 10, random() * 20 - 10))
+
+
+def test_segment_intersections_matches_brute_force():
+    lines = [random_segment(i % 2 == 0) for i in range(300)]
+    # Some exact repeats and collinear overlaps
+    lines.append(Line(lines[0].p1.copy, lines[0].p2.copy))
+    lines.append(Line(V2(0, 50), V2(100, 50)))
+    lines.append(Line(V2(20, 50), V2(30, 50)))
+    expected = []
+    for i, a in enumerate(lines):
+        for j in range(i + 1, len(lines)):
+            point = a.segment_intersection(lines[j])
+            if point is not None:
+                expected.append((i, j, point))
+    found = segment_intersections(lines)
+    assert [(i, j) for i, j, _ in found] == [(i, j) for i, j, _ in expected]
+    assert [p for _, _, p in found] == [p for _, _, p in expected]
+    assert segment_intersections(lines, cell_size=3) == found
+    assert segment_intersections([]) == []
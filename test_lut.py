@@ -0,0 +1,100 @@
+import pytest
+from .bitmap import ColorBuffer
+from .color import Color
+from .lut import ColorLUT
+from io import BytesIO
+from random import random, randrange
+
+
+def random_color():
+    return Color(random(), random(), random(), random())
+
+
+def grade(color):
+    return color.multiply(Color(1.0, 0.8, 0.6)).lighten(Color(0.1, 0.1, 0.1))
+
+
+def test_identity():
+    lut = ColorLUT(5)
+    for _ in range(50):
+        color = random_color()
+        assert lut.apply(color) == color
+
+
+def test_linear_function_is_exact():
+    lut = ColorLUT.bake(lambda c: Color(1 - c.red, c.blue, c.green), 3)
+    for _ in range(50):
+        color = random_color()
+        result = lut.apply(color)
+        assert abs(result.red - (1 - color.red)) < 1e-9
+        assert abs(result.green - color.blue) < 1e-9
+        assert abs(result.blue - color.green) < 1e-9
+        assert result.alpha == color.alpha
+
+
+def test_bake_matches_function_at_grid_points():
+    lut = ColorLUT.bake(grade, 9)
+    for r in range(9):
+        for b in range(9):
+            color = Color(r / 8, 0.5, b / 8)
+            assert lut.apply(color) == grade(color)
+
+
+def test_bake_close_to_function():
+    lut = ColorLUT.bake(grade, 33)
+    for _ in range(50):
+        color = random_color()
+        expected = grade(color)
+        expected.alpha = color.alpha
+        assert lut.apply(color) == expected
+
+
+def test_apply_many():
+    lut = ColorLUT.bake(grade, 9)
+    colors = [random_color() for _ in range(20)]
+    assert lut.apply_many(colors) == [lut.apply(c) for c in colors]
+    assert lut.apply_many(iter(colors)) == lut.apply_many(colors)
+
+
+def test_apply_buffer():
+    lut = ColorLUT.bake(grade, 9)
+    colors = [Color.from_bytes(bytes(randrange(256) for _ in range(4)))
+              for _ in range(35)]
+    buffer = ColorBuffer.from_colors(7, 5, colors)
+    result = lut.apply_buffer(buffer)
+    assert result.to_colors() == lut.apply_many(colors)
+    assert buffer.to_colors() == colors
+
+
+def test_clamps_inputs_and_outputs():
+    lut = ColorLUT.bake(lambda c: Color(c.red * 2, c.green - 1, c.blue), 3)
+    result = lut.apply(Color(1.5, -0.5, 0.5))
+    assert result == Color(1.0, 0.0, 0.5)
+
+
+def test_bytes_roundtrip():
+    lut = ColorLUT.bake(grade, 5)
+    copy = ColorLUT.from_bytes(bytes(lut))
+    assert copy.size == 5
+    assert copy.table == lut.table
+    stream = BytesIO()
+    assert lut.write(stream) == len(bytes(lut))
+    stream.seek(0)
+    assert ColorLUT.read(stream).table == lut.table
+
+
+def test_bytes_layout():
+    packed = bytes(ColorLUT(2))
+    assert packed[:8] == b'LUT3\x02\x00\x00\x00'
+    assert len(packed) == 8 + 2 * 2 * 2 * 3 * 8
+    # The last entry is white, with 1.0 stored little endian
+    assert packed[-8:] == b'\x00\x00\x00\x00\x00\x00\xf0\x3f'
+
+
+def test_errors():
+    with pytest.raises(ValueError):
+        ColorLUT(1)
+    with pytest.raises(ValueError):
+        ColorLUT(3, [0.0] * 10)
+    with pytest.raises(ValueError):
+        ColorLUT.from_bytes(b'NOPE' + bytes(bytes(ColorLUT(2))[4:]))
@@ -0,0 +1,92 @@
+import pytest
+from .bitmap import ColorBuffer
+from .color import Color
+from .palette import median_cut, octree, PaletteMapper
+from random import randrange
+
+
+def random_color():
+    return Color.from_bytes(bytes(randrange(256) for _ in range(3)) + b'\xff')
+
+
+def random_buffer(width=32, height=24):
+    colors = [random_color() for _ in range(width * height)]
+    return ColorBuffer.from_colors(width, height, colors), colors
+
+
+def brute_force(palette, color):
+    planes = [c.rgba8888 for c in palette]
+    red, green, blue, _ = color.rgba8888
+    return min(range(len(palette)), key=lambda i: (
+        (planes[i][0] - red) ** 2 + (planes[i][1] - green) ** 2 +
+        (planes[i][2] - blue) ** 2, i))
+
+
+@pytest.mark.parametrize('quantize', [median_cut, octree])
+def test_few_colors_are_exact(quantize):
+    colors = [Color(1.0, 0.0, 0.0)] * 5 + [Color(0.0, 0.0, 1.0, 0.5)] * 3
+    assert quantize(colors, 4) == [Color(1.0, 0.0, 0.0), Color(0.0, 0.0, 1.0)]
+
+
+@pytest.mark.parametrize('quantize', [median_cut, octree])
+def test_palette_size(quantize):
+    buffer, colors = random_buffer()
+    for count in (1, 2, 16, 256):
+        palette = quantize(buffer, count)
+        assert 0 < len(palette) <= count
+        assert quantize(colors, count) == palette
+
+
+def cluster_centers(quantize):
+    if quantize is median_cut:
+        # Equal clusters along one axis split exactly at the medians
+        return [Color(0.1, 0.1, 0.1), Color(0.4, 0.4, 0.4),
+                Color(0.6, 0.6, 0.6), Color(0.9, 0.9, 0.9)]
+    return [Color(0.1, 0.1, 0.1), Color(0.9, 0.2, 0.2),
+            Color(0.2, 0.9, 0.2), Color(0.2, 0.2, 0.9)]
+
+
+@pytest.mark.parametrize('quantize', [median_cut, octree])
+def test_clusters(quantize):
+    centers = cluster_centers(quantize)
+    colors = [Color(c.red + randrange(-5, 6) / 255,
+                    c.green + randrange(-5, 6) / 255,
+                    c.blue + randrange(-5, 6) / 255)
+              for c in centers for _ in range(200)]
+    palette = quantize(colors, 4)
+    assert len(palette) == 4
+    for center in centers:
+        assert any(abs(p.red - center.red) < 0.03 and
+                   abs(p.green - center.green) < 0.03 and
+                   abs(p.blue - center.blue) < 0.03 for p in palette)
+
+
+def test_mapper_matches_brute_force_on_cell_centers():
+    palette = [random_color() for _ in range(40)]
+    mapper = PaletteMapper(palette)
+    for _ in range(300):
+        r, g, b = [randrange(32) * 8 + 4 for _ in range(3)]
+        color = Color(r / 255, g / 255, b / 255)
+        assert mapper.nearest(color) == brute_force(palette, color)
+
+
+def test_mapper_indices_and_apply():
+    buffer, colors = random_buffer()
+    palette = median_cut(buffer, 16)
+    mapper = PaletteMapper(palette, bits=4)
+    indices = mapper.indices(buffer)
+    assert len(indices) == len(buffer)
+    assert indices == mapper.indices(colors)
+    assert list(indices) == [mapper.nearest(c) for c in colors]
+    mapped = mapper.apply_buffer(buffer)
+    for i, color in zip(indices, mapped):
+        assert color == palette[i]
+
+
+def test_mapper_errors():
+    with pytest.raises(ValueError):
+        PaletteMapper([])
+    with pytest.raises(ValueError):
+        PaletteMapper([Color()] * 257)
+    with pytest.raises(ValueError):
+        PaletteMapper([Color()], bits=6)
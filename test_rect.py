@@ -1,5 +1,5 @@
 from .shape import Rect
-from .vector import V2
+from .vector import V2, V2Array
 
 
 class MockWriter:
@@ -98,3 +98,16 @@ def test_x_position():
 def test_y_position():
     a = Rect(position=V2(10, 20), size=V2(30, 40))
     assert a.y1 == 20
+
+
+def test_bounds():
+    r = Rect(V2(10, 5), V2(4, 3))
+    assert r.bounds == (r.x1, r.y1, r.x2, r.y2)
+
+
+def test_contains_many():
+    r = Rect(V2(0, 0), V2(10, 10))
+    points = [V2(0, 0), V2(10, 5), V2(9.99, 9.99), V2(-1, 5), V2(5, 10)]
+    mask = r.contains_many(V2Array.from_vectors(points))
+    assert mask == [r.contains(p) for p in points]
+    assert mask == [True, False, True, False, False]
@@ -1,4 +1,4 @@
-from . import Circle
+from . import Circle, Rect, V2Array, containment_pairs
 from . import V2
 
 
@@ -83,3 +83,24 @@ def test_write():
     writer = MockWriter()
     c.write(writer)
     assert writer.written == bytes(c)
+
+
+def test_bounds():
+    c = Circle(radius=2, position=V2(3, 4))
+    assert c.bounds == (1, 2, 5, 6)
+
+
+def test_contains_many():
+    c = Circle(radius=2.0, position=V2(3, 0))
+    points = [V2(2, 1), V2(0, 0), V2(3, 1.999), V2(5, 0), V2(3, -2.5)]
+    mask = c.contains_many(V2Array.from_vectors(points))
+    assert mask == [c.contains(p) for p in points]
+    assert mask == [True, False, True, False, False]
+
+
+def test_containment_pairs():
+    shapes = [Circle(radius=1.0, position=V2(0, 0)),
+              Rect(V2(0, 0), V2(2, 2))]
+    points = V2Array.from_vectors([V2(0.5, 0.5), V2(1.5, 1.5), V2(-3, 0)])
+    assert containment_pairs(shapes, points) == [(0, 0), (1, 0), (1, 1)]
+    assert containment_pairs(shapes, V2Array()) == []
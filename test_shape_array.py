@@ -0,0 +1,112 @@
+import pytest
+from .shape import Circle, Rect, CircleArray, RectArray
+from .vector import V2, V2Array
+from random import random
+
+
+def close_enough(a, b):
+    return abs(a - b) < 0.0001
+
+
+@pytest.fixture
+def circles():
+    return [Circle(random() * 5, V2(random() * 100, random() * 100))
+            for _ in range(40)]
+
+
+@pytest.fixture
+def rects():
+    return [Rect(V2(random() * 100, random() * 100),
+                 V2(random() * 20, random() * 20))
+            for _ in range(40)]
+
+
+def test_circle_round_trip(circles):
+    a = CircleArray.from_circles(circles)
+    assert len(a) == 40
+    assert a.to_circles() == circles
+    assert a[7] == circles[7]
+    assert a[3:6].to_circles() == circles[3:6]
+    a[0] = Circle(9, V2(1, 2))
+    assert a[0] == Circle(9, V2(1, 2))
+
+
+def test_circle_measurements(circles):
+    a = CircleArray.from_circles(circles)
+    for area, diameter, c in zip(a.area, a.diameter, circles):
+        assert close_enough(area, c.area)
+        assert close_enough(diameter, c.diameter)
+    for x1, y1, x2, y2, c in zip(*a.bounds, circles):
+        assert (x1, y1, x2, y2) == c.bounds
+
+
+def test_circle_contains(circles):
+    a = CircleArray.from_circles(circles)
+    point = V2(50, 50)
+    assert a.contains(point) == [c.contains(point) for c in circles]
+
+
+def test_circle_translate_and_scale(circles):
+    a = CircleArray.from_circles(circles)
+    a.translate(V2(3, -4))
+    a.scale(2)
+    for circle in circles:
+        circle.translate(V2(3, -4))
+        circle.scale(2)
+    assert a.to_circles() == circles
+    offsets = V2Array([1] * 40, [2] * 40)
+    a.translate(offsets)
+    assert a[0].position == circles[0].position + V2(1, 2)
+    with pytest.raises(ValueError):
+        a.translate(offsets[1:])
+
+
+def test_circle_view_shares_memory(circles):
+    a = CircleArray.from_circles(circles)
+    view = a.view(10, 20)
+    assert len(view) == 10
+    assert view.to_circles() == circles[10:20]
+    view.translate(V2(100, 0))
+    assert a[10].position == circles[10].position + V2(100, 0)
+    assert a[9] == circles[9]
+
+
+def test_mismatched_columns():
+    with pytest.raises(ValueError):
+        CircleArray([1, 2], [0, 0], [0])
+    with pytest.raises(ValueError):
+        RectArray([1, 2], [0, 0], [0, 0], [0])
+
+
+def test_rect_round_trip(rects):
+    a = RectArray.from_rects(rects)
+    assert len(a) == 40
+    assert a.to_rects() == rects
+    assert a[5] == rects[5]
+    assert list(a[::2]) == rects[::2]
+
+
+def test_rect_measurements(rects):
+    a = RectArray.from_rects(rects)
+    for area, perimeter, r in zip(a.area, a.perimeter, rects):
+        assert close_enough(area, r.area)
+        assert close_enough(perimeter, r.perimeter)
+    for x1, y1, x2, y2, r in zip(*a.bounds, rects):
+        assert (x1, y1, x2, y2) == r.bounds
+
+
+def test_rect_contains(rects):
+    a = RectArray.from_rects(rects)
+    point = V2(50, 50)
+    assert a.contains(point) == [r.contains(point) for r in rects]
+
+
+def test_rect_translate_scale_view(rects):
+    a = RectArray.from_rects(rects)
+    view = a.view(stop=5)
+    view.translate(V2(1, 1))
+    view.scale(0.5)
+    for r in rects[:5]:
+        r.translate(V2(1, 1))
+        r.scale(0.5)
+    assert a.to_rects() == rects
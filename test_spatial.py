@@ -0,0 +1,339 @@
+import pytest
+from .shape import Circle, Line, Rect
+from .spatial import WeldIndex, KDTree, SpatialHash, QuadTree, AABBTree
+from .vector import V2, V3, V2Array
+from random import random, randrange
+
+
+def close_enough(a, b):
+    return abs(a - b) < 0.0001
+
+
+def test_weld_near_equal():
+    index = WeldIndex()
+    points = [V2(1, 1), V2(5, 5), V2(1.00005, 0.99995), V2(5, 5.00002)]
+    assert index.weld(points) == [0, 1, 0, 1]
+    assert len(index) == 2
+    assert index[0] is points[0]
+
+
+def test_weld_across_cell_boundaries():
+    index = WeldIndex()
+    # 0.0001 sits on a cell boundary, both sides must weld together
+    a = V2(0.00009999, 0)
+    b = V2(0.00010001, 0)
+    assert index.add(a) == index.add(b)
+
+
+def test_outside_tolerance():
+    index = WeldIndex()
+    assert index.weld([V2(0, 0), V2(0.0002, 0)]) == [0, 1]
+
+
+def test_matches_equality():
+    index = WeldIndex()
+    points = [V2(round(random(), 4), round(random(), 4)) for _ in range(200)]
+    indices = index.weld(points)
+    for point, i in zip(points, indices):
+        assert index[i] == point
+
+
+def test_v3():
+    index = WeldIndex()
+    points = [V3(1, 2, 3), V3(1, 2, 3.00001), V3(3, 2, 1)]
+    assert index.weld(points) == [0, 0, 1]
+
+
+def test_membership():
+    index = WeldIndex()
+    index.add(V2(10, 10))
+    assert V2(10.00005, 10) in index
+    assert V2(11, 10) not in index
+    assert index.find(V2(10, 9.99999)) == 0
+    assert index.find(V2(0, 0)) is None
+    assert WeldIndex().find(V2()) is None
+
+
+def test_custom_tolerance():
+    index = WeldIndex(tolerance=0.5)
+    assert index.weld([V2(0, 0), V2(0.4, -0.4), V2(1, 0)]) == [0, 0, 1]
+
+
+def random_points(n):
+    return [V2(random() * 100, random() * 100) for _ in range(n)]
+
+
+def brute_distances(points, query):
+    return sorted(((p - query).length, i) for i, p in enumerate(points))
+
+
+def test_kdtree_nearest():
+    points = random_points(500)
+    tree = KDTree(points)
+    assert len(tree) == 500
+    for _ in range(20):
+        query = V2(random() * 100, random() * 100)
+        expected = brute_distances(points, query)[:5]
+        found = tree.nearest(query, k=5)
+        assert [i for i, _ in found] == [i for _, i in expected]
+        for (_, a), (b, _) in zip(found, expected):
+            assert close_enough(a, b)
+
+
+def test_kdtree_radius():
+    points = random_points(500)
+    tree = KDTree(points, leaf_size=1)
+    query = V2(50, 50)
+    expected = [i for d, i in brute_distances(points, query) if d <= 15]
+    assert [i for i, _ in tree.within_radius(query, 15)] == expected
+
+
+def test_kdtree_rect():
+    points = random_points(500)
+    tree = KDTree(V2Array.from_vectors(points))
+    rect = Rect(V2(20, 30), V2(25, 10))
+    expected = [i for i, p in enumerate(points) if rect.contains(p)]
+    assert tree.within_rect(rect) == expected
+
+
+def test_kdtree_duplicates_and_axis_lines():
+    points = [V2(5, i % 3) for i in range(100)]
+    tree = KDTree(points, leaf_size=2)
+    assert len(tree.within_radius(V2(5, 1), 0)) == 33
+    assert len(tree.within_rect(Rect(V2(5, 0), V2(1, 1)))) == 34
+
+
+def test_kdtree_v3():
+    points = [V3(random(), random(), random()) for _ in range(200)]
+    tree = KDTree(points)
+    query = V3(0.5, 0.5, 0.5)
+    expected = min(range(200), key=lambda i: (points[i] - query).length)
+    assert tree.nearest(query)[0][0] == expected
+    with pytest.raises(ValueError):
+        tree.within_rect(Rect(V2(0, 0), V2(1, 1)))
+
+
+def test_kdtree_splits():
+    points = [V3(randrange(5), randrange(5), random()) for _ in range(2000)]
+    tree = KDTree(points, leaf_size=3)
+    assert sorted(tree.indices) == list(range(2000))
+    stack = [(0, 2000, 0)]
+    while stack:
+        lo, hi, depth = stack.pop()
+        if hi - lo <= 3:
+            continue
+        mid = (lo + hi) // 2
+        column = tree.columns[depth % 3]
+        assert all(column[i] <= column[mid] for i in range(lo, mid))
+        assert all(column[i] >= column[mid] for i in range(mid + 1, hi))
+        stack.append((lo, mid, depth + 1))
+        stack.append((mid + 1, hi, depth + 1))
+
+
+def test_kdtree_empty():
+    tree = KDTree([])
+    assert tree.nearest(V2()) == []
+    assert tree.within_radius(V2(), 10) == []
+
+
+def random_shapes(n):
+    shapes = []
+    for i in range(n):
+        position = V2(random() * 100, random() * 100)
+        if i % 2:
+            shapes.append(Circle(radius=random() * 3, position=position))
+        else:
+            shapes.append(Rect(position, V2(random() * 5, random() * 5)))
+    return shapes
+
+
+def overlapping(a, b):
+    ax1, ay1, ax2, ay2 = a.bounds
+    bx1, by1, bx2, by2 = b.bounds
+    return ax1 <= bx2 and bx1 <= ax2 and ay1 <= by2 and by1 <= ay2
+
+
+def pair_ids(pairs):
+    return {frozenset((id(a), id(b))) for a, b in pairs}
+
+
+def brute_pairs(shapes):
+    return [(a, b) for i, a in enumerate(shapes)
+            for b in shapes[i + 1:] if overlapping(a, b)]
+
+
+def test_hash_pairs_match_brute_force():
+    shapes = random_shapes(300)
+    grid = SpatialHash(cell_size=5)
+    for shape in shapes:
+        grid.insert(shape)
+    assert len(grid) == 300
+    found = grid.pairs()
+    assert len(found) == len(pair_ids(found))
+    assert pair_ids(found) == pair_ids(brute_pairs(shapes))
+
+
+def test_hash_move_and_remove():
+    shapes = random_shapes(100)
+    grid = SpatialHash(cell_size=7)
+    for shape in shapes:
+        grid.insert(shape)
+    for shape in shapes[:50]:
+        grid.move(shape, V2(random() * 20 - 10, random() * 20 - 10))
+    for shape in shapes[50:60]:
+        grid.remove(shape)
+    assert shapes[50] not in grid
+    remaining = shapes[:50] + shapes[60:]
+    assert pair_ids(grid.pairs()) == pair_ids(brute_pairs(remaining))
+    with pytest.raises(KeyError):
+        grid.remove(shapes[50])
+    with pytest.raises(ValueError):
+        grid.insert(shapes[0])
+
+
+def test_hash_queries():
+    shapes = random_shapes(200)
+    grid = SpatialHash(cell_size=4)
+    for shape in shapes:
+        grid.insert(shape)
+    point = V2(50, 50)
+    expected = {id(s) for s in shapes if s.contains(point)}
+    assert {id(s) for s in grid.query_point(point)} == expected
+    regions = [Rect(V2(20, 20), V2(30, 10)), Rect(V2(-50, -50), V2(500, 500))]
+    for region in regions:
+        expected = {id(s) for s in shapes if overlapping(s, region)}
+        assert {id(s) for s in grid.query_rect(region)} == expected
+
+
+def test_quadtree_points_match_rect_contains():
+    points = random_points(2000)
+    tree = QuadTree.from_items(points, capacity=4)
+    assert len(tree) == 2000
+    for _ in range(20):
+        region = Rect(V2(random() * 90, random() * 90),
+                      V2(random() * 30, random() * 30))
+        expected = {id(p) for p in points if region.contains(p)}
+        assert {id(p) for p in tree.query_rect(region)} == expected
+
+
+def test_quadtree_shapes():
+    shapes = random_shapes(500)
+    tree = QuadTree.from_items(shapes)
+    point = V2(40, 60)
+    expected = {id(s) for s in shapes
+                if s.bounds[0] <= point.x < s.bounds[2]
+                and s.bounds[1] <= point.y < s.bounds[3]}
+    assert {id(s) for s in tree.query_point(point)} == expected
+    region = Rect(V2(10, 10), V2(40, 40))
+    expected = {id(s) for s in shapes
+                if region.x1 <= s.bounds[2] and s.bounds[0] < region.x2
+                and region.y1 <= s.bounds[3] and s.bounds[1] < region.y2}
+    assert {id(s) for s in tree.query_rect(region)} == expected
+
+
+def test_quadtree_incremental():
+    tree = QuadTree((0, 0, 100, 100), capacity=2)
+    points = random_points(300)
+    for p in points:
+        tree.insert(p)
+    # Items outside the tree's bounds are still found
+    outside = V2(500, -500)
+    tree.insert(outside)
+    assert outside in tree
+    assert tree.query_rect(Rect(V2(400, -600), V2(200, 200))) == [outside]
+    for p in points[:250]:
+        tree.remove(p)
+    assert len(tree) == 51
+    everything = Rect(V2(-1000, -1000), V2(2000, 2000))
+    assert len(tree.query_rect(everything)) == 51
+    moved = points[260]
+    moved += V2(0.5, 0.5)
+    tree.update(moved)
+    region = Rect(moved - V2(0.1, 0.1), V2(0.2, 0.2))
+    assert any(p is moved for p in tree.query_rect(region))
+    with pytest.raises(KeyError):
+        tree.remove(points[0])
+    with pytest.raises(ValueError):
+        tree.insert(moved)
+
+
+def test_quadtree_duplicates():
+    points = [V2(1, 1) for _ in range(100)]
+    tree = QuadTree.from_items(points, capacity=4, max_depth=6)
+    assert len(tree.query_rect(Rect(V2(0, 0), V2(2, 2)))) == 100
+
+
+def random_mixed_shapes(n):
+    shapes = random_shapes(n)
+    for i in range(0, n, 3):
+        start = V2(random() * 100, random() * 100)
+        shapes[i] = Line(start, start + V2(random() * 6 - 3, random() * 6 - 3))
+    return shapes
+
+
+def test_aabb_pairs_match_brute_force():
+    shapes = random_mixed_shapes(300)
+    tree = AABBTree(margin=0.5)
+    for shape in shapes:
+        tree.insert(shape)
+    assert len(tree) == 300
+    found = tree.pairs()
+    assert len(found) == len(pair_ids(found))
+    assert pair_ids(found) == pair_ids(brute_pairs(shapes))
+
+
+def test_aabb_move_scale_remove():
+    shapes = random_mixed_shapes(200)
+    tree = AABBTree(margin=0.5)
+    for shape in shapes:
+        tree.insert(shape)
+    for _ in range(5):
+        for shape in shapes:
+            tree.move(shape, V2(random() * 4 - 2, random() * 4 - 2))
+    assert not tree.move(shapes[1], V2(0, 0))
+    tree.scale(shapes[1], 3)
+    for shape in shapes[:20]:
+        tree.remove(shape)
+    assert shapes[0] not in tree
+    assert pair_ids(tree.pairs()) == pair_ids(brute_pairs(shapes[20:]))
+    with pytest.raises(KeyError):
+        tree.remove(shapes[0])
+    with pytest.raises(ValueError):
+        tree.insert(shapes[30])
+
+
+def test_aabb_queries():
+    shapes = random_mixed_shapes(300)
+    tree = AABBTree()
+    for shape in shapes:
+        tree.insert(shape)
+    region = Rect(V2(30, 30), V2(20, 15))
+    expected = {id(s) for s in shapes if overlapping(s, region)}
+    assert {id(s) for s in tree.query_rect(region)} == expected
+    point = V2(50, 50)
+    expected = {id(s) for s in shapes
+                if s.bounds[0] <= 50 <= s.bounds[2]
+                and s.bounds[1] <= 50 <= s.bounds[3]}
+    assert {id(s) for s in tree.query_point(point)} == expected
+
+
+def test_aabb_stays_balanced():
+    tree = AABBTree()
+    assert tree.height == -1
+    # Sorted inserts would make a list out of an unbalanced tree
+    for i in range(1024):
+        tree.insert(Rect(V2(i * 2, 0), V2(1, 1)))
+    assert tree.height <= 20
+
+
+def test_aabb_bulk_build():
+    shapes = random_mixed_shapes(500)
+    tree = AABBTree.from_shapes(shapes, margin=0.5)
+    assert len(tree) == 500
+    assert tree.height <= 10
+    assert pair_ids(tree.pairs()) == pair_ids(brute_pairs(shapes))
+    for shape in shapes[:100]:
+        tree.move(shape, V2(random() * 10 - 5, random() * 10 - 5))
+    tree.insert(Circle(radius=2, position=V2(50, 50)))
+    assert len(tree) == 501
+    assert AABBTree.from_shapes([]).height == -1
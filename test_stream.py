@@ -0,0 +1,86 @@
+import pytest
+from io import BytesIO
+from .color import Color
+from .shape import Circle, Rect
+from .stream import RecordWriter, read_records
+from .vector import V2, V3
+
+
+def mixed_records(n):
+    records = []
+    for i in range(n):
+        records.append(V2(i, -i))
+        records.append(V3(i, i * 2, i * 3))
+        records.append(Circle(radius=i + 1, position=V2(i, 0)))
+        records.append(Rect(V2(i, i), V2(2, 3)))
+        records.append(Color(red=1.0, alpha=0.5))
+    return records
+
+
+def assert_same(a, b):
+    assert len(a) == len(b)
+    for x, y in zip(a, b):
+        assert type(x) is type(y)
+        assert x == y
+
+
+@pytest.mark.parametrize('length_prefix', [False, True])
+def test_round_trip(length_prefix):
+    records = mixed_records(50)
+    stream = BytesIO()
+    with RecordWriter(stream, batch_size=100,
+                      length_prefix=length_prefix) as writer:
+        writer.write(records[0])
+        writer.write_many(records[1:])
+    stream.seek(0)
+    # A chunk size that splits records across reads
+    assert_same(list(read_records(stream, chunk_size=7)), records)
+
+
+def test_writer_batches():
+    class CountingWriter:
+        def __init__(self):
+            self.calls = 0
+            self.data = bytearray()
+
+        def write(self, value):
+            self.calls += 1
+            self.data += value
+
+    output = CountingWriter()
+    writer = RecordWriter(output, batch_size=1000)
+    writer.write_many(V2(i, i) for i in range(100))
+    assert output.calls == 1
+    writer.flush()
+    assert output.calls == 2
+    assert len(output.data) == 100 * 17
+
+
+def test_from_bytes_unchanged():
+    c = Circle(radius=3, position=V2(1, 2))
+    assert Circle.from_bytes(bytes(c)) == c
+    r = Rect(V2(1, 2), V2(3, 4))
+    assert Rect.from_buffer(b'\x00' + bytes(r), 1) == r
+
+
+def test_skips_unknown_prefixed_records():
+    stream = BytesIO(bytes([0x80 | 99]) + (3).to_bytes(4, 'little') +
+                     b'abc' + b'\x01' + bytes(V2(5, 6)))
+    assert_same(list(read_records(stream)), [V2(5, 6)])
+
+
+def test_errors():
+    with pytest.raises(ValueError):
+        list(read_records(BytesIO(b'\x63')))
+    with pytest.raises(ValueError):
+        list(read_records(BytesIO(b'\x01' + bytes(V2())[:5])))
+    with pytest.raises(TypeError):
+        RecordWriter(BytesIO()).write(object())
+
+
+def test_prefixed_record_with_wrong_size():
+    short = (bytes([0x80 | 1]) + (8).to_bytes(4, 'little') +
+             bytes(V2(1, 2))[:8])
+    stream = BytesIO(short + b'\x01' + bytes(V2(5, 6)))
+    with pytest.raises(ValueError):
+        list(read_records(stream))
@@ -0,0 +1,184 @@
+import pytest
+from array import array
+from .shape import Rect
+from .transform import Affine2D, Mat3, Mat4, Quaternion
+from .vector import V2, V3, V2Array
+from random import random
+
+
+pi = 3.14159265358979323846264
+
+
+def random_vector():
+    return V2(random() * 40 - 20, random() * 40 - 20)
+
+
+def random_transform():
+    return (Affine2D.translation(random_vector()) @
+            Affine2D.rotation(random() * 2 * pi) @
+            Affine2D.scaling(random() + 0.5, random() + 0.5))
+
+
+def test_identity():
+    v = random_vector()
+    assert Affine2D.identity().apply(v) == v
+    assert Affine2D() == Affine2D.identity()
+
+
+def test_translation():
+    m = Affine2D.translation(V2(10, -5))
+    assert m.apply(V2(1, 1)) == V2(11, -4)
+
+
+def test_rotation():
+    assert Affine2D.rotation(pi / 2).apply(V2(1, 0)) == V2(0, 1)
+    assert Affine2D.rotation_degrees(180).apply(V2(1, 2)) == V2(-1, -2)
+    v = random_vector()
+    rotated = Affine2D.rotation_degrees(30).apply(v)
+    expected = v.copy
+    expected.degrees += 30
+    assert rotated == expected
+
+
+def test_scaling():
+    assert Affine2D.scaling(2).apply(V2(3, 4)) == V2(6, 8)
+    assert Affine2D.scaling(2, 3).apply(V2(3, 4)) == V2(6, 12)
+
+
+def test_composition_order():
+    m = Affine2D.translation(V2(10, 0)) @ Affine2D.rotation(pi / 2)
+    assert m.apply(V2(1, 0)) == V2(10, 1)
+
+
+def test_composition_matches_chain():
+    transforms = [random_transform() for _ in range(5)]
+    combined = Affine2D()
+    for t in transforms:
+        combined = t @ combined
+    v = random_vector()
+    expected = v
+    for t in transforms:
+        expected = t.apply(expected)
+    assert combined.apply(v) == expected
+
+
+def test_inverse():
+    m = random_transform()
+    v = random_vector()
+    assert m.inverse.apply(m.apply(v)) == v
+    assert m @ m.inverse == Affine2D()
+    with pytest.raises(ValueError):
+        Affine2D.scaling(0).inverse
+
+
+def test_apply_many():
+    m = random_transform()
+    points = [random_vector() for _ in range(50)]
+    moved = m.apply_many(V2Array.from_vectors(points))
+    assert moved.to_vectors() == [m.apply(p) for p in points]
+
+
+def test_apply_rect():
+    r = Rect(V2(0, 0), V2(2, 1))
+    assert Affine2D.translation(V2(1, 1)).apply_rect(r) == Rect(V2(1, 1),
+                                                                V2(2, 1))
+    rotated = Affine2D.rotation(pi / 2).apply_rect(r)
+    assert rotated == Rect(V2(-1, 0), V2(1, 2))
+
+
+def random_v3():
+    return V3(random() * 40 - 20, random() * 40 - 20, random() * 40 - 20)
+
+
+def random_mat3():
+    return (Mat3.rotation_x(random() * pi) @ Mat3.rotation_y(random() * pi) @
+            Mat3.scaling(random() + 0.5, random() + 0.5, random() + 0.5))
+
+
+def test_mat3_rotations():
+    assert Mat3.rotation_z(pi / 2).apply(V3(1, 0, 0)) == V3(0, 1, 0)
+    assert Mat3.rotation_x(pi / 2).apply(V3(0, 1, 0)) == V3(0, 0, 1)
+    assert Mat3.rotation_y(pi / 2).apply(V3(0, 0, 1)) == V3(1, 0, 0)
+
+
+def test_mat3_compose_and_invert():
+    a = random_mat3()
+    b = random_mat3()
+    v = random_v3()
+    assert (a @ b).apply(v) == a.apply(b.apply(v))
+    assert a.inverse.apply(a.apply(v)) == v
+    assert a @ a.inverse == Mat3.identity()
+    assert a.transposed[0, 1] == a[1, 0]
+    with pytest.raises(ValueError):
+        Mat3.scaling(0).inverse
+    with pytest.raises(ValueError):
+        Mat3((1, 2, 3))
+
+
+def test_mat3_batches():
+    m = random_mat3()
+    vectors = [random_v3() for _ in range(30)]
+    expected = [m.apply(v) for v in vectors]
+    assert m.apply_many(vectors) == expected
+    flat = m.apply_components(array('d', V3.pack_many(vectors)))
+    assert V3.unpack_many(flat) == expected
+
+
+def test_mat4():
+    rotation = Mat3.rotation_z(pi / 2)
+    m = Mat4.translation(V3(0, 0, 5)) @ Mat4.from_mat3(rotation)
+    assert m.apply(V3(1, 0, 0)) == V3(0, 1, 5)
+    v = random_v3()
+    assert m.inverse.apply(m.apply(v)) == v
+    assert m @ m.inverse == Mat4.identity()
+    assert Mat4.scaling(2).apply(V3(1, 2, 3)) == V3(2, 4, 6)
+    assert m.transposed[3, 2] == m[2, 3]
+    with pytest.raises(ValueError):
+        Mat4.scaling(0).inverse
+
+
+def test_mat4_batches_and_perspective():
+    # Bottom row copies z into w, so points get divided by their depth
+    m = Mat4((1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0, 1, 0))
+    assert m.apply(V3(4, 2, 2)) == V3(2, 1, 1)
+    m = Mat4.translation(random_v3()) @ Mat4.from_mat3(random_mat3())
+    vectors = [random_v3() for _ in range(30)]
+    expected = [m.apply(v) for v in vectors]
+    assert m.apply_many(vectors) == expected
+    flat = m.apply_components(array('d', V3.pack_many(vectors)))
+    assert V3.unpack_many(flat) == expected
+    assert m.apply_many([]) == []
+
+
+def test_quaternion_rotation():
+    q = Quaternion.from_axis_angle(V3(0, 0, 1), pi / 2)
+    assert q.rotate(V3(1, 0, 0)) == V3(0, 1, 0)
+    assert q.to_mat3() == Mat3.rotation_z(pi / 2)
+    assert Mat4.from_mat3(q) == Mat4.from_mat3(Mat3.rotation_z(pi / 2))
+    assert abs(q.length - 1) < 0.0001
+
+
+def test_quaternion_composition():
+    a = Quaternion.from_axis_angle(random_v3(), random() * pi)
+    b = Quaternion.from_axis_angle(random_v3(), random() * pi)
+    v = random_v3()
+    assert (a * b).rotate(v) == a.rotate(b.rotate(v))
+    assert (a * a.inverse) == Quaternion.identity()
+    assert a.conjugate == a.inverse
+    vectors = [random_v3() for _ in range(20)]
+    assert a.rotate_many(vectors) == [a.rotate(v) for v in vectors]
+    flat = a.rotate_components(array('d', V3.pack_many(vectors)))
+    assert V3.unpack_many(flat) == [a.rotate(v) for v in vectors]
+
+
+def test_slerp():
+    axis = V3(0, 0, 1)
+    a = Quaternion.identity()
+    b = Quaternion.from_axis_angle(axis, pi / 2)
+    assert a.slerp(b, 0) == a
+    assert a.slerp(b, 1) == b
+    assert a.slerp(b, 0.5) == Quaternion.from_axis_angle(axis, pi / 4)
+    # -b is the same rotation, and slerp takes the short way
+    assert a.slerp(-b, 0.5).rotate(V3(1, 0, 0)) == \
+        Quaternion.from_axis_angle(axis, pi / 4).rotate(V3(1, 0, 0))
+    assert a.slerp(Quaternion.identity(), 0.3) == a
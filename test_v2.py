@@ -1,5 +1,6 @@
 import pytest
 from . import V2
+from io import BytesIO
 from random import random
 
 
@@ -348,3 +349,61 @@ def test_write(v1):
     writer = MockWriter()
     v1.write(writer)
     assert writer.written == bytes(v1)
+
+
+def test_pack_many_matches_bytes():
+    vectors = [random_vector() for _ in range(20)]
+    packed_bytes = V2.pack_many(vectors)
+    assert packed_bytes == b''.join(bytes(v) for v in vectors)
+    assert V2.unpack_many(packed_bytes) == vectors
+
+
+def test_unpack_many_accepts_buffers():
+    vectors = [random_vector() for _ in range(5)]
+    packed_bytes = bytearray(V2.pack_many(vectors))
+    assert V2.unpack_many(memoryview(packed_bytes)) == vectors
+    assert V2.unpack_many(b'') == []
+
+
+def test_write_and_read_many():
+    vectors = [random_vector() for _ in range(20)]
+    stream = BytesIO()
+    V2.write_many(stream, vectors)
+    stream.seek(0)
+    assert V2.read_many(stream, 5) == vectors[:5]
+    assert V2.read_many(stream) == vectors[5:]
+
+
+def test_add_scaled(v1, v2):
+    v3 = v1.copy
+    v3.add_scaled(v2, 0.25)
+    assert v3 == v1 + v2 * 0.25
+
+
+def test_lerp_into(v1, v2):
+    v3 = V2()
+    v3.lerp_into(v1, v2, 0)
+    assert v3 == v1
+    v3.lerp_into(v1, v2, 1)
+    assert v3 == v2
+    v3.lerp_into(v1, v2, 0.5)
+    assert v3 == (v1 + v2) / 2
+
+
+def test_clamp_length(v1):
+    v2 = v1.copy
+    v2.clamp_length(v1.length * 2)
+    assert v2 == v1
+    v2.clamp_length(v1.length / 2)
+    assert close_enough(v2.length, v1.length / 2)
+    assert v2 == v1 / 2
+
+
+def test_rotate(v1):
+    v2 = v1.copy
+    v2.rotate(pi / 3)
+    v3 = v1.copy
+    v3.radians += pi / 3
+    assert v2 == v3
+    v2.rotate_degrees(-60)
+    assert v2 == v1
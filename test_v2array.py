@@ -0,0 +1,189 @@
+import pytest
+from .vector import V2, V2Array, SinCosTable
+from random import random
+
+
+pi = 3.14159265358979323846264
+
+
+def rng(a, b):
+    return random() * (b - a) - (b - a) / 2
+
+
+def close_enough(a, b):
+    return abs(a - b) < 0.0001
+
+
+def random_vector():
+    return V2(rng(-20, 20),
+              rng(-20, 20))
+
+
+@pytest.fixture
+def vectors():
+    return [random_vector() for _ in range(50)]
+
+
+@pytest.fixture
+def others():
+    return [random_vector() for _ in range(50)]
+
+
+def test_round_trip(vectors):
+    a = V2Array.from_vectors(vectors)
+    assert len(a) == len(vectors)
+    assert a.to_vectors() == vectors
+    assert list(a) == vectors
+
+
+def test_from_generator(vectors):
+    a = V2Array.from_vectors(v for v in vectors)
+    assert a.to_vectors() == vectors
+
+
+def test_mismatched_columns():
+    with pytest.raises(ValueError):
+        V2Array([1, 2], [3])
+
+
+def test_index_and_slice(vectors):
+    a = V2Array.from_vectors(vectors)
+    assert a[3] == vectors[3]
+    assert a[-1] == vectors[-1]
+    assert a[2:5].to_vectors() == vectors[2:5]
+    a[0] = V2(1, 2)
+    assert a[0] == V2(1, 2)
+
+
+def test_add_sub(vectors, others):
+    a = V2Array.from_vectors(vectors)
+    b = V2Array.from_vectors(others)
+    assert (a + b).to_vectors() == [v + o for v, o in zip(vectors, others)]
+    assert (a - b).to_vectors() == [v - o for v, o in zip(vectors, others)]
+    d = V2(3, -4)
+    assert (a + d).to_vectors() == [v + d for v in vectors]
+    a += b
+    assert a.to_vectors() == [v + o for v, o in zip(vectors, others)]
+    a -= b
+    assert a.to_vectors() == vectors
+
+
+def test_length_mismatch(vectors):
+    a = V2Array.from_vectors(vectors)
+    with pytest.raises(ValueError):
+        a + a[1:]
+
+
+def test_mul_div(vectors):
+    a = V2Array.from_vectors(vectors)
+    assert (a * 2.5).to_vectors() == [v * 2.5 for v in vectors]
+    assert (a / 2.5).to_vectors() == [v / 2.5 for v in vectors]
+    a *= 3
+    a /= 3
+    assert a.to_vectors() == vectors
+
+
+def test_length(vectors):
+    a = V2Array.from_vectors(vectors)
+    for length, squared, v in zip(a.length, a.length_squared, vectors):
+        assert close_enough(length, v.length)
+        assert close_enough(squared, v.length_squared)
+
+
+def test_normalize(vectors):
+    a = V2Array.from_vectors(vectors)
+    assert a.normalized.to_vectors() == [v.normalized for v in vectors]
+    a.normalize()
+    for length in a.length:
+        assert close_enough(length, 1)
+
+
+def test_angles(vectors):
+    a = V2Array.from_vectors(vectors)
+    for r, d, v in zip(a.radians, a.degrees, vectors):
+        assert close_enough(r, v.radians)
+        assert close_enough(d, v.degrees)
+
+
+def test_set_angles(vectors):
+    a = V2Array.from_vectors(vectors)
+    a.degrees = 90
+    for v, original in zip(a, vectors):
+        assert v == V2(0, original.length)
+    a.radians = [pi] * len(a)
+    for v, original in zip(a, vectors):
+        assert v == V2(-original.length, 0)
+
+
+def test_dot(vectors, others):
+    a = V2Array.from_vectors(vectors)
+    b = V2Array.from_vectors(others)
+    for dot, v, o in zip(a.dot_product(b), vectors, others):
+        assert close_enough(dot, v.dot_product(o))
+
+
+def test_mirror(vectors):
+    a = V2Array.from_vectors(vectors)
+    assert a.mirror_x.to_vectors() == [v.mirror_x for v in vectors]
+    assert a.mirror_y.to_vectors() == [v.mirror_y for v in vectors]
+    assert a.mirror.to_vectors() == [v.mirror for v in vectors]
+
+
+def test_copy(vectors):
+    a = V2Array.from_vectors(vectors)
+    b = a.copy
+    b *= 2
+    assert a.to_vectors() == vectors
+
+
+def test_from_polar():
+    angles = [random() * 2 * pi for _ in range(30)]
+    lengths = [random() * 10 for _ in range(30)]
+    a = V2Array.from_radians_and_lengths(angles, lengths)
+    expected = [V2.from_radians_and_length(angle, length)
+                for angle, length in zip(angles, lengths)]
+    assert a.to_vectors() == expected
+    b = V2Array.from_degrees_and_lengths([0, 90, 180], 2)
+    assert b.to_vectors() == [V2(2, 0), V2(0, 2), V2(-2, 0)]
+    c = V2Array.from_radians_and_lengths(pi, [1, 2])
+    assert c.to_vectors() == [V2(-1, 0), V2(-2, 0)]
+    d = V2Array.from_degrees_and_lengths(90, (n for n in (1, 2)))
+    assert d.to_vectors() == [V2(0, 1), V2(0, 2)]
+    with pytest.raises(ValueError):
+        V2Array.from_radians_and_lengths([0, 1], [1])
+    with pytest.raises(TypeError):
+        V2Array.from_radians_and_lengths(pi, 1)
+
+
+def test_rotate_array(vectors):
+    a = V2Array.from_vectors(vectors)
+    a.rotate(pi / 5)
+    for v in vectors:
+        v.rotate(pi / 5)
+    assert a.to_vectors() == vectors
+
+
+def test_sin_cos_table():
+    table = SinCosTable(360)
+    for degree in (0, 45, 90, 137, 359, 360, -90):
+        assert table.vector(degree, 3) == \
+            V2.from_degrees_and_length(degree, 3)
+    steps = [0, 90, 450]
+    assert table.vectors(steps, [1, 2, 3]).to_vectors() == \
+        [V2(1, 0), V2(0, 2), V2(0, 3)]
+    assert table.vectors(steps).to_vectors() == \
+        [V2(1, 0), V2(0, 1), V2(0, 1)]
+    ring = table.ring(2)
+    assert len(ring) == 360
+    assert ring[180] == V2(-2, 0)
+    with pytest.raises(ValueError):
+        table.vectors(steps, [1])
+
+
+def test_sin_cos_table_rotate():
+    table = SinCosTable(8)
+    v = V2(1, 0)
+    table.rotate(v, 2)
+    assert v == V2(0, 1)
+    table.rotate(v, -1)
+    assert v == V2.from_degrees_and_length(45, 1)
@@ -1,5 +1,6 @@
 import pytest
 from .vector import V3
+from io import BytesIO
 from random import random
 
 
@@ -253,3 +254,68 @@ def test_write(v1):
     writer = MockWriter()
     v1.write(writer)
     assert writer.written == bytes(v1)
+
+
+def test_pack_many_matches_bytes():
+    vectors = [random_vector() for _ in range(20)]
+    packed_bytes = V3.pack_many(vectors)
+    assert packed_bytes == b''.join(bytes(v) for v in vectors)
+    assert V3.unpack_many(packed_bytes) == vectors
+
+
+def test_unpack_many_accepts_buffers():
+    vectors = [random_vector() for _ in range(5)]
+    packed_bytes = bytearray(V3.pack_many(vectors))
+    assert V3.unpack_many(memoryview(packed_bytes)) == vectors
+    assert V3.unpack_many(b'') == []
+
+
+def test_write_and_read_many():
+    vectors = [random_vector() for _ in range(20)]
+    stream = BytesIO()
+    V3.write_many(stream, vectors)
+    stream.seek(0)
+    assert V3.read_many(stream, 5) == vectors[:5]
+    assert V3.read_many(stream) == vectors[5:]
+
+
+def test_in_place_keeps_identity(v1, v2):
+    v3 = v1
+    v3 += v2
+    v3 -= v2
+    v3 *= 2
+    v3 /= 2
+    assert v3 is v1
+
+
+def test_add_scaled(v1, v2):
+    v3 = v1.copy
+    v3.add_scaled(v2, 0.25)
+    assert v3 == v1 + v2 * 0.25
+
+
+def test_lerp_into(v1, v2):
+    v3 = V3()
+    v3.lerp_into(v1, v2, 0)
+    assert v3 == v1
+    v3.lerp_into(v1, v2, 1)
+    assert v3 == v2
+    v3.lerp_into(v1, v2, 0.5)
+    assert v3 == (v1 + v2) / 2
+
+
+def test_clamp_length(v1):
+    v2 = v1.copy
+    v2.clamp_length(v1.length * 2)
+    assert v2 == v1
+    v2.clamp_length(v1.length / 2)
+    assert close_enough(v2.length, v1.length / 2)
+    assert v2 == v1 / 2
+
+
+def test_cross_product(v1, v2):
+    assert V3(1, 0, 0).cross_product(V3(0, 1, 0)) == V3(0, 0, 1)
+    v3 = v1.cross_product(v2)
+    assert close_enough(v3.dot_product(v1), 0)
+    assert close_enough(v3.dot_product(v2), 0)
+    assert v2.cross_product(v1) == -v3
@@ -0,0 +1,88 @@
+import pytest
+from . import vector
+from .vector import V2, V3, VectorFile
+from random import random
+
+
+def rng(a, b):
+    return random() * (b - a) - (b - a) / 2
+
+
+@pytest.fixture
+def v2_path(tmp_path):
+    vectors = [V2(rng(-20, 20), rng(-20, 20)) for _ in range(30)]
+    path = tmp_path / 'points.bin'
+    with open(path, 'wb') as f:
+        V2.write_many(f, vectors)
+    return path, vectors
+
+
+def test_len_and_index(v2_path):
+    path, vectors = v2_path
+    with VectorFile(path) as points:
+        assert len(points) == 30
+        assert points[0] == vectors[0]
+        assert points[-1] == vectors[-1]
+        with pytest.raises(IndexError):
+            points[30]
+
+
+def test_slices(v2_path):
+    path, vectors = v2_path
+    with VectorFile(path) as points:
+        assert points[5:10] == vectors[5:10]
+        assert points[::3] == vectors[::3]
+        assert points[10:5] == []
+        assert list(points) == vectors
+
+
+def test_components(v2_path):
+    path, vectors = v2_path
+    with VectorFile(path) as points:
+        components = points.components
+        assert len(components) == 60
+        assert components[2] == vectors[1].x
+        assert components[3] == vectors[1].y
+        components.release()
+
+
+def test_v3(tmp_path):
+    vectors = [V3(i, i * 2, i * 3) for i in range(10)]
+    path = tmp_path / 'points.bin'
+    path.write_bytes(V3.pack_many(vectors))
+    with VectorFile(path, V3) as points:
+        assert len(points) == 10
+        assert points[4] == V3(4, 8, 12)
+
+
+def test_empty(tmp_path):
+    path = tmp_path / 'empty.bin'
+    path.write_bytes(b'')
+    with VectorFile(path) as points:
+        assert len(points) == 0
+        assert list(points) == []
+
+
+def test_truncated(tmp_path):
+    path = tmp_path / 'bad.bin'
+    path.write_bytes(bytes(V2(1, 2)) + b'\x00')
+    with pytest.raises(ValueError):
+        VectorFile(path)
+
+
+def test_closed_when_mapping_fails(v2_path, monkeypatch):
+    path, _ = v2_path
+    opened = []
+
+    def recording_open(*args):
+        opened.append(open(*args))
+        return opened[-1]
+
+    def failing_mmap(*args, **kwargs):
+        raise OSError('cannot map')
+
+    monkeypatch.setattr(vector, 'open', recording_open, raising=False)
+    monkeypatch.setattr(vector, 'mmap', failing_mmap)
+    with pytest.raises(OSError):
+        VectorFile(path)
+    assert opened[0].closed
@@ -0,0 +1,558 @@
+from .shape import Rect
+from .vector import V2, V3, V2Array
+from array import array
+from functools import lru_cache
+from math import sin, cos, radians, sqrt, acos
+
+
+__all__ = ['Affine2D', 'Mat3', 'Mat4', 'Quaternion']
+
+
+@lru_cache(maxsize=1024)
+def _sin_cos(angle):
+    'Sine and cosine of an angle in radians, cached for repeated angles'
+    return sin(angle), cos(angle)
+
+
+class Affine2D:
+    '''2D affine transform stored as the 3x2 matrix
+
+            | a  c  e |
+            | b  d  f |
+
+        so a point maps to (a*x + c*y + e, b*x + d*y + f).  Transforms
+        compose with @, where (m @ n) applies n first and then m, so a
+        chain of N transforms costs N matrix multiplies once rather than
+        N passes over every point.
+
+            m = Affine2D.translation(V2(10, 0)) @ Affine2D.rotation(pi / 2)
+            assert m.apply(V2(1, 0)) == V2(10, 1)
+    '''
+
+    __slots__ = ['a', 'b', 'c', 'd', 'e', 'f']
+
+    def __init__(self, a=1.0, b=0.0, c=0.0, d=1.0, e=0.0, f=0.0):
+        self.a = float(a)
+        self.b = float(b)
+        self.c = float(c)
+        self.d = float(d)
+        self.e = float(e)
+        self.f = float(f)
+
+    @classmethod
+    def identity(cls):
+        return cls()
+
+    @classmethod
+    def translation(cls, vector):
+        'Moves points by vector'
+        return cls(e=vector.x, f=vector.y)
+
+    @classmethod
+    def rotation(cls, angle):
+        '''Rotates points counterclockwise by angle radians about the
+            origin.  The sine and cosine of recent angles are cached'''
+        s, c = _sin_cos(angle)
+        return cls(c, s, -s, c)
+
+    @classmethod
+    def rotation_degrees(cls, angle):
+        'Rotates points counterclockwise by angle degrees about the origin'
+        return cls.rotation(radians(angle))
+
+    @classmethod
+    def scaling(cls, x, y=None):
+        'Scales by x horizontally and by y, or x again, vertically'
+        return cls(a=x, d=x if y is None else y)
+
+    def __repr__(self):
+        template = '{}({:.3f}, {:.3f}, {:.3f}, {:.3f}, {:.3f}, {:.3f})'
+        return template.format(self.__class__.__name__, self.a, self.b,
+                               self.c, self.d, self.e, self.f)
+
+    @property
+    def components(self):
+        'Returns a tuple of the matrix entries in a, b, c, d, e, f order'
+        return self.a, self.b, self.c, self.d, self.e, self.f
+
+    def __eq__(self, other):
+        for a, b in zip(self.components, other.components):
+            if abs(a - b) > 0.0001:
+                return False
+        return True
+
+    def __matmul__(self, other):
+        'Returns the transform that applies other and then self'
+        a, b, c, d, e, f = self.components
+        oa, ob, oc, od, oe, of = other.components
+        return self.__class__(a * oa + c * ob,
+                              b * oa + d * ob,
+                              a * oc + c * od,
+                              b * oc + d * od,
+                              a * oe + c * of + e,
+                              b * oe + d * of + f)
+
+    @property
+    def determinant(self):
+        return self.a * self.d - self.b * self.c
+
+    @property
+    def inverse(self):
+        'Returns the transform that undoes this one'
+        determinant = self.determinant
+        if determinant == 0:
+            raise ValueError("Transform is not invertible")
+        a, b, c, d, e, f = self.components
+        return self.__class__(d / determinant,
+                              -b / determinant,
+                              -c / determinant,
+                              a / determinant,
+                              (c * f - d * e) / determinant,
+                              (b * e - a * f) / determinant)
+
+    def apply(self, point):
+        'Returns a transformed copy of a V2'
+        x = point.x
+        y = point.y
+        return V2(self.a * x + self.c * y + self.e,
+                  self.b * x + self.d * y + self.f)
+
+    def apply_many(self, points):
+        '''Returns a new V2Array with every point of a V2Array, or
+            anything with x and y columns, transformed in one pass'''
+        a, b, c, d, e, f = self.components
+        xs = points.x
+        ys = points.y
+        return V2Array._wrap(
+            array('d', [a * x + c * y + e for x, y in zip(xs, ys)]),
+            array('d', [b * x + d * y + f for x, y in zip(xs, ys)]))
+
+    def apply_rect(self, rect):
+        '''Returns the axis-aligned Rect bounding the transformed corners
+            of rect'''
+        a, b, c, d, e, f = self.components
+        x1, y1, x2, y2 = rect.x1, rect.y1, rect.x2, rect.y2
+        xs = [a * x + c * y + e for x, y in ((x1, y1), (x2, y1),
+                                             (x1, y2), (x2, y2))]
+        ys = [b * x + d * y + f for x, y in ((x1, y1), (x2, y1),
+                                             (x1, y2), (x2, y2))]
+        left = min(xs)
+        top = min(ys)
+        return Rect(V2(left, top), V2(max(xs) - left, max(ys) - top))
+
+
+def _apply_3x3(values, vectors):
+    '''Multiplies every V3 by the first 3 columns of a row-major matrix
+        and returns x, y and z lists'''
+    m00, m01, m02, m10, m11, m12, m20, m21, m22 = values
+    xs = [v.x for v in vectors]
+    ys = [v.y for v in vectors]
+    zs = [v.z for v in vectors]
+    return ([m00 * x + m01 * y + m02 * z for x, y, z in zip(xs, ys, zs)],
+            [m10 * x + m11 * y + m12 * z for x, y, z in zip(xs, ys, zs)],
+            [m20 * x + m21 * y + m22 * z for x, y, z in zip(xs, ys, zs)])
+
+
+def _interleave(xs, ys, zs):
+    '''Returns a flat array('d') of x, y, z triples'''
+    components = array('d', bytes(8 * 3 * len(xs)))
+    components[0::3] = array('d', xs)
+    components[1::3] = array('d', ys)
+    components[2::3] = array('d', zs)
+    return components
+
+
+class Mat3:
+    '''3x3 matrix for rotating and scaling V3s, stored row-major
+
+            m = Mat3.rotation_z(pi / 2)
+            assert m.apply(V3(1, 0, 0)) == V3(0, 1, 0)
+    '''
+
+    __slots__ = ['values']
+
+    def __init__(self, values=(1.0, 0.0, 0.0,
+                               0.0, 1.0, 0.0,
+                               0.0, 0.0, 1.0)):
+        self.values = tuple(map(float, values))
+        if len(self.values) != 9:
+            raise ValueError("A Mat3 needs 9 values")
+
+    @classmethod
+    def identity(cls):
+        return cls()
+
+    @classmethod
+    def scaling(cls, x, y=None, z=None):
+        'Scales by x, y and z, which default to x'
+        y = x if y is None else y
+        z = x if z is None else z
+        return cls((x, 0, 0, 0, y, 0, 0, 0, z))
+
+    @classmethod
+    def rotation_x(cls, angle):
+        'Rotates counterclockwise by angle radians looking down the x axis'
+        s, c = _sin_cos(angle)
+        return cls((1, 0, 0, 0, c, -s, 0, s, c))
+
+    @classmethod
+    def rotation_y(cls, angle):
+        'Rotates counterclockwise by angle radians looking down the y axis'
+        s, c = _sin_cos(angle)
+        return cls((c, 0, s, 0, 1, 0, -s, 0, c))
+
+    @classmethod
+    def rotation_z(cls, angle):
+        'Rotates counterclockwise by angle radians looking down the z axis'
+        s, c = _sin_cos(angle)
+        return cls((c, -s, 0, s, c, 0, 0, 0, 1))
+
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__,
+                               ', '.join('{:.3f}'.format(v)
+                                         for v in self.values))
+
+    def __eq__(self, other):
+        for a, b in zip(self.values, other.values):
+            if abs(a - b) > 0.0001:
+                return False
+        return True
+
+    def __getitem__(self, key):
+        'Allows m[row, column]'
+        row, column = key
+        return self.values[row * 3 + column]
+
+    def __matmul__(self, other):
+        'Returns the matrix that applies other and then self'
+        a = self.values
+        b = other.values
+        return self.__class__([a[r * 3] * b[c] +
+                               a[r * 3 + 1] * b[3 + c] +
+                               a[r * 3 + 2] * b[6 + c]
+                               for r in range(3) for c in range(3)])
+
+    @property
+    def transposed(self):
+        v = self.values
+        return self.__class__((v[0], v[3], v[6],
+                               v[1], v[4], v[7],
+                               v[2], v[5], v[8]))
+
+    @property
+    def determinant(self):
+        a, b, c, d, e, f, g, h, i = self.values
+        return a * (e * i - f * h) - b * (d * i - f * g) + c * (d * h - e * g)
+
+    @property
+    def inverse(self):
+        'Returns the matrix that undoes this one'
+        determinant = self.determinant
+        if determinant == 0:
+            raise ValueError("Matrix is not invertible")
+        a, b, c, d, e, f, g, h, i = self.values
+        return self.__class__([(e * i - f * h) / determinant,
+                               (c * h - b * i) / determinant,
+                               (b * f - c * e) / determinant,
+                               (f * g - d * i) / determinant,
+                               (a * i - c * g) / determinant,
+                               (c * d - a * f) / determinant,
+                               (d * h - e * g) / determinant,
+                               (b * g - a * h) / determinant,
+                               (a * e - b * d) / determinant])
+
+    def apply(self, vector):
+        'Returns a transformed copy of a V3'
+        a, b, c, d, e, f, g, h, i = self.values
+        x = vector.x
+        y = vector.y
+        z = vector.z
+        return V3(a * x + b * y + c * z,
+                  d * x + e * y + f * z,
+                  g * x + h * y + i * z)
+
+    def apply_many(self, vectors):
+        'Returns a list of transformed copies of many V3s in one pass'
+        return list(map(V3, *_apply_3x3(self.values, vectors)))
+
+    def apply_components(self, components):
+        '''Transforms a flat sequence of x, y, z doubles, such as the
+            components of a VectorFile of V3s or the contents of
+            V3.pack_many, and returns a new array('d') in the same layout'''
+        a, b, c, d, e, f, g, h, i = self.values
+        xs = components[0::3]
+        ys = components[1::3]
+        zs = components[2::3]
+        triples = list(zip(xs, ys, zs))
+        return _interleave([a * x + b * y + c * z for x, y, z in triples],
+                           [d * x + e * y + f * z for x, y, z in triples],
+                           [g * x + h * y + i * z for x, y, z in triples])
+
+
+class Mat4:
+    '''4x4 matrix for transforming V3 points, stored row-major
+
+        Points are treated as (x, y, z, 1), and divided through by w
+        whenever the bottom row makes it something other than 1.
+
+            m = Mat4.translation(V3(0, 0, 5)) @ Mat4.from_mat3(rotation)
+    '''
+
+    __slots__ = ['values']
+
+    def __init__(self, values=(1.0, 0.0, 0.0, 0.0,
+                               0.0, 1.0, 0.0, 0.0,
+                               0.0, 0.0, 1.0, 0.0,
+                               0.0, 0.0, 0.0, 1.0)):
+        self.values = tuple(map(float, values))
+        if len(self.values) != 16:
+            raise ValueError("A Mat4 needs 16 values")
+
+    @classmethod
+    def identity(cls):
+        return cls()
+
+    @classmethod
+    def translation(cls, vector):
+        'Moves points by a V3'
+        return cls((1, 0, 0, vector.x,
+                    0, 1, 0, vector.y,
+                    0, 0, 1, vector.z,
+                    0, 0, 0, 1))
+
+    @classmethod
+    def from_mat3(cls, matrix):
+        'Makes a 4x4 matrix with a Mat3, or anything with to_mat3, in it'
+        if not isinstance(matrix, Mat3):
+            matrix = matrix.to_mat3()
+        a, b, c, d, e, f, g, h, i = matrix.values
+        return cls((a, b, c, 0, d, e, f, 0, g, h, i, 0, 0, 0, 0, 1))
+
+    @classmethod
+    def scaling(cls, x, y=None, z=None):
+        'Scales by x, y and z, which default to x'
+        return cls.from_mat3(Mat3.scaling(x, y, z))
+
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__,
+                               ', '.join('{:.3f}'.format(v)
+                                         for v in self.values))
+
+    def __eq__(self, other):
+        for a, b in zip(self.values, other.values):
+            if abs(a - b) > 0.0001:
+                return False
+        return True
+
+    def __getitem__(self, key):
+        'Allows m[row, column]'
+        row, column = key
+        return self.values[row * 4 + column]
+
+    def __matmul__(self, other):
+        'Returns the matrix that applies other and then self'
+        a = self.values
+        b = other.values
+        return self.__class__([a[r * 4] * b[c] +
+                               a[r * 4 + 1] * b[4 + c] +
+                               a[r * 4 + 2] * b[8 + c] +
+                               a[r * 4 + 3] * b[12 + c]
+                               for r in range(4) for c in range(4)])
+
+    @property
+    def transposed(self):
+        v = self.values
+        return self.__class__([v[c * 4 + r] for r in range(4)
+                               for c in range(4)])
+
+    @property
+    def inverse(self):
+        '''Returns the matrix that undoes this one, found by Gauss-Jordan
+            elimination with partial pivoting'''
+        v = self.values
+        rows = [list(v[r * 4:r * 4 + 4]) + [float(r == c) for c in range(4)]
+                for r in range(4)]
+        for column in range(4):
+            pivot = max(range(column, 4), key=lambda r: abs(rows[r][column]))
+            if rows[pivot][column] == 0:
+                raise ValueError("Matrix is not invertible")
+            rows[column], rows[pivot] = rows[pivot], rows[column]
+            scale = rows[column][column]
+            rows[column] = [x / scale for x in rows[column]]
+            for r in range(4):
+                if r != column:
+                    factor = rows[r][column]
+                    if factor:
+                        rows[r] = [x - factor * y
+                                   for x, y in zip(rows[r], rows[column])]
+        return self.__class__([x for row in rows for x in row[4:]])
+
+    def apply(self, point):
+        'Returns a transformed copy of a V3 point'
+        return self.apply_many((point,))[0]
+
+    def apply_many(self, points):
+        'Returns a list of transformed copies of many V3 points in one pass'
+        xs, ys, zs = self._apply([p.x for p in points],
+                                 [p.y for p in points],
+                                 [p.z for p in points])
+        return list(map(V3, xs, ys, zs))
+
+    def apply_components(self, components):
+        '''Transforms a flat sequence of x, y, z doubles, such as the
+            components of a VectorFile of V3s or the contents of
+            V3.pack_many, and returns a new array('d') in the same layout'''
+        return _interleave(*self._apply(components[0::3], components[1::3],
+                                        components[2::3]))
+
+    def _apply(self, xs, ys, zs):
+        (m00, m01, m02, m03, m10, m11, m12, m13,
+         m20, m21, m22, m23, m30, m31, m32, m33) = self.values
+        triples = list(zip(xs, ys, zs))
+        nx = [m00 * x + m01 * y + m02 * z + m03 for x, y, z in triples]
+        ny = [m10 * x + m11 * y + m12 * z + m13 for x, y, z in triples]
+        nz = [m20 * x + m21 * y + m22 * z + m23 for x, y, z in triples]
+        if (m30, m31, m32, m33) != (0.0, 0.0, 0.0, 1.0):
+            ws = [m30 * x + m31 * y + m32 * z + m33 for x, y, z in triples]
+            nx = [x / w for x, w in zip(nx, ws)]
+            ny = [y / w for y, w in zip(ny, ws)]
+            nz = [z / w for z, w in zip(nz, ws)]
+        return nx, ny, nz
+
+
+class Quaternion:
+    '''Rotation quaternion w + xi + yj + zk
+
+            q = Quaternion.from_axis_angle(V3(0, 0, 1), pi / 2)
+            assert q.rotate(V3(1, 0, 0)) == V3(0, 1, 0)
+    '''
+
+    __slots__ = ['w', 'x', 'y', 'z']
+
+    def __init__(self, w=1.0, x=0.0, y=0.0, z=0.0):
+        self.w = float(w)
+        self.x = float(x)
+        self.y = float(y)
+        self.z = float(z)
+
+    @classmethod
+    def identity(cls):
+        return cls()
+
+    @classmethod
+    def from_axis_angle(cls, axis, angle):
+        'Rotates counterclockwise by angle radians around a V3 axis'
+        s, c = _sin_cos(angle / 2)
+        scale = s / axis.length
+        return cls(c, axis.x * scale, axis.y * scale, axis.z * scale)
+
+    def __repr__(self):
+        return "{}({:.3f}, {:.3f}, {:.3f}, {:.3f})".format(
+            self.__class__.__name__, self.w, self.x, self.y, self.z)
+
+    @property
+    def components(self):
+        'Returns a tuple of the components in w, x, y, z order'
+        return self.w, self.x, self.y, self.z
+
+    def __eq__(self, other):
+        for a, b in zip(self.components, other.components):
+            if abs(a - b) > 0.0001:
+                return False
+        return True
+
+    def __mul__(self, other):
+        'Hamilton product: the rotation that applies other and then self'
+        w, x, y, z = self.components
+        ow, ox, oy, oz = other.components
+        return self.__class__(w * ow - x * ox - y * oy - z * oz,
+                              w * ox + x * ow + y * oz - z * oy,
+                              w * oy - x * oz + y * ow + z * ox,
+                              w * oz + x * oy - y * ox + z * ow)
+
+    def __neg__(self):
+        return self.__class__(-self.w, -self.x, -self.y, -self.z)
+
+    @property
+    def length(self):
+        w, x, y, z = self.components
+        return sqrt(w * w + x * x + y * y + z * z)
+
+    def normalize(self):
+        length = self.length
+        self.w /= length
+        self.x /= length
+        self.y /= length
+        self.z /= length
+
+    @property
+    def normalized(self):
+        length = self.length
+        return self.__class__(self.w / length, self.x / length,
+                              self.y / length, self.z / length)
+
+    @property
+    def conjugate(self):
+        return self.__class__(self.w, -self.x, -self.y, -self.z)
+
+    @property
+    def inverse(self):
+        'Returns the quaternion that undoes this rotation'
+        w, x, y, z = self.components
+        squared = w * w + x * x + y * y + z * z
+        return self.__class__(w / squared, -x / squared,
+                              -y / squared, -z / squared)
+
+    def dot_product(self, other):
+        return (self.w * other.w + self.x * other.x +
+                self.y * other.y + self.z * other.z)
+
+    def slerp(self, other, t):
+        '''Spherical linear interpolation between two unit quaternions,
+            taking the shorter way around, where t=0 gives self'''
+        dot = self.dot_product(other)
+        if dot < 0:
+            other = -other
+            dot = -dot
+        if dot > 0.9995:
+            # Nearly the same rotation, so a normalized lerp is accurate
+            # and avoids dividing by a tiny sine
+            w, x, y, z = self.components
+            result = self.__class__(w + (other.w - w) * t,
+                                    x + (other.x - x) * t,
+                                    y + (other.y - y) * t,
+                                    z + (other.z - z) * t)
+            result.normalize()
+            return result
+        theta = acos(dot)
+        sine = sin(theta)
+        a = sin((1 - t) * theta) / sine
+        b = sin(t * theta) / sine
+        return self.__class__(self.w * a + other.w * b,
+                              self.x * a + other.x * b,
+                              self.y * a + other.y * b,
+                              self.z * a + other.z * b)
+
+    def to_mat3(self):
+        'Returns the rotation as a Mat3.  Assumes a unit quaternion'
+        w, x, y, z = self.components
+        return Mat3((1 - 2 * (y * y + z * z), 2 * (x * y - w * z),
+                     2 * (x * z + w * y),
+                     2 * (x * y + w * z), 1 - 2 * (x * x + z * z),
+                     2 * (y * z - w * x),
+                     2 * (x * z - w * y), 2 * (y * z + w * x),
+                     1 - 2 * (x * x + y * y)))
+
+    def rotate(self, vector):
+        'Returns a rotated copy of a V3.  Assumes a unit quaternion'
+        return self.to_mat3().apply(vector)
+
+    def rotate_many(self, vectors):
+        '''Returns rotated copies of many V3s.  The quaternion is turned
+            into a matrix once, so each vector costs 9 multiplies'''
+        return self.to_mat3().apply_many(vectors)
+
+    def rotate_components(self, components):
+        '''Rotates a flat sequence of x, y, z doubles and returns a new
+            array('d') in the same layout'''
+        return self.to_mat3().apply_components(components)
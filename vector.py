@@ -1,7 +1,11 @@
+from array import array
+from mmap import mmap, ACCESS_READ
+from itertools import chain, repeat, starmap
+from operator import add, sub, mul, truediv, neg, attrgetter
 from struct import Struct
-from math import sqrt, sin, cos, radians, atan2, degrees
+from math import sqrt, sin, cos, radians, atan2, degrees, hypot, pi
 
-__all__ = ['V2', 'V3']
+__all__ = ['V2', 'V3', 'V2Array', 'VectorFile', 'SinCosTable']
 
 
 class V3:
@@ -9,6 +13,7 @@ class V3:
 
     __slots__ = ['x', 'y', 'z']
     packer = Struct('ddd')
+    _components = attrgetter('x', 'y', 'z')
 
     def __init__(self, x=0.0, y=0.0, z=0.0):
         self.x = float(x)
@@ -34,6 +39,47 @@ class V3:
         x, y, z = cls.packer.unpack(packed_bytes)
         return cls(x, y, z)
 
+    @classmethod
+    def from_buffer(cls, buffer, offset=0):
+        '''Creates a new vector from the record starting at offset
+            in any bytes-like object, without slicing it'''
+        x, y, z = cls.packer.unpack_from(buffer, offset)
+        return cls(x, y, z)
+
+    @classmethod
+    def pack_many(cls, vectors):
+        '''Packs many vectors into one bytes object that is the same
+            as joining bytes(...) of each one, but made in a single pass
+
+            vectors = [V3(1, 2, 3), V3(4, 5, 6)]
+            assert V3.pack_many(vectors) == b''.join(map(bytes, vectors))
+        '''
+        return array('d', chain.from_iterable(map(cls._components,
+                                                  vectors))).tobytes()
+
+    @classmethod
+    def unpack_many(cls, packed_bytes):
+        '''Creates a list of vectors from a bytes-like object in the
+            format made by pack_many.  The buffer is read through a
+            memoryview, so no slices of it are copied'''
+        records = cls.packer.iter_unpack(memoryview(packed_bytes))
+        return list(starmap(cls, records))
+
+    @classmethod
+    def write_many(cls, writable, vectors):
+        'Writes many vectors to the file-like object with a single write'
+        return writable.write(cls.pack_many(vectors))
+
+    @classmethod
+    def read_many(cls, readable, count=None):
+        '''Reads count vectors, or everything left if count is None,
+            from the file-like object with a single read'''
+        if count is None:
+            packed_bytes = readable.read()
+        else:
+            packed_bytes = readable.read(count * cls.packer.size)
+        return cls.unpack_many(packed_bytes)
+
     def __bytes__(self):
         return self.packer.pack(self.x, self.y, self.z)
 
@@ -67,6 +113,30 @@ class V3:
                               self.y / other,
                               self.z / other)
 
+    def __iadd__(self, other):
+        self.x += other.x
+        self.y += other.y
+        self.z += other.z
+        return self
+
+    def __isub__(self, other):
+        self.x -= other.x
+        self.y -= other.y
+        self.z -= other.z
+        return self
+
+    def __imul__(self, other):
+        self.x *= other
+        self.y *= other
+        self.z *= other
+        return self
+
+    def __itruediv__(self, other):
+        self.x /= other
+        self.y /= other
+        self.z /= other
+        return self
+
     def __getitem__(self, key):
         '''Allows vec[0] to provide the x component
             and vec[1] to provide the y component.
@@ -202,6 +272,41 @@ class V3:
     def dot_product(self, other):
         return self.x * other.x + self.y * other.y + self.z * other.z
 
+    def cross_product(self, other):
+        'Returns the vector perpendicular to both, following the right hand'
+        return self.__class__(self.y * other.z - self.z * other.y,
+                              self.z * other.x - self.x * other.z,
+                              self.x * other.y - self.y * other.x)
+
+    def add_scaled(self, other, factor):
+        '''Adds other * factor in-place without making a temporary vector
+
+            # position += velocity * dt
+            position.add_scaled(velocity, dt)
+        '''
+        self.x += other.x * factor
+        self.y += other.y * factor
+        self.z += other.z * factor
+
+    def lerp_into(self, a, b, t):
+        '''Sets this vector to the linear interpolation between a and b,
+            where t=0 gives a and t=1 gives b'''
+        self.x = a.x + (b.x - a.x) * t
+        self.y = a.y + (b.y - a.y) * t
+        self.z = a.z + (b.z - a.z) * t
+
+    def clamp_length(self, maximum):
+        'Shrinks the vector in-place if it is longer than maximum'
+        x = self.x
+        y = self.y
+        z = self.z
+        squared = x * x + y * y + z * z
+        if squared > maximum * maximum:
+            scale = maximum / sqrt(squared)
+            self.x = x * scale
+            self.y = y * scale
+            self.z = z * scale
+
     def write(self, writable):
         'Writes itself to the file-like object passed in as binary'
         return writable.write(bytes(self))
@@ -212,6 +317,7 @@ class V2:
 
     __slots__ = ['x', 'y']
     packer = Struct('dd')
+    _components = attrgetter('x', 'y')
 
     def __init__(self, x=0.0, y=0.0):
         '''Most efficient way to make a V2: from x and y
@@ -275,6 +381,47 @@ class V2:
         x, y = cls.packer.unpack(packed_bytes)
         return cls(x, y)
 
+    @classmethod
+    def from_buffer(cls, buffer, offset=0):
+        '''Creates a new vector from the record starting at offset
+            in any bytes-like object, without slicing it'''
+        x, y = cls.packer.unpack_from(buffer, offset)
+        return cls(x, y)
+
+    @classmethod
+    def pack_many(cls, vectors):
+        '''Packs many vectors into one bytes object that is the same
+            as joining bytes(...) of each one, but made in a single pass
+
+            vectors = [V2(1, 2), V2(4, 5)]
+            assert V2.pack_many(vectors) == b''.join(map(bytes, vectors))
+        '''
+        return array('d', chain.from_iterable(map(cls._components,
+                                                  vectors))).tobytes()
+
+    @classmethod
+    def unpack_many(cls, packed_bytes):
+        '''Creates a list of vectors from a bytes-like object in the
+            format made by pack_many.  The buffer is read through a
+            memoryview, so no slices of it are copied'''
+        records = cls.packer.iter_unpack(memoryview(packed_bytes))
+        return list(starmap(cls, records))
+
+    @classmethod
+    def write_many(cls, writable, vectors):
+        'Writes many vectors to the file-like object with a single write'
+        return writable.write(cls.pack_many(vectors))
+
+    @classmethod
+    def read_many(cls, readable, count=None):
+        '''Reads count vectors, or everything left if count is None,
+            from the file-like object with a single read'''
+        if count is None:
+            packed_bytes = readable.read()
+        else:
+            packed_bytes = readable.read(count * cls.packer.size)
+        return cls.unpack_many(packed_bytes)
+
     def __repr__(self):
         return "{}({:.3f}, {:.3f})".format(self.__class__.__name__,
                                            self.x, self.y)
@@ -437,9 +584,24 @@ class V2:
     @radians.setter
     def radians(self, value):
         'Sets the angle of the vector in radians'
-        new_v = self.__class__.from_radians_and_length(value, self.length)
-        self.x = new_v.x
-        self.y = new_v.y
+        x = self.x
+        y = self.y
+        length = sqrt(x * x + y * y)
+        self.x = cos(value) * length
+        self.y = sin(value) * length
+
+    def rotate(self, angle):
+        'Rotates the vector counterclockwise by angle radians in-place'
+        s = sin(angle)
+        c = cos(angle)
+        x = self.x
+        y = self.y
+        self.x = x * c - y * s
+        self.y = x * s + y * c
+
+    def rotate_degrees(self, angle):
+        'Rotates the vector counterclockwise by angle degrees in-place'
+        self.rotate(radians(angle))
 
     @property
     def copy(self):
@@ -450,6 +612,31 @@ class V2:
         'Returns the dot product'
         return self.x * other.x + self.y * other.y
 
+    def add_scaled(self, other, factor):
+        '''Adds other * factor in-place without making a temporary vector
+
+            # position += velocity * dt
+            position.add_scaled(velocity, dt)
+        '''
+        self.x += other.x * factor
+        self.y += other.y * factor
+
+    def lerp_into(self, a, b, t):
+        '''Sets this vector to the linear interpolation between a and b,
+            where t=0 gives a and t=1 gives b'''
+        self.x = a.x + (b.x - a.x) * t
+        self.y = a.y + (b.y - a.y) * t
+
+    def clamp_length(self, maximum):
+        'Shrinks the vector in-place if it is longer than maximum'
+        x = self.x
+        y = self.y
+        squared = x * x + y * y
+        if squared > maximum * maximum:
+            scale = maximum / sqrt(squared)
+            self.x = x * scale
+            self.y = y * scale
+
     @property
     def x_vector(self):
         'Returns a vector with only the x component'
@@ -478,3 +665,426 @@ class V2:
     def write(self, writable):
         'Writes itself to the file-like object passed in as binary'
         return writable.write(bytes(self))
+
+
+class V2Array:
+    '''Many 2D vectors stored as two contiguous columns of doubles
+
+        Every operation runs over whole columns with map() and the C
+        implemented operator functions, so there is one interpreter
+        round-trip per call rather than one per vector.
+
+            points = V2Array.from_vectors([V2(1, 2), V2(3, 4)])
+            moved = points + V2(10, 0)
+            assert moved[1] == V2(13, 4)
+    '''
+
+    __slots__ = ['x', 'y']
+
+    def __init__(self, x=(), y=()):
+        '''Makes an array from two iterables of x and y components
+
+            # 3 vectors: (0, 3), (1, 4), (2, 5)
+            a = V2Array([0, 1, 2], [3, 4, 5])
+        '''
+        self.x = array('d', x)
+        self.y = array('d', y)
+        if len(self.x) != len(self.y):
+            raise ValueError("x and y columns must be the same length")
+
+    @classmethod
+    def from_vectors(cls, vectors):
+        '''Creates a new array from an iterable of V2 instances
+
+            a = V2Array.from_vectors([V2(1, 2), V2(3, 4)])
+            assert a.to_vectors() == [V2(1, 2), V2(3, 4)]
+        '''
+        if not isinstance(vectors, (list, tuple)):
+            vectors = list(vectors)
+        return cls._wrap(array('d', map(attrgetter('x'), vectors)),
+                         array('d', map(attrgetter('y'), vectors)))
+
+    @classmethod
+    def from_radians_and_lengths(cls, angles, lengths):
+        '''Creates a new array from angles in radians and lengths, where
+            either one can be a single number shared by every vector
+
+            # 4 unit vectors pointing right, up, left and down
+            V2Array.from_radians_and_lengths([0, pi / 2, pi, -pi / 2], 1)
+        '''
+        single_angle = isinstance(angles, (int, float))
+        single_length = isinstance(lengths, (int, float))
+        if single_angle and single_length:
+            raise TypeError("angles and lengths cannot both be single "
+                            "numbers, at least one must be a sequence")
+        if single_angle:
+            lengths = array('d', lengths)
+            angles = array('d', repeat(angles, len(lengths)))
+        else:
+            angles = array('d', angles)
+            if single_length:
+                lengths = repeat(lengths, len(angles))
+            lengths = array('d', lengths)
+        if len(lengths) != len(angles):
+            raise ValueError("Expected {} lengths, got {}"
+                             .format(len(angles), len(lengths)))
+        x = array('d', map(mul, map(cos, angles), lengths))
+        y = array('d', map(mul, map(sin, angles), lengths))
+        return cls._wrap(x, y)
+
+    @classmethod
+    def from_degrees_and_lengths(cls, angles, lengths):
+        '''Creates a new array from angles in degrees and lengths, where
+            either one can be a single number shared by every vector'''
+        if isinstance(angles, (int, float)):
+            angles = radians(angles)
+        else:
+            angles = map(radians, angles)
+        return cls.from_radians_and_lengths(angles, lengths)
+
+    @classmethod
+    def _wrap(cls, x, y):
+        'Makes an array around existing columns without copying them'
+        result = cls.__new__(cls)
+        result.x = x
+        result.y = y
+        return result
+
+    def to_vectors(self):
+        'Returns a list of new V2 instances, one per element'
+        return list(map(V2, self.x, self.y))
+
+    def __repr__(self):
+        return "{}({} vectors)".format(self.__class__.__name__, len(self.x))
+
+    def __len__(self):
+        return len(self.x)
+
+    def __iter__(self):
+        return map(V2, self.x, self.y)
+
+    def __getitem__(self, key):
+        '''Indexing returns a V2 copy of that element,
+            slicing returns a new V2Array'''
+        if isinstance(key, slice):
+            return self._wrap(self.x[key], self.y[key])
+        return V2(self.x[key], self.y[key])
+
+    def __setitem__(self, key, value):
+        '''Sets one element from a V2, or a slice from a V2Array'''
+        self.x[key] = value.x
+        self.y[key] = value.y
+
+    def __eq__(self, other):
+        if len(self) != len(other):
+            return False
+        for a, b in zip(self.x, other.x):
+            if abs(a - b) > 0.0001:
+                return False
+        for a, b in zip(self.y, other.y):
+            if abs(a - b) > 0.0001:
+                return False
+        return True
+
+    def _columns(self, other):
+        '''Returns other as a pair of iterables lined up with self,
+            repeating the components if other is a single V2'''
+        if isinstance(other, V2Array):
+            if len(other.x) != len(self.x):
+                raise ValueError("Cannot combine arrays of length {} and {}"
+                                 .format(len(self.x), len(other.x)))
+            return other.x, other.y
+        return repeat(other.x), repeat(other.y)
+
+    def __add__(self, other):
+        ox, oy = self._columns(other)
+        return self._wrap(array('d', map(add, self.x, ox)),
+                          array('d', map(add, self.y, oy)))
+
+    def __sub__(self, other):
+        ox, oy = self._columns(other)
+        return self._wrap(array('d', map(sub, self.x, ox)),
+                          array('d', map(sub, self.y, oy)))
+
+    def __mul__(self, other):
+        other = repeat(other)
+        return self._wrap(array('d', map(mul, self.x, other)),
+                          array('d', map(mul, self.y, other)))
+
+    def __truediv__(self, other):
+        other = repeat(other)
+        return self._wrap(array('d', map(truediv, self.x, other)),
+                          array('d', map(truediv, self.y, other)))
+
+    def __iadd__(self, other):
+        ox, oy = self._columns(other)
+        self.x[:] = array('d', map(add, self.x, ox))
+        self.y[:] = array('d', map(add, self.y, oy))
+        return self
+
+    def __isub__(self, other):
+        ox, oy = self._columns(other)
+        self.x[:] = array('d', map(sub, self.x, ox))
+        self.y[:] = array('d', map(sub, self.y, oy))
+        return self
+
+    def __imul__(self, other):
+        other = repeat(other)
+        self.x[:] = array('d', map(mul, self.x, other))
+        self.y[:] = array('d', map(mul, self.y, other))
+        return self
+
+    def __itruediv__(self, other):
+        other = repeat(other)
+        self.x[:] = array('d', map(truediv, self.x, other))
+        self.y[:] = array('d', map(truediv, self.y, other))
+        return self
+
+    def __neg__(self):
+        return self._wrap(array('d', map(neg, self.x)),
+                          array('d', map(neg, self.y)))
+
+    def __pos__(self):
+        return self.copy
+
+    @property
+    def copy(self):
+        'Makes a copy of the array'
+        return self._wrap(array('d', self.x), array('d', self.y))
+
+    @property
+    def length(self):
+        'The magnitude of every vector, as an array of doubles'
+        return array('d', map(hypot, self.x, self.y))
+
+    @property
+    def length_squared(self):
+        'The squared magnitude of every vector.  Fast for length compares'
+        x = self.x
+        y = self.y
+        return array('d', map(add, map(mul, x, x), map(mul, y, y)))
+
+    def normalize(self):
+        'Grows or Shrinks every vector to a size of 1.0 but maintains angle'
+        lengths = self.length
+        self.x[:] = array('d', map(truediv, self.x, lengths))
+        self.y[:] = array('d', map(truediv, self.y, lengths))
+
+    @property
+    def normalized(self):
+        'Returns a normalized copy of the array'
+        lengths = self.length
+        return self._wrap(array('d', map(truediv, self.x, lengths)),
+                          array('d', map(truediv, self.y, lengths)))
+
+    @property
+    def radians(self):
+        'Returns the angle of every vector in radians'
+        return array('d', map(atan2, self.y, self.x))
+
+    @radians.setter
+    def radians(self, values):
+        '''Sets the angle of every vector in radians, keeping the lengths.
+            Accepts either a single angle or one angle per vector'''
+        if isinstance(values, (int, float)):
+            values = repeat(values, len(self.x))
+        else:
+            values = array('d', values)
+            if len(values) != len(self.x):
+                raise ValueError("Expected {} angles, got {}"
+                                 .format(len(self.x), len(values)))
+        lengths = self.length
+        cosines = array('d', map(cos, values))
+        sines = array('d', map(sin, values))
+        self.x[:] = array('d', map(mul, cosines, lengths))
+        self.y[:] = array('d', map(mul, sines, lengths))
+
+    def rotate(self, angle):
+        'Rotates every vector counterclockwise by angle radians in-place'
+        s = sin(angle)
+        c = cos(angle)
+        xs = self.x
+        ys = self.y
+        x = array('d', [x * c - y * s for x, y in zip(xs, ys)])
+        ys[:] = array('d', [x * s + y * c for x, y in zip(xs, ys)])
+        xs[:] = x
+
+    @property
+    def degrees(self):
+        'Returns the angle of every vector in degrees'
+        return array('d', map(degrees, map(atan2, self.y, self.x)))
+
+    @degrees.setter
+    def degrees(self, values):
+        '''Sets the angle of every vector in degrees, keeping the lengths.
+            Accepts either a single angle or one angle per vector'''
+        if isinstance(values, (int, float)):
+            self.radians = radians(values)
+        else:
+            self.radians = map(radians, values)
+
+    def dot_product(self, other):
+        '''Returns the dot product of every vector with other, which
+            can be a single V2 or a V2Array of the same length'''
+        ox, oy = self._columns(other)
+        return array('d', map(add, map(mul, self.x, ox), map(mul, self.y, oy)))
+
+    @property
+    def mirror(self):
+        'A copy of the array mirrored over x and y. same as -obj'
+        return -self
+
+    @property
+    def mirror_x(self):
+        'A copy of the array mirrored over the x axis'
+        return self._wrap(array('d', self.x), array('d', map(neg, self.y)))
+
+    @property
+    def mirror_y(self):
+        'A copy of the array mirrored over the y axis'
+        return self._wrap(array('d', map(neg, self.x)), array('d', self.y))
+
+
+class VectorFile:
+    '''Read-only sequence over a file of packed V2 or V3 records
+
+        The file is memory mapped rather than read, so opening is instant
+        no matter the size, and records are only decoded when touched.
+
+            with VectorFile('points.bin', V3) as points:
+                first = points[0]
+                tail = points[-100:]
+    '''
+
+    __slots__ = ['vector_class', '_file', '_map', '_view', '_count']
+
+    def __init__(self, path, vector_class=V2):
+        self.vector_class = vector_class
+        self._file = open(path, 'rb')
+        try:
+            self._open()
+        except BaseException:
+            self._file.close()
+            raise
+
+    def _open(self):
+        size = self._file.seek(0, 2)
+        record_size = self.vector_class.packer.size
+        if size % record_size:
+            message = "{} bytes is not a whole number of {} records"
+            raise ValueError(message.format(size, self.vector_class.__name__))
+        self._count = size // record_size
+        if size:
+            self._map = mmap(self._file.fileno(), 0, access=ACCESS_READ)
+            self._view = memoryview(self._map)
+        else:
+            self._map = None
+            self._view = memoryview(b'')
+
+    def __repr__(self):
+        return "{}({} {} records)".format(self.__class__.__name__,
+                                          self._count,
+                                          self.vector_class.__name__)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, key):
+        '''Indexing decodes one record, slicing decodes a list of them'''
+        packer = self.vector_class.packer
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._count)
+            if step == 1:
+                if stop <= start:
+                    return []
+                size = packer.size
+                view = self._view[start * size:stop * size]
+                return self.vector_class.unpack_many(view)
+            return [self[i] for i in range(start, stop, step)]
+        if key < 0:
+            key += self._count
+        if not 0 <= key < self._count:
+            raise IndexError("record index out of range")
+        return self.vector_class(*packer.unpack_from(self._view,
+                                                     key * packer.size))
+
+    def __iter__(self):
+        return starmap(self.vector_class,
+                       self.vector_class.packer.iter_unpack(self._view))
+
+    @property
+    def components(self):
+        '''A flat memoryview of doubles over the whole file, with the
+            components of each record stored next to each other.
+            Nothing is copied or decoded until it is indexed.
+            Release the view before closing the file'''
+        return self._view.cast('d')
+
+    def close(self):
+        'Releases the mapping and the underlying file'
+        self._view.release()
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SinCosTable:
+    '''Sines and cosines precomputed for a fixed number of angle steps
+        around the circle, for radial layouts and particle emitters that
+        only ever use those angles.
+
+            # one step per whole degree
+            table = SinCosTable(360)
+            v = table.vector(45, 10.0)
+            assert v == V2.from_degrees_and_length(45, 10.0)
+    '''
+
+    __slots__ = ['steps', 'sin', 'cos']
+
+    def __init__(self, steps=360):
+        self.steps = steps
+        step = 2 * pi / steps
+        self.sin = array('d', [sin(i * step) for i in range(steps)])
+        self.cos = array('d', [cos(i * step) for i in range(steps)])
+
+    def vector(self, step, length=1.0):
+        'Creates a new V2 at the angle of step with the given length'
+        step %= self.steps
+        return V2(self.cos[step] * length, self.sin[step] * length)
+
+    def vectors(self, steps, lengths=1.0):
+        '''Creates a V2Array from a sequence of steps and lengths, where
+            lengths can be a single number shared by every vector'''
+        count = self.steps
+        steps = [step % count for step in steps]
+        if isinstance(lengths, (int, float)):
+            lengths = repeat(lengths, len(steps))
+        lengths = array('d', lengths)
+        if len(lengths) != len(steps):
+            raise ValueError("Expected {} lengths, got {}"
+                             .format(len(steps), len(lengths)))
+        return V2Array._wrap(
+            array('d', map(mul, map(self.cos.__getitem__, steps), lengths)),
+            array('d', map(mul, map(self.sin.__getitem__, steps), lengths)))
+
+    def ring(self, length=1.0):
+        'Creates a V2Array with one vector for every step, in order'
+        return V2Array._wrap(array('d', map(mul, self.cos, repeat(length))),
+                             array('d', map(mul, self.sin, repeat(length))))
+
+    def rotate(self, vector, step):
+        '''Rotates a V2 counterclockwise by step in-place, without
+            calling sin or cos'''
+        step %= self.steps
+        s = self.sin[step]
+        c = self.cos[step]
+        x = vector.x
+        y = vector.y
+        vector.x = x * c - y * s
+        vector.y = x * s + y * c